@@ -0,0 +1,212 @@
+"""Headless execution of many queries sharing one scan per channel."""
+# pylint: disable=too-many-locals
+import argparse
+from collections import defaultdict
+import json
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from config import Config, load_config, load_purity, load_terms
+from export import ExportSink, result_tables
+from expressions import EXPRESSION_PREFIX, parse_expression
+from logs import format_line, resolve_dates
+from patterns import split_query, strip_query
+from purity import PURITY_TYPES
+from ranking import top_items
+from scan import ScanResult, ScanSettings, scan_batch, score_purity
+from timing import Profile
+
+QuerySpec = Dict[str, Any]
+SPEC_DEFAULTS: QuerySpec = {"name": '', "dates": '', "query": '',
+                            "check_exact_name": False, "check_case": False,
+                            "check_exact_word": False, "min_msgs": 0, "show_msgs": False,
+                            "count_words": False, "word_query": '', "word_check_case": False,
+                            "exclude_queries": False, "exclude_common": 0,
+                            "unique_only": False, "word_limit": 20, "check_purity": False,
+                            "count_daily": False, "count_hourly": False,
+                            "count_minutely": False, "count_weekday_hourly": False,
+                            "count_per_user": False, "show_indiv_word": False,
+                            "show_indiv_char": False, "user_limit": 0,
+                            "average_daily": False, "average_per_message": False, "export": ''}
+
+
+def spec_settings(spec: QuerySpec, config: Config,
+                  common_eng: Tuple[str, ...]) -> Tuple[ScanSettings, str]:
+    """Scan settings and search type for a query spec."""
+    user_query, message_query = split_query(spec["query"])
+    search_type = 'all'
+    if user_query or message_query:
+        search_type = 'hybrid' if user_query and message_query else (
+            'user' if user_query else 'msg')
+    parse_expression(message_query)  # an invalid expression fails here rather than mid-scan
+    fix_query = '' if message_query.startswith(EXPRESSION_PREFIX) else strip_query(message_query)
+    word_fix_query = strip_query(spec["word_query"])
+    excluded_words = (set(common_eng[:spec["exclude_common"]-1]) if spec["exclude_common"]
+                      else set())
+    if spec["exclude_queries"]:
+        excluded_words |= {fix.lower() for fix in (fix_query, word_fix_query) if fix}
+    min_msgs = spec["min_msgs"] if search_type != 'user' and not spec["check_exact_name"] else 0
+    settings: ScanSettings = {"search_type": search_type,
+                              "user_query": user_query,
+                              "check_exact_name": spec["check_exact_name"],
+                              "message_query": message_query,
+                              "fix_query": fix_query,
+                              "check_case": spec["check_case"],
+                              "check_exact_word": spec["check_exact_word"],
+                              "word_query": spec["word_query"],
+                              "word_fix_query": word_fix_query,
+                              "word_check_case": spec["word_check_case"],
+                              "excluded_words": excluded_words,
+                              "unique_only": spec["unique_only"],
+                              "word_users": None,
+                              "exclude_commands": spec.get("exclude_commands",
+                                                           config["exclude_commands"]),
+                              "exclude_bots": spec.get("exclude_bots", config["exclude_bots"]),
+                              "show_msgs": spec["show_msgs"] or bool(spec["export"]),
+                              "show_indiv_word": spec["show_indiv_word"],
+                              "show_indiv_char": spec["show_indiv_char"],
+                              "check_purity": spec["check_purity"],
+                              "count_words": spec["count_words"] and not min_msgs,
+                              "word_error": config["word_error"],
+                              "sample_size": 0}
+    return settings, search_type
+
+
+def spec_output(spec: QuerySpec, dates: List[str], result: ScanResult, search_type: str,
+                export: Optional[ExportSink] = None) -> Dict[str, Any]:
+    """Structured results of a query spec, with its complete tables also added to its export."""
+    users = result.users
+    if spec["min_msgs"] and search_type != 'user' and not spec["check_exact_name"]:
+        users = users.select(users['messages'] >= spec["min_msgs"])
+    names = users['messages']
+    divisor = len(dates) if spec["average_daily"] and dates else 1
+    user_limit = spec["user_limit"] or len(users)
+    output: Dict[str, Any] = {"name": spec["name"], "channel": spec["channel"],
+                              "query": spec["query"], "dates": len(dates),
+                              "total_count": int(result.total_count/divisor)}
+    if export is not None:
+        export.write_tables(f"#{spec['channel']}", result_tables(result, users, result.words,
+                                                                 spec))
+        output["export"] = export.path
+    elif spec["show_msgs"]:
+        output["messages"] = [f"{date} {format_line(time, user, message)}"
+                              for date, time, user, message in result.lines]
+    if spec["count_words"]:
+        output["words"] = dict(top_items(result.words, spec["word_limit"]))
+    if spec["check_purity"]:
+        pcounts, icounts = users['pcount'], users['icount']
+        scores = score_purity(pcounts, icounts, names, users['iweight'])
+        categories = {ptype: users[ptype] for ptype in PURITY_TYPES}
+        output["purity"] = {}
+        for user_id in users.order(scores).tolist():
+            output["purity"][users.names[user_id]] = {
+                "score": int(scores[user_id]), "impure": int(icounts[user_id]),
+                "total": int(icounts[user_id]+pcounts[user_id]),
+                "categories": {ptype: int(hits[user_id]) for ptype, hits in categories.items()
+                               if hits[user_id]}}
+        output["impure_terms"] = dict(top_items(result.impure_terms, spec["word_limit"]))
+    if spec["count_daily"]:
+        output["daily_count"] = {date: result.daily_count.get(date, 0) for date in dates}
+    if spec["count_hourly"]:
+        output["hourly_count"] = {hour: int(count/divisor)
+                                  for hour, count in result.times.items()}
+    if spec["count_minutely"]:
+        output["minute_count"] = (result.minutes / divisor).astype(int).tolist()
+    if spec["count_weekday_hourly"]:
+        weekday_hours = (result.weekday_hours_per_day(dates) if spec["average_daily"]
+                         else result.weekday_hours)
+        output["weekday_hour_count"] = weekday_hours.astype(int).tolist()
+    if spec["count_per_user"]:
+        per_user = {"messages": {name: int(value/divisor) for name, value
+                                 in users.top(names, user_limit)}}
+        for key, option, stat in (("words", "show_indiv_word", users['words']),
+                                  ("characters", "show_indiv_char", users['chars'])):
+            if spec[option]:
+                if spec["average_per_message"]:
+                    stat = (stat / names).astype(int)
+                per_user[key] = dict(users.top(stat, user_limit))
+        output["per_user"] = per_user
+    return output
+
+
+def run_batch(specs: List[QuerySpec], config: Config, terms: Dict[str, Tuple[str, ...]],
+              profile: Optional[Profile] = None) -> List[Dict[str, Any]]:
+    """Evaluate query specs, scanning each channel's shared day files once."""
+    profile = profile or Profile()
+    bots = set(terms["bots"])
+    purity = load_purity(terms, config)
+    specs = [{**SPEC_DEFAULTS, "name": str(i), **spec} for i, spec in enumerate(specs, start=1)]
+    channels: Dict[str, List[int]] = defaultdict(list)
+    for i, spec in enumerate(specs):
+        channels[spec["channel"].lower()].append(i)
+
+    outputs: List[Dict[str, Any]] = [{} for _ in specs]
+    for channel, indices in channels.items():
+        rootpath = f"{config['logs_folder']}/Twitch/Channels/{channel}"
+        batch: List[Tuple[ScanSettings, Set[str]]] = []
+        spec_dates, search_types = [], []
+        profile.lap()
+        for i in indices:
+            dates = sorted(resolve_dates(rootpath, specs[i]["dates"]))
+            settings, search_type = spec_settings(specs[i], config, terms["common_eng"])
+            batch.append((settings, set(dates)))
+            spec_dates.append(dates)
+            search_types.append(search_type)
+        # matched messages of queries with an export are streamed to it rather than kept
+        exports = [ExportSink(specs[i]["export"]) if specs[i]["export"] else None
+                   for i in indices]
+        profile.lap('dates')
+        print(f"Scanning #{channel} for {len(indices)} queries...")
+        results = scan_batch(rootpath, channel, batch, bots, purity,
+                             config["scan_workers"], exports)
+        for result in results:
+            profile.merge(result.profile)
+
+        # words from users above min_msgs need a second shared pass once counts are known
+        word_batch, word_results = [], []
+        for (settings, dates), result, i in zip(batch, results, indices):
+            if specs[i]["count_words"] and not settings["count_words"]:
+                word_users = {name for name, value in zip(result.users.names,
+                                                          result.users['messages'].tolist())
+                              if value >= specs[i]["min_msgs"]}
+                word_batch.append(({**settings, "show_msgs": False, "check_purity": False,
+                                    "count_words": True, "word_users": word_users}, dates))
+                word_results.append(result)
+        if word_batch:
+            for result, word_result in zip(word_results, scan_batch(
+                    rootpath, channel, word_batch, bots, purity, config["scan_workers"])):
+                result.words = word_result.words
+                profile.merge(word_result.profile)
+
+        profile.lap()
+        for i, dates, result, search_type, export in zip(indices, spec_dates, results,
+                                                         search_types, exports):
+            outputs[i] = spec_output(specs[i], dates, result, search_type, export)
+            if export is not None:
+                export.close()
+        profile.lap('output')
+    return outputs
+
+
+def main():
+    """Run a batch of query specs from a JSON file and write the results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("specs", help="JSON file containing a list of query specs")
+    parser.add_argument("output", help="file to write the JSON results to")
+    parser.add_argument("--profile", nargs='?', const='', metavar="FILE",
+                        help="print per-phase timings and save them as JSON " \
+                             "(to the profiles folder unless a file is given)")
+    args = parser.parse_args()
+    with open(args.specs, 'r', encoding="UTF-8") as file:
+        specs = json.loads(file.read())
+    profile = Profile()
+    outputs = run_batch(specs, load_config(headless=True), load_terms(), profile)
+    with open(args.output, 'w', encoding="UTF-8") as file:
+        file.write(json.dumps(outputs, indent=4, ensure_ascii=False))
+    print(f"\nResults for {len(outputs)} queries saved to {args.output}")
+    if args.profile is not None:
+        profile.report()
+        print(f"Profile saved to {profile.save(args.profile or None)}")
+
+
+if __name__ == "__main__":
+    main()
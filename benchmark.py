@@ -0,0 +1,180 @@
+"""Performance measurements of the log explorer."""
+# pylint: disable=import-outside-toplevel,cell-var-from-loop
+import argparse
+import contextlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+import generate
+
+PACKAGE_FOLDER = os.path.dirname(os.path.abspath(__file__))
+STARTUP_MODULES = ("main", "batch", "follow")
+HEAVY_MODULES = ("numpy", "matplotlib", "tkinter")
+QUERIES = (("`U", False), ("`T", False), ("`C", False), (">lol", False), ("lol<", False),
+           ("~lol", False), ("lol", False), ("lol", True))
+
+
+def time_import(module: str, repeat: int) -> Tuple[float, List[str]]:
+    """Best wall time of a fresh interpreter importing a module, and the heavy modules it loaded."""
+    code = (f"import sys, {module}; "
+            f"print(' '.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))")
+    best, loaded = float('inf'), []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", code], cwd=PACKAGE_FOLDER, check=True,
+                                capture_output=True, text=True).stdout
+        best = min(best, time.perf_counter()-start)
+        loaded = output.split()
+    return best, loaded
+
+
+def measure(func: Callable, repeat: int, setup: Callable = lambda: None) -> Tuple[float, int]:
+    """Best wall time of repeated calls, and the peak memory allocated during one of them."""
+    best = float('inf')
+    with open(os.devnull, 'w', encoding="UTF-8") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            setup()
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter()-start)
+        setup()
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best, peak
+
+
+def report(name: str, lines: int, seconds: float, peak: int):
+    """Print a throughput measurement."""
+    print(f"    {name}: {lines/seconds:,.0f} lines/s ({seconds*1000:.1f} ms, "
+          f"peak {peak/2**20:.1f} MiB)")
+
+
+def bench_startup(args: argparse.Namespace):
+    """Import time of each entry point, on top of bare interpreter startup."""
+    baseline, _ = time_import("sys", args.repeat)
+    print(f"Startup time (best of {args.repeat}, interpreter startup of "
+          f"{baseline*1000:.1f} ms excluded):")
+    for module in STARTUP_MODULES:
+        seconds, loaded = time_import(module, args.repeat)
+        print(f"    {module}: {(seconds-baseline)*1000:.1f} ms" +
+              (f" (loads {', '.join(loaded)})" if loaded else ''))
+
+
+def scan_settings(query: str = '', **options) -> dict:
+    """Scan settings for a benchmark query, defaulting the rest like a batch query."""
+    from batch import SPEC_DEFAULTS, spec_settings
+    config = {"exclude_commands": True, "exclude_bots": True, "word_error": 0.0}
+    spec = {**SPEC_DEFAULTS, "query": query, **options}
+    return spec_settings(spec, config, ())[0]  # type: ignore
+
+
+def bench_scan(args: argparse.Namespace):
+    """The log scraping block over every generated day, with and without parsed caches."""
+    from logs import CACHE_FOLDER, find_dates, read_day
+    from purity import PurityMatcher
+    from rollup import rollup_path
+    from scan import scan_dates
+    settings, purity = scan_settings(), PurityMatcher({}, {})
+    rootpath = f"{args.logs}/Twitch/Channels/{args.channel}"
+    dates = find_dates(rootpath)
+    lines = sum(len(read_day(rootpath, args.channel, date)[0]) for date in dates)
+    print(f"Log scraping block ({len(dates)} days, {lines} lines):")
+
+    def clear_cache():
+        shutil.rmtree(f"{CACHE_FOLDER}/{args.channel}", ignore_errors=True)
+
+    def clear_rollups():
+        for date in dates:
+            with contextlib.suppress(OSError):
+                os.remove(rollup_path(args.channel, date))
+
+    # the default query is answered from day rollups, rebuilt from the lines if cleared
+    for name, setup in (("cold cache", clear_cache), ("warm cache", clear_rollups),
+                        ("rollups", lambda: None)):
+        seconds, peak = measure(lambda: scan_dates(rootpath, args.channel, dates, settings,
+                                                   set(generate.BOTS), purity, args.workers),
+                                args.repeat, setup)
+        report(name, lines, seconds, peak)
+
+
+def day_columns(args: argparse.Namespace) -> Tuple[List[str], List[str], List[str]]:
+    """Parsed lines of every generated day of the benchmarked channel."""
+    from logs import find_dates, read_day
+    rootpath = f"{args.logs}/Twitch/Channels/{args.channel}"
+    columns: Tuple[List[str], List[str], List[str]] = ([], [], [])
+    for date in find_dates(rootpath):
+        for column, day_column in zip(columns, read_day(rootpath, args.channel, date)):
+            column.extend(day_column)
+    return columns
+
+
+def bench_patterns(args: argparse.Namespace):
+    """Each message query mode matched against every generated message."""
+    from patterns import MessageQuery, strip_query
+    messages = day_columns(args)[2]
+    print(f"Message queries ({len(messages)} messages):")
+    for query, check_exact_word in QUERIES:
+        matches = MessageQuery(query, strip_query(query), False, check_exact_word).matches
+        seconds, peak = measure(lambda: [matches(message) for message in messages],
+                                args.repeat)
+        report(query + (" (exact word)" if check_exact_word else ''), len(messages),
+               seconds, peak)
+
+
+def bench_stats(args: argparse.Namespace):
+    """Scanning parsed lines with word counting and purity checks added on."""
+    from purity import PurityMatcher
+    from scan import scan_lines
+    lines = list(zip(*day_columns(args)))
+    bots, purity = set(generate.BOTS), PurityMatcher({"mild_curse": generate.CURSES}, {})
+    print(f"Statistics ({len(lines)} lines):")
+    for name, options in (("counting only", {}), ("word counting", {"count_words": True}),
+                          ("purity scoring", {"check_purity": True})):
+        settings = scan_settings(**options)
+        seconds, peak = measure(lambda: scan_lines(lines, "", settings, bots, purity),
+                                args.repeat)
+        report(name, len(lines), seconds, peak)
+
+
+BENCHMARKS = {"startup": bench_startup, "scan": bench_scan,
+              "patterns": bench_patterns, "stats": bench_stats}
+
+
+def main():
+    """Run the selected benchmarks, over generated logs unless a logs folder is given."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("benchmarks", nargs='*', metavar="benchmark",
+                        help=f"any of: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="runs per measurement")
+    parser.add_argument("--workers", type=int, default=1, help="processes for reading logs")
+    parser.add_argument("--logs", help="existing logs directory to use instead of generating one")
+    parser.add_argument("--channel", default="channel0", help="channel to benchmark")
+    generate.add_arguments(parser)
+    args = parser.parse_args()
+    if args.logs is not None:
+        args.logs = os.path.abspath(args.logs)
+    if (unknown := set(args.benchmarks) - BENCHMARKS.keys()):
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        # parsed caches are written relative to the working directory, keep them out of ours
+        os.chdir(folder)
+        if args.logs is None:
+            args.logs = f"{folder}/logs"
+            generate.generate_logs(args.logs, **generate.generator_options(args))
+        for name in args.benchmarks or BENCHMARKS:
+            BENCHMARKS[name](args)
+            print()
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Per-session catalog of channels and their day logs, re-listed only when folders change."""
+# pylint: disable=multiple-statements
+from bisect import bisect_left, bisect_right
+from fnmatch import fnmatchcase
+import os
+import re
+from typing import Dict, List, Tuple
+
+ARCHIVE_SUFFIXES = (".gz", ".zst", ".xz")  # compressed day logs, read as if they were plain
+LOG_NAME_PATTERN = re.compile(r"^[a-z\d_]*-(.*)\.log(\.gz|\.zst|\.xz)?$")
+
+
+class DateCatalog:
+    """Dates (sorted, also as YYYYMMDD numbers) and sizes of a channel's day logs."""
+    def __init__(self, rootpath: str):
+        self.rootpath = rootpath
+        self.mtime = -1
+        self.date_nums: List[int] = []
+        self.dates: List[str] = []
+        self.sizes: Dict[str, int] = {}
+
+    def refresh(self):
+        """Re-list the channel folder if files were added, removed or renamed since last time."""
+        if (mtime := os.stat(self.rootpath).st_mtime_ns) == self.mtime: return
+        entries = []
+        with os.scandir(self.rootpath) as scan:
+            for entry in scan:
+                if not (filedate := LOG_NAME_PATTERN.fullmatch(entry.name)): continue
+                if not (date_num := filedate[1].replace('-', '')).isdigit(): continue
+                entries.append((int(date_num), filedate[1], bool(filedate[2]),
+                                entry.stat().st_size))
+        # a day being compacted can briefly have both files, the plain log is the one read
+        entries.sort()
+        self.sizes = {}
+        for _, date, _, size in entries:
+            self.sizes.setdefault(date, size)
+        self.dates = list(self.sizes)
+        self.date_nums = [int(date.replace('-', '')) for date in self.dates]
+        self.mtime = mtime
+
+    def find(self, startdate_num: int = 0, enddate_num: int = 10**8) -> List[str]:
+        """Dates within an inclusive YYYYMMDD range."""
+        return self.dates[bisect_left(self.date_nums, startdate_num):
+                          bisect_right(self.date_nums, enddate_num)]
+
+    def size(self, dates: List[str]) -> int:
+        """Total size in bytes of the given days' logs as of the last listing."""
+        return sum(self.sizes.get(date, 0) for date in dates)
+
+
+CATALOGS: Dict[str, DateCatalog] = {}
+CHANNELS: Dict[str, Tuple[int, List[str]]] = {}
+
+
+def date_catalog(rootpath: str) -> DateCatalog:
+    """The session's catalog of a channel folder, brought up to date."""
+    if (catalog := CATALOGS.get(rootpath)) is None:
+        catalog = CATALOGS[rootpath] = DateCatalog(rootpath)
+    catalog.refresh()
+    return catalog
+
+
+def find_channels(logs_folder: str) -> List[str]:
+    """Names of the channel folders under a logs directory."""
+    path = f"{logs_folder}/Twitch/Channels/"
+    mtime = os.stat(path).st_mtime_ns
+    if (channels := CHANNELS.get(path)) is None or channels[0] != mtime:
+        with os.scandir(path) as scan:
+            channels = CHANNELS[path] = (mtime, [entry.name for entry in scan if entry.is_dir()])
+    return channels[1]
+
+
+def select_channels(selection: str, channels: List[str]) -> List[str]:
+    """Channels chosen by list numbers, names, globs or "all", or none if any choice is invalid."""
+    selected: Dict[str, None] = {}
+    for choice in selection.replace(',', ' ').split():
+        if choice == "all":
+            matches = channels
+        elif choice.isnumeric():
+            matches = [channels[int(choice)-1]] if int(choice)-1 in range(len(channels)) else []
+        elif any(char in choice for char in "*?["):
+            matches = [channel for channel in channels if fnmatchcase(channel, choice)]
+        else:
+            matches = [choice] if choice in channels else []
+        if not matches:
+            return []
+        selected.update(dict.fromkeys(matches))
+    return list(selected)
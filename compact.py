@@ -0,0 +1,139 @@
+"""Compression of closed-out day logs into archives that are still read transparently."""
+# pylint: disable=import-outside-toplevel
+import argparse
+import datetime
+import os
+import shutil
+import struct
+from typing import BinaryIO, Callable, List, Tuple
+
+from catalog import date_catalog, find_channels, select_channels
+from config import load_config
+from logs import cache_path, log_path, read_cache, write_cache
+from rollup import read_rollup, rollup_path, write_rollup
+
+FORMATS = {"gz": 9, "xz": 6, "zst": 19}  # archive suffixes and their default levels
+# zstd seekable format: a skippable frame listing the compressed and original size of each frame
+ZSTD_SKIPPABLE_MAGIC, ZSTD_SEEKABLE_MAGIC = 0x184D2A5E, 0x8F92EAB1
+
+
+def block_compressor(fmt: str, level: int) -> Callable[[bytes], bytes]:
+    """Compress a block into a self-contained gzip member, xz stream or zstd frame."""
+    if fmt == "gz":
+        import gzip
+        return lambda block: gzip.compress(block, compresslevel=level, mtime=0)
+    if fmt == "xz":
+        import lzma
+        return lambda block: lzma.compress(block, preset=level)
+    import zstandard
+    return zstandard.ZstdCompressor(level=level, write_content_size=True).compress
+
+
+def stream_compressor(fmt: str, level: int, file: BinaryIO) -> BinaryIO:
+    """Writer compressing everything written to it into a single archive stream."""
+    # pylint: disable=consider-using-with
+    if fmt == "gz":
+        import gzip
+        return gzip.GzipFile(fileobj=file, mode='wb', compresslevel=level, mtime=0)  # type: ignore
+    if fmt == "xz":
+        import lzma
+        return lzma.LZMAFile(file, 'wb', preset=level)  # type: ignore
+    import zstandard
+    return zstandard.ZstdCompressor(level=level).stream_writer(file, closefd=False)  # type: ignore
+
+
+def write_blocks(source: BinaryIO, target: BinaryIO, compress: Callable[[bytes], bytes],
+                 block_size: int) -> List[Tuple[int, int]]:
+    """Compress a log in independent blocks ending on line breaks, returning their sizes."""
+    frames = []
+    while (block := source.read(block_size)):
+        block += source.readline()
+        frame = compress(block)
+        target.write(frame)
+        frames.append((len(frame), len(block)))
+    return frames
+
+
+def seek_table(frames: List[Tuple[int, int]]) -> bytes:
+    """Skippable zstd frame locating each block, as in zstd's seekable format."""
+    table = b''.join(struct.pack("<II", compressed, size) for compressed, size in frames)
+    table += struct.pack("<IBI", len(frames), 0, ZSTD_SEEKABLE_MAGIC)
+    return struct.pack("<II", ZSTD_SKIPPABLE_MAGIC, len(table)) + table
+
+
+def compact_log(path: str, fmt: str, level: int, block_size: int = 0) -> str:
+    """Replace a plain log by an archive of it (in seekable blocks if a block size is given)."""
+    archive = f"{path}.{fmt}"
+    with open(path, 'rb') as source, open(archive+".tmp", 'wb') as target:
+        if block_size:
+            frames = write_blocks(source, target, block_compressor(fmt, level), block_size)
+            if fmt == "zst":
+                target.write(seek_table(frames))
+        else:
+            with stream_compressor(fmt, level, target) as writer:
+                shutil.copyfileobj(source, writer)
+    stat = os.stat(path)
+    os.utime(archive+".tmp", ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(archive+".tmp", archive)
+    os.remove(path)
+    return archive
+
+
+def compact_channel(rootpath: str, channel: str, before: str, fmt: str, level: int,
+                    block_size: int = 0) -> Tuple[int, int, int]:
+    """Compact a channel's plain day logs dated before a day, returning days and bytes."""
+    days, old_size, new_size = 0, 0, 0
+    for date in date_catalog(rootpath).dates:
+        if date >= before or not (path := log_path(rootpath, channel, date)).endswith(".log"):
+            continue
+        stat = os.stat(path)
+        columns = read_cache(cache_path(channel, date), stat)
+        rollup = read_rollup(rollup_path(channel, date), stat)
+        archive = compact_log(path, fmt, level, block_size)
+        # parsed caches and rollups still hold, they only need the new file's stats
+        if columns is not None:
+            write_cache(cache_path(channel, date), os.stat(archive), columns)
+        if rollup is not None:
+            write_rollup(rollup_path(channel, date), os.stat(archive), rollup)
+        days, old_size, new_size = days+1, old_size+stat.st_size, new_size+os.path.getsize(archive)
+        print(f"Compacting #{channel}... ({date})", end='\r')
+    return days, old_size, new_size
+
+
+def first_kept_date(keep_days: int, today: datetime.date) -> str:
+    """Date of the oldest day log left uncompressed, keeping the most recent days (today first)."""
+    return (today - datetime.timedelta(days=keep_days-1)).isoformat()
+
+
+def main():
+    """Compress the day logs of channels that are no longer being written to."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("channels", nargs='*', default=["all"],
+                        help="channel names, glob patterns or all (default: all)")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="gz", help="archive format")
+    parser.add_argument("-l", "--level", type=int, help="compression level")
+    parser.add_argument("-k", "--keep-days", type=int, default=1,
+                        help="most recent days to leave uncompressed (default: 1, only today)")
+    parser.add_argument("-s", "--seekable", nargs='?', type=float, const=1.0, metavar="MIB",
+                        help="compress in independent blocks of about MIB (default: 1) MiB")
+    args = parser.parse_args()
+    if args.keep_days < 1:  # today's log is still being written
+        parser.error("--keep-days must be at least 1")
+    logs_folder = load_config(headless=True)["logs_folder"]
+    channels = find_channels(logs_folder)
+    if not (selected := select_channels(' '.join(args.channels).lower(), channels)):
+        parser.error(f"no such channels, valid channels are: {', '.join(channels)}")
+    before = first_kept_date(args.keep_days, datetime.date.today())
+    level = FORMATS[args.format] if args.level is None else args.level
+    block_size = int(args.seekable * 2**20) if args.seekable else 0
+    for channel in selected:
+        days, old_size, new_size = compact_channel(f"{logs_folder}/Twitch/Channels/{channel}",
+                                                   channel, before, args.format, level,
+                                                   block_size)
+        if days:
+            print(f"Compacted {days} days of #{channel}: {old_size/2**20:.1f} MiB -> " \
+                  f"{new_size/2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Tests of day logs compacted into archives, and of what still reads them."""
+import contextlib
+import datetime
+import gzip
+import io
+import lzma
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy
+import zstandard
+
+from compact import (FORMATS, ZSTD_SEEKABLE_MAGIC, ZSTD_SKIPPABLE_MAGIC, block_compressor,
+                     compact_channel, compact_log, first_kept_date, write_blocks)
+from generate import generate_logs
+from logs import cache_path, log_path, read_cache, read_day
+from rollup import day_rollup, read_rollup, rollup_path
+
+DECOMPRESS = {"gz": gzip.decompress, "xz": lzma.decompress,
+              "zst": zstandard.ZstdDecompressor().decompress}
+LOG = b"".join(b"[00:00:%02d]  user%d: %s\n" % (i % 60, i, b"word " * (i % 40))
+               for i in range(300)) + b"[23:59:59]  user0: " + b"long " * 100 + b"\n"
+
+
+class BlockTest(unittest.TestCase):
+    """Seekable archives split into independently compressed blocks of whole lines."""
+    def test_blocks(self):
+        """Every block ends on a line break, even after lines longer than a block."""
+        for fmt in FORMATS:
+            with self.subTest(fmt=fmt):
+                target = io.BytesIO()
+                frames = write_blocks(io.BytesIO(LOG), target, block_compressor(fmt, 1), 256)
+                self.assertGreater(len(frames), 1)
+                data, offset, blocks = target.getvalue(), 0, []
+                for compressed, size in frames:
+                    blocks.append(DECOMPRESS[fmt](data[offset:offset+compressed]))
+                    self.assertEqual(len(blocks[-1]), size)
+                    self.assertTrue(blocks[-1].endswith(b"\n"))
+                    offset += compressed
+                self.assertEqual(offset, len(data))
+                self.assertEqual(b"".join(blocks), LOG)
+
+    def test_unterminated(self):
+        """A last line without a line break is kept as it is."""
+        target = io.BytesIO()
+        frames = write_blocks(io.BytesIO(LOG + b"[23:59:59]  user1: cut"), target,
+                              block_compressor("gz", 1), 256)
+        self.assertEqual(sum(size for _, size in frames), len(LOG) + 22)
+        self.assertEqual(gzip.decompress(target.getvalue()), LOG + b"[23:59:59]  user1: cut")
+
+    def test_seek_table(self):
+        """Seekable zstd archives end with a table locating each block."""
+        with tempfile.TemporaryDirectory() as folder:
+            with open(f"{folder}/chan-2024-01-01.log", 'wb') as file:
+                file.write(LOG)
+            with open(compact_log(f"{folder}/chan-2024-01-01.log", "zst", 1, 256), 'rb') as file:
+                data = file.read()
+        count, _, magic = struct.unpack("<IBI", data[-9:])
+        self.assertEqual(magic, ZSTD_SEEKABLE_MAGIC)
+        table_start = len(data) - 9 - 8*count - 8
+        self.assertEqual(struct.unpack("<II", data[table_start:table_start+8]),
+                         (ZSTD_SKIPPABLE_MAGIC, 8*count + 9))
+        offset, blocks = 0, []
+        for i in range(count):
+            compressed, size = struct.unpack("<II", data[table_start+8+8*i:table_start+16+8*i])
+            blocks.append(DECOMPRESS["zst"](data[offset:offset+compressed]))
+            self.assertEqual(len(blocks[-1]), size)
+            self.assertTrue(blocks[-1].endswith(b"\n"))
+            offset += compressed
+        self.assertEqual(offset, table_start)
+        self.assertEqual(b"".join(blocks), LOG)
+
+
+class CompactChannelTest(unittest.TestCase):
+    """Older day logs replaced by archives that read, and cache, the same as before."""
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.cwd = os.getcwd()
+        os.chdir(self.folder.name)  # caches are written relative to the working directory
+        self.today = datetime.date.today()
+        start = (self.today - datetime.timedelta(days=3)).isoformat()
+        (self.channel,) = generate_logs(".", days=4, messages=300, users=20, start_date=start,
+                                        seed=3)
+        self.root = f"./Twitch/Channels/{self.channel}"
+        self.dates = [(self.today - datetime.timedelta(days=days)).isoformat()
+                      for days in (3, 2, 1, 0)]
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.folder.cleanup()
+
+    def compact(self, keep_days: int, fmt: str = "gz", block_size: int = 0):
+        """Compact the channel's logs, keeping the most recent days, and count compacted days."""
+        with contextlib.redirect_stdout(io.StringIO()):  # progress
+            return compact_channel(self.root, self.channel, first_kept_date(keep_days, self.today),
+                                   fmt, FORMATS[fmt], block_size)[0]
+
+    def test_keep_days(self):
+        """Only days before the kept ones are compacted, and never today's."""
+        self.assertEqual(first_kept_date(1, self.today), self.dates[-1])
+        self.assertEqual(self.compact(3), 1)
+        self.assertEqual([log_path(self.root, self.channel, date).endswith(".gz")
+                          for date in self.dates], [True, False, False, False])
+        self.assertEqual(self.compact(1), 2)
+        self.assertEqual([log_path(self.root, self.channel, date).endswith(".gz")
+                          for date in self.dates], [True, True, True, False])
+        self.assertEqual(self.compact(1), 0)
+
+    def test_keep_days_refused(self):
+        """Keeping no days at all, which would compact today's log, is refused."""
+        process = subprocess.run(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                          "compact.py"), "--keep-days", "0"],
+            capture_output=True, text=True, check=False)
+        self.assertEqual(process.returncode, 2)
+        self.assertIn("--keep-days must be at least 1", process.stderr)
+
+    def test_caches_kept(self):
+        """Parsed caches and rollups made from the plain logs still hold for the archives."""
+        columns = {date: read_day(self.root, self.channel, date) for date in self.dates}
+        rollups = {date: day_rollup(self.root, self.channel, date) for date in self.dates}
+        self.compact(3, "gz")
+        self.compact(2, "zst", block_size=4096)
+        for date, suffix in zip(self.dates, (".log.gz", ".log.zst", ".log", ".log")):
+            with self.subTest(date=date):
+                stat = os.stat(path := log_path(self.root, self.channel, date))
+                self.assertTrue(path.endswith(suffix), path)
+                self.assertEqual(read_cache(cache_path(self.channel, date), stat), columns[date])
+                self.assertEqual(read_day(self.root, self.channel, date, use_cache=False),
+                                 columns[date])
+                if date < self.dates[-1]:  # today's rollup is never written
+                    rollup = read_rollup(rollup_path(self.channel, date), stat)
+                    self.assertIsNotNone(rollup)
+                    names, groups = rollup  # type: ignore
+                    self.assertEqual(names, rollups[date][0])
+                    self.assertTrue(numpy.array_equal(groups, rollups[date][1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+"""Configuration and term list loading."""
+# pylint: disable=multiple-statements
+import json
+import os
+import sys
+from typing import Dict, Tuple, TypedDict
+
+from purity import PURITY_TYPES, PurityMatcher
+
+TERM_TYPES = ("bots", "common_eng", *PURITY_TYPES)
+
+
+class Config(TypedDict):
+    """Configuration data for default operation."""
+    logs_folder: str
+    utc_offset: int
+    exclude_commands: bool
+    exclude_bots: bool
+    scan_workers: int
+    use_index: bool
+    word_error: float
+    profile: bool
+    purity_weights: Dict[str, float]
+
+
+def ask_logs_folder(headless: bool = False) -> str:
+    """Ask for the logs directory with a folder dialog, or as typed input without a display."""
+    if not headless:
+        # tkinter is only loaded if setup runs, and may be missing or have no display to use
+        try:
+            import tkinter  # pylint: disable=import-outside-toplevel
+            from tkinter.filedialog import askdirectory  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            pass
+        else:
+            try:
+                return askdirectory(title='Select your Chatterino logs directory " \
+                                    "(see Chatterino Settings >> Moderation >> Logs)')
+            except tkinter.TclError:
+                pass
+    return input("Input your Chatterino logs directory " \
+                 "(see Chatterino Settings >> Moderation >> Logs): ").strip()
+
+
+def load_config(headless: bool = False) -> Config:
+    """Load saved configuration, running first-time setup if none exists."""
+    try:
+        with open("config.json", 'r', encoding="UTF-8") as file:
+            config: Config = json.loads(file.read())
+    except FileNotFoundError:
+        print("Configuration file missing, starting first-time setup:")
+        logs_folder = ask_logs_folder(headless)
+        utc_offset = input("Input +/- UTC offset (e.g. UTC-6 = -6): ").strip()
+        utc_offset = int(utc_offset) if utc_offset.lstrip('-+').isnumeric() else 0
+        exclude_commands = input(
+            "Exclude !command messages? [unless checking commands specifically] (y/n): "
+            ).strip() == 'y'
+        exclude_bots = input(
+            "Exclude bot messages? [doesn't apply if checking exact username] (y/n): "
+            ).strip() == 'y'
+        scan_workers = input(
+            "Input # of processes for reading logs (leave blank for 1, 0 for all cores): "
+            ).strip()
+        scan_workers = int(scan_workers) if scan_workers.isnumeric() else 1
+        use_index = input(
+            "Index words for faster message searches? [builds once per channel] (y/n): "
+            ).strip() == 'y'
+        word_error = input(
+            "Input error bound for approximate word counts, e.g. 0.0001 " \
+            "(leave blank for exact): ").strip()
+        word_error = float(word_error) if word_error.replace('.', '', 1).isnumeric() else 0.0
+        profile = input(
+            "Print and save per-phase timings of each query? [for finding slow steps] (y/n): "
+            ).strip() == 'y'
+        config = {"logs_folder": logs_folder,
+                  "utc_offset": utc_offset,
+                  "exclude_commands": exclude_commands,
+                  "exclude_bots": exclude_bots,
+                  "scan_workers": scan_workers,
+                  "use_index": use_index,
+                  "word_error": word_error,
+                  "profile": profile}
+        with open("config.json", 'w', encoding="UTF-8") as file:
+            file.write(json.dumps(config, indent=4, separators=(',', ': ')))
+        print("Configuration saved:")
+        print(f"    Logs directory: {logs_folder}")
+        print(f"    UTC offset: {utc_offset}")
+        print(f"    Commands excluded: {exclude_commands}")
+        print(f"    Bots excluded: {exclude_bots}")
+        print(f"    Scan processes: {scan_workers or 'all cores'}")
+        print(f"    Word index: {use_index}")
+        print(f"    Word count error bound: {word_error or 'exact'}")
+        print(f"    Profiling: {profile}")
+    # missing from configs saved by older versions
+    config.setdefault("scan_workers", 1)
+    config.setdefault("use_index", False)
+    config.setdefault("word_error", 0.0)
+    config.setdefault("profile", False)
+    # not asked during setup, edit config.json to weigh some term lists less than others
+    config.setdefault("purity_weights", {ptype: 1.0 for ptype in PURITY_TYPES})
+    # an impure message counts as at most one message, so weights above 1 would go out of range
+    weights = config["purity_weights"]
+    if (invalid := [ptype for ptype, weight in weights.items()
+                    if isinstance(weight, bool) or not isinstance(weight, (int, float))]):
+        print(f"Purity weights must be numbers, using 1 for: {', '.join(invalid)}")
+        weights = config["purity_weights"] = {**weights, **dict.fromkeys(invalid, 1.0)}
+    if (invalid := [ptype for ptype, weight in weights.items() if not 0 <= weight <= 1]):
+        print(f"Purity weights must be between 0 and 1, clamping: {', '.join(invalid)}")
+        config["purity_weights"] = {ptype: min(max(float(weight), 0.0), 1.0)
+                                    for ptype, weight in weights.items()}
+    return config
+
+
+def load_terms() -> Dict[str, Tuple[str, ...]]:
+    """Load every term list, creating any missing ones and exiting so they can be filled."""
+    if (missing_ttypes := [ttype for ttype in TERM_TYPES if not os.path.isfile(ttype+".txt")]):
+        print("At least one term list was missing and has been created:")
+        for ttype in missing_ttypes:
+            print(f"    {ttype}.txt")
+            with open(ttype+".txt", 'w', encoding="UTF-8") as file: pass
+        print("Please add terms as desired and restart the program (one lowercase term per line).")
+        sys.exit()
+    terms = {}
+    for ttype in TERM_TYPES:
+        with open(ttype+".txt", 'r', encoding="UTF-8") as file:
+            terms[ttype] = tuple(file.read().splitlines())
+    return terms
+
+
+def load_purity(terms: Dict[str, Tuple[str, ...]], config: Config) -> PurityMatcher:
+    """Compile the purity term lists into one matcher, weighted by category."""
+    return PurityMatcher({ptype: terms[ptype] for ptype in PURITY_TYPES},
+                         config["purity_weights"])
@@ -0,0 +1,148 @@
+"""Buffered export of matched messages and result tables to JSONL or CSV files."""
+# pylint: disable=import-outside-toplevel
+import csv
+import io
+import json
+import os
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from ranking import top_items
+
+if TYPE_CHECKING:
+    from scan import ScanResult
+    from users import UserStats
+
+EXPORT_EXTENSIONS = (".jsonl", ".csv")
+# compression by suffix, at levels fast enough to keep up with a scan
+EXPORT_LEVELS = {"gz": 1, "xz": 0, "zst": 3}
+BUFFER_SIZE = 4*2**20  # bytes gathered before each write
+MESSAGE_FIELDS = ("channel", "date", "time", "user", "message")
+TABLE_FIELDS = ("view", "table", "key", "value")
+
+Row = Tuple[str, str, str, str]  # date, time, user, message
+
+
+def export_parts(path: str) -> Tuple[str, str]:
+    """Extension (.jsonl or .csv) and compression format ('' if none) of an export path."""
+    stem, extension = os.path.splitext(path)
+    if (fmt := extension[1:]) in EXPORT_LEVELS:
+        extension = os.path.splitext(stem)[1]
+    else:
+        fmt = ''
+    if extension not in EXPORT_EXTENSIONS:
+        raise ValueError(f'export files end in .jsonl or .csv (and optionally .gz, .xz or .zst), '
+                         f'"{path}" does not')
+    return extension, fmt
+
+
+def csv_text(rows: Iterable[Iterable[Any]]) -> str:
+    """Rows formatted as CSV lines."""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(rows)
+    return buffer.getvalue()
+
+
+class ExportFile:
+    """A text file written in large blocks, compressed if a format is given."""
+    def __init__(self, path: str, fmt: str = ''):
+        self.file: BinaryIO = open(path, 'wb')  # pylint: disable=consider-using-with
+        self.stream = self.file
+        if fmt:  # compressors are only loaded for compressed exports
+            from compact import stream_compressor
+            self.stream = stream_compressor(fmt, EXPORT_LEVELS[fmt], self.file)
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def write(self, text: str):
+        """Queue text, writing out the queue once it is large enough."""
+        self.chunks.append(data := text.encode('UTF-8'))
+        if (size := self.size + len(data)) >= BUFFER_SIZE:
+            self.flush()
+        else:
+            self.size = size
+
+    def flush(self):
+        """Write out the queued text as one block."""
+        self.stream.write(b''.join(self.chunks))
+        self.chunks, self.size = [], 0
+
+    def close(self):
+        """Write out what is left and close the file."""
+        self.flush()
+        if self.stream is not self.file:
+            self.stream.close()
+        self.file.close()
+
+
+class ExportSink:
+    """Matched messages and result tables streamed to JSONL, or to CSV (tables in -results)."""
+    def __init__(self, path: str):
+        extension, self.fmt = export_parts(path)
+        self.path, self.csv = path, extension == ".csv"
+        self.messages = ExportFile(path, self.fmt)
+        self.tables: Optional[ExportFile] = None
+        self.message_count, self.table_count = 0, 0
+        if self.csv:
+            self.messages.write(csv_text([MESSAGE_FIELDS]))
+
+    @property
+    def tables_path(self) -> str:
+        """Path of the CSV file holding result tables."""
+        split = self.path.rindex(".csv")
+        return f"{self.path[:split]}-results{self.path[split:]}"
+
+    def write_rows(self, channel: str, rows: List[Row]):
+        """Add a day's matched messages from a channel."""
+        if self.csv:
+            self.messages.write(csv_text((channel, *row) for row in rows))
+        else:
+            self.messages.write(''.join(
+                json.dumps({"channel": channel, "date": date, "time": time, "user": user,
+                            "message": message}, ensure_ascii=False) + '\n'
+                for date, time, user, message in rows))
+        self.message_count += len(rows)
+
+    def write_tables(self, view: str, tables: Dict[str, Mapping]):
+        """Add the result tables of a channel (or of several channels together)."""
+        if self.csv:
+            if self.tables is None:
+                self.tables = ExportFile(self.tables_path, self.fmt)
+                self.tables.write(csv_text([TABLE_FIELDS]))
+            self.tables.write(csv_text((view, table, key, value)
+                                       for table, values in tables.items()
+                                       for key, value in values.items()))
+        else:
+            self.messages.write(''.join(
+                json.dumps({"view": view, "table": table, "values": values},
+                           ensure_ascii=False) + '\n'
+                for table, values in tables.items()))
+        self.table_count += len(tables)
+
+    def close(self):
+        """Finish writing every file."""
+        self.messages.close()
+        if self.tables is not None:
+            self.tables.close()
+
+
+def result_tables(result: "ScanResult", users: "UserStats", words: Mapping,
+                  options: Mapping[str, Any]) -> Dict[str, Dict]:
+    """A result's complete tables (totals, not averages) for the enabled options."""
+    from scan import score_purity
+    tables: Dict[str, Dict] = {}
+    names = users['messages']
+    if options["count_words"]:
+        tables["words"] = dict(top_items(words, len(words)))
+    if options["check_purity"] and 'pcount' in users.counters:
+        scores = score_purity(users['pcount'], users['icount'], names, users['iweight'])
+        tables["purity"] = dict(users.top(scores, len(users)))
+    if options["count_daily"]:
+        tables["daily_count"] = dict(sorted(result.daily_count.items()))
+    if options["count_hourly"]:
+        tables["hourly_count"] = result.times
+    if options["count_per_user"]:
+        tables["user_messages"] = dict(users.top(names, len(users)))
+        for table, key in (("user_words", 'words'), ("user_characters", 'chars')):
+            if key in users.counters:
+                tables[table] = dict(users.top(users[key], len(users)))
+    return tables
@@ -0,0 +1,163 @@
+"""Tests of exported messages and result tables read back from their files."""
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+from typing import List
+
+from batch import SPEC_DEFAULTS, spec_settings
+from config import Config
+from export import (BUFFER_SIZE, MESSAGE_FIELDS, TABLE_FIELDS, ExportFile, ExportSink,
+                    export_parts, result_tables)
+from logs import open_log
+from purity import PurityMatcher
+from scan import ScanResult, scan_lines
+
+CONFIG = Config(logs_folder='', utc_offset=0, exclude_commands=False, exclude_bots=False,
+                scan_workers=1, use_index=False, word_error=0.0, profile=False,
+                purity_weights={})
+ROWS = [("2024-01-01", "10:00:00", "alice", "hello, \"world\""),
+        ("2024-01-01", "10:00:01", "bob", "ünïcödé ✓ KEKW")]
+MORE_ROWS = [("2024-01-02", "23:59:59", "carol", "bye")]
+TABLES = {"words": {"hello": 2, "wörld": 1}, "hourly_count": {10: 2, 23: 1}}
+FORMATS = ("", ".gz", ".xz", ".zst")
+
+
+def read_text(path: str) -> str:
+    """Text of an exported file, decompressed by its suffix."""
+    with open_log(path) as file:
+        return file.read().decode('UTF-8')
+
+
+class ExportSinkTest(unittest.TestCase):
+    """Messages and tables written in each layout and compression, then read back."""
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def export(self, name: str, tables: bool = True) -> ExportSink:
+        """Export the rows of two channels, and tables for one view of them."""
+        sink = ExportSink(f"{self.folder.name}/{name}")
+        sink.write_rows("chan", ROWS)
+        sink.write_rows("other", MORE_ROWS)
+        if tables:
+            sink.write_tables("#chan", TABLES)
+        sink.close()
+        self.assertEqual(sink.message_count, 3)
+        self.assertEqual(sink.table_count, len(TABLES) if tables else 0)
+        return sink
+
+    def test_jsonl(self):
+        """Message rows come first, then one row per table."""
+        for suffix in FORMATS:
+            with self.subTest(suffix=suffix):
+                sink = self.export(f"out.jsonl{suffix}")
+                lines = [json.loads(line) for line in read_text(sink.path).splitlines()]
+                self.assertEqual(lines[:3], [dict(zip(MESSAGE_FIELDS, (channel, *row)))
+                                             for channel, rows in (("chan", ROWS),
+                                                                   ("other", MORE_ROWS))
+                                             for row in rows])
+                self.assertEqual(lines[3:], [
+                    {"view": "#chan", "table": "words", "values": TABLES["words"]},
+                    {"view": "#chan", "table": "hourly_count", "values": {"10": 2, "23": 1}}])
+                self.assertFalse(os.path.exists(f"{self.folder.name}/out-results.jsonl"))
+
+    def test_csv(self):
+        """Messages go to the CSV file and tables to its -results companion."""
+        for suffix in FORMATS:
+            with self.subTest(suffix=suffix):
+                sink = self.export(f"out.csv{suffix}")
+                self.assertEqual(sink.tables_path, f"{self.folder.name}/out-results.csv{suffix}")
+                messages = list(csv.reader(io.StringIO(read_text(sink.path))))
+                self.assertEqual(messages, [list(MESSAGE_FIELDS)] + [
+                    ["chan", *row] for row in ROWS] + [["other", *row] for row in MORE_ROWS])
+                tables = list(csv.reader(io.StringIO(read_text(sink.tables_path))))
+                self.assertEqual(tables, [list(TABLE_FIELDS)] + [
+                    ["#chan", table, str(key), str(value)]
+                    for table, values in TABLES.items() for key, value in values.items()])
+
+    def test_csv_without_tables(self):
+        """No -results file is left behind when no tables were exported."""
+        sink = self.export("out.csv.gz", tables=False)
+        self.assertEqual(len(read_text(sink.path).splitlines()), 4)
+        self.assertFalse(os.path.exists(sink.tables_path))
+
+    def test_large(self):
+        """Text over the buffer size is written out in blocks without losing any."""
+        rows = [("2024-01-01", "10:00:00", "alice", "x"*1000)] * (2*BUFFER_SIZE // 1000)
+        for suffix in ("", ".gz"):
+            with self.subTest(suffix=suffix):
+                sink = ExportSink(f"{self.folder.name}/large.jsonl{suffix}")
+                sink.write_rows("chan", rows)
+                self.assertLess(sink.messages.size, BUFFER_SIZE)
+                sink.close()
+                self.assertEqual(len(read_text(sink.path).splitlines()), len(rows))
+
+    def test_export_file(self):
+        """Compressed files hold exactly the text written to them."""
+        for fmt in ("", "gz", "xz", "zst"):
+            with self.subTest(fmt=fmt):
+                path = f"{self.folder.name}/text.txt" + (f".{fmt}" if fmt else "")
+                file = ExportFile(path, fmt)
+                for text in ("a,b\n", "ünïcödé\n", ""):
+                    file.write(text)
+                file.close()
+                self.assertEqual(read_text(path), "a,b\nünïcödé\n")
+
+
+class ExportPartsTest(unittest.TestCase):
+    """Export paths split into their layout and compression."""
+    def test_parts(self):
+        """Known extensions, with or without a compression suffix."""
+        self.assertEqual(export_parts("out.jsonl"), (".jsonl", ""))
+        self.assertEqual(export_parts("dir.v2/out.csv.zst"), (".csv", "zst"))
+        self.assertEqual(export_parts("out.jsonl.gz"), (".jsonl", "gz"))
+
+    def test_invalid(self):
+        """Other extensions are refused."""
+        for path in ("out.txt", "out.gz", "out.csv.bz2", "out"):
+            with self.subTest(path=path):
+                with self.assertRaises(ValueError):
+                    export_parts(path)
+
+
+class ResultTablesTest(unittest.TestCase):
+    """Tables of a scan result for the enabled options."""
+    def scan(self, lines: List[List[str]]) -> ScanResult:
+        """Results of two days of lines, merged latest day first."""
+        settings, _ = spec_settings({**SPEC_DEFAULTS, "count_words": True,  # type: ignore
+                                     "check_purity": True, "show_indiv_word": True,
+                                     "show_indiv_char": True}, CONFIG, ())
+        purity = PurityMatcher({"strong_curse": ["damn"]}, {"strong_curse": 1.0})
+        result = ScanResult()
+        for date, day_lines in zip(("2024-01-02", "2024-01-01"), lines):
+            result.merge(scan_lines(day_lines, date, settings, set(), purity))
+        return result
+
+    def test_tables(self):
+        """Each option adds its tables, with daily counts in date order."""
+        result = self.scan([[["23:00:00", "bob", "damn it"]],
+                            [["10:00:00", "alice", "hello world"],
+                             ["10:30:00", "alice", "hello"]]])
+        options = {"count_words": True, "check_purity": True, "count_daily": True,
+                   "count_hourly": True, "count_per_user": True}
+        tables = result_tables(result, result.users, result.words, options)
+        self.assertEqual(list(tables["daily_count"].items()),
+                         [("2024-01-01", 2), ("2024-01-02", 1)])
+        self.assertEqual(tables["hourly_count"], {10: 2, 23: 1})
+        self.assertEqual(tables["words"], {"hello": 2, "world": 1, "damn": 1, "it": 1})
+        self.assertEqual(tables["user_messages"], {"alice": 2, "bob": 1})
+        self.assertEqual(tables["user_words"], {"alice": 3, "bob": 2})
+        self.assertEqual(tables["user_characters"], {"alice": 15, "bob": 6})
+        self.assertEqual(list(tables["purity"]), ["alice", "bob"])  # purest first
+        json.dumps(tables)  # every value can be exported as JSON
+        self.assertEqual(result_tables(result, result.users, result.words,
+                                       dict.fromkeys(options, False)), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
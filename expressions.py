@@ -0,0 +1,183 @@
+"""Compound boolean queries over log lines, compiled into cost-ordered predicates."""
+from functools import reduce
+import re
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from patterns import MessageQuery, strip_query
+
+EXPRESSION_PREFIX = '?'
+TOKEN_PATTERN = re.compile(r'\s*(?:(?P<paren>[()])|"(?P<quoted>[^"]*)"|/(?P<regex>(?:[^/\\]|\\.)*)/'
+                           r'|(?P<word>[^\s()"]+))')
+TIME_PATTERN = re.compile(r"^time:(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})$")
+LENGTH_PATTERN = re.compile(r"^len(<=|>=|<|>|=)(\d+)$")
+# rough relative cost of each kind of check, cheaper ones are tried first
+COSTS = {'user': 1, 'time': 1, 'length': 1, 'substring': 3, 'mode': 4, 'word': 6, 'regex': 10}
+
+Predicate = Callable[[str, str, str], bool]  # time, user, message
+
+
+class Check(NamedTuple):
+    """A compiled (sub)expression and what evaluating it costs."""
+    cost: int
+    matches: Predicate
+
+
+def tokenize(text: str) -> List[Tuple[str, str]]:
+    """Split an expression into (kind, text) tokens."""
+    tokens, pos, text = [], 0, text.strip()
+    while pos < len(text):
+        if not (ctoken := TOKEN_PATTERN.match(text, pos)):
+            raise ValueError(f"unexpected {text[pos:].strip()!r}")
+        kind = ctoken.lastgroup or ''
+        tokens.append((kind, ctoken[kind]))
+        pos = ctoken.end()
+    return tokens
+
+
+def all_of(checks: List[Check]) -> Check:
+    """Check that passes if every check does, trying the cheapest first."""
+    checks = sorted(checks, key=lambda check: check.cost)
+    return Check(sum(check.cost for check in checks), reduce(
+        lambda first, then: lambda *line: first(*line) and then(*line),
+        (check.matches for check in checks)))
+
+
+def any_of(checks: List[Check]) -> Check:
+    """Check that passes if any check does, trying the cheapest first."""
+    checks = sorted(checks, key=lambda check: check.cost)
+    return Check(sum(check.cost for check in checks), reduce(
+        lambda first, then: lambda *line: first(*line) or then(*line),
+        (check.matches for check in checks)))
+
+
+def negate(check: Check) -> Check:
+    """Check that passes when another fails."""
+    matches = check.matches
+    return Check(check.cost, lambda *line: not matches(*line))
+
+
+def time_check(word: str) -> Check:
+    """Check of a line's time of day against an HH:MM-HH:MM range (wrapping past midnight)."""
+    if not (ctime := TIME_PATTERN.fullmatch(word)):
+        raise ValueError(f"invalid time range {word!r}, expected time:HH:MM-HH:MM")
+    start, end = (f"{int(hours):02}:{minutes}:00" for hours, minutes
+                  in (ctime.groups()[:2], ctime.groups()[2:]))
+    if start <= end:
+        return Check(COSTS['time'], lambda time, user, message: start <= time < end)
+    return Check(COSTS['time'], lambda time, user, message: time >= start or time < end)
+
+
+def length_check(word: str) -> Check:
+    """Check of a message's length against a number."""
+    if not (clength := LENGTH_PATTERN.fullmatch(word)):
+        raise ValueError(f"invalid length check {word!r}, expected e.g. len>20")
+    compare, limit = clength[1], int(clength[2])
+    compares = {'<': limit.__gt__, '>': limit.__lt__, '<=': limit.__ge__, '>=': limit.__le__,
+                '=': limit.__eq__}[compare]
+    return Check(COSTS['length'], lambda time, user, message: compares(len(message)))
+
+
+def user_check(word: str) -> Check:
+    """Check of a line's username, exactly with user:name or partially with user~part."""
+    name = word[5:].lower()
+    if word[4] == ':':
+        return Check(COSTS['user'], lambda time, user, message: user == name)
+    return Check(COSTS['user'], lambda time, user, message: name in user.lower())
+
+
+def message_check(query: str, fix_query: str, check_case: bool, check_exact_word: bool,
+                  literal: bool = False) -> Check:
+    """Check of a message against a single message query (or quoted text, taken literally)."""
+    message_query = MessageQuery(query, fix_query, check_case, check_exact_word, literal)
+    matches = message_query.matches
+    cost = COSTS['mode'] if message_query.kind == 'mode' else (
+        COSTS['word'] if message_query.pattern is not None else COSTS['substring'])
+    return Check(cost, lambda time, user, message: matches(message))
+
+
+def regex_check(pattern: str, check_case: bool) -> Check:
+    """Check of a message against a regular expression."""
+    try:
+        search = re.compile(pattern, 0 if check_case else re.IGNORECASE).search
+    except re.error as error:
+        raise ValueError(f"invalid regex /{pattern}/: {error}") from error
+    return Check(COSTS['regex'], lambda time, user, message: search(message) is not None)
+
+
+class ExpressionParser:
+    """Recursive descent over expression tokens: OR of ANDs of (NOT) terms."""
+    def __init__(self, tokens: List[Tuple[str, str]], check_case: bool, check_exact_word: bool):
+        self.tokens, self.pos = tokens, 0
+        self.check_case, self.check_exact_word = check_case, check_exact_word
+
+    def peek(self) -> Tuple[str, str]:
+        """Next token, or an empty one at the end."""
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else ('', '')
+
+    def keyword(self, word: str) -> bool:
+        """Consume the next token if it is the given keyword."""
+        kind, text = self.peek()
+        if kind == 'word' and text.lower() == word:
+            self.pos += 1
+            return True
+        return False
+
+    def parse(self) -> Check:
+        """The whole expression."""
+        check = self.parse_or()
+        if self.pos < len(self.tokens):
+            raise ValueError(f"unexpected {self.tokens[self.pos][1]!r}")
+        return check
+
+    def parse_or(self) -> Check:
+        """Terms joined by OR."""
+        checks = [self.parse_and()]
+        while self.keyword('or'):
+            checks.append(self.parse_and())
+        return checks[0] if len(checks) == 1 else any_of(checks)
+
+    def parse_and(self) -> Check:
+        """Terms joined by AND."""
+        checks = [self.parse_not()]
+        while self.keyword('and'):
+            checks.append(self.parse_not())
+        return checks[0] if len(checks) == 1 else all_of(checks)
+
+    def parse_not(self) -> Check:
+        """A term, negated by any number of NOTs."""
+        if self.keyword('not'):
+            return negate(self.parse_not())
+        return self.parse_term()
+
+    def parse_term(self) -> Check:
+        """A parenthesized expression or a single check."""
+        kind, text = self.peek()
+        self.pos += 1
+        if kind == 'paren' and text == '(':
+            check = self.parse_or()
+            if self.peek() != ('paren', ')'):
+                raise ValueError("missing ')'")
+            self.pos += 1
+            return check
+        if kind == 'quoted':
+            return message_check(text, text, self.check_case, self.check_exact_word, literal=True)
+        if kind == 'regex':
+            return regex_check(text, self.check_case)
+        if kind != 'word' or text.lower() in {'and', 'or', 'not'}:
+            raise ValueError(f"expected a check, got {text!r}" if text
+                             else "expected a check at the end")
+        if text.startswith(("user:", "user~")) and len(text) > 5:
+            return user_check(text)
+        if text.startswith("time:"):
+            return time_check(text)
+        if text.startswith("len") and len(text) > 3 and text[3] in "<>=":
+            return length_check(text)
+        return message_check(text, strip_query(text), self.check_case, self.check_exact_word)
+
+
+def parse_expression(query: str, check_case: bool = False,
+                     check_exact_word: bool = False) -> Optional[Predicate]:
+    """Compile a "?expression" message query into a line predicate (None for other queries)."""
+    if not query.startswith(EXPRESSION_PREFIX):
+        return None
+    return ExpressionParser(tokenize(query[1:]), check_case, check_exact_word).parse().matches
@@ -0,0 +1,73 @@
+"""Tests of compound query parsing, precedence and errors."""
+import unittest
+
+from expressions import parse_expression, tokenize
+
+
+def matches(query: str, message: str, time: str = "12:00:00", *,
+            check_case: bool = False, check_exact_word: bool = False) -> bool:
+    """Whether a line from "someone" matches an expression."""
+    predicate = parse_expression(query, check_case, check_exact_word)
+    assert predicate is not None
+    return predicate(time, "someone", message)
+
+
+class ExpressionTest(unittest.TestCase):
+    """parse_expression on single checks, operators and malformed input."""
+    def test_plain_queries(self):
+        """Queries without the prefix are not expressions."""
+        self.assertIsNone(parse_expression("pog"))
+
+    def test_tokens(self):
+        """Words, quoted text, regexes and parentheses are split apart."""
+        self.assertEqual(tokenize(' (a OR "b c") /x\\/y/ '), [
+            ('paren', '('), ('word', 'a'), ('word', 'OR'), ('quoted', 'b c'), ('paren', ')'),
+            ('regex', 'x\\/y')])
+
+    def test_precedence(self):
+        """NOT binds tighter than AND, which binds tighter than OR."""
+        self.assertTrue(matches("?a or b and c", "a"))
+        self.assertFalse(matches("?(a or b) and c", "a"))
+        self.assertTrue(matches("?(a or b) and c", "b c"))
+        self.assertFalse(matches("?not a and b", "a b"))
+        self.assertTrue(matches("?not (a and b)", "a"))
+        self.assertTrue(matches("?not not a", "a"))
+        self.assertTrue(matches("?a AND NOT b OR c", "c b"))
+
+    def test_checks(self):
+        """Each kind of check looks at the right part of a line."""
+        self.assertTrue(matches("?user:someone", "hi"))
+        self.assertFalse(matches("?user:some", "hi"))
+        self.assertTrue(matches("?user~ome", "hi"))
+        self.assertTrue(matches("?time:11:30-12:30", "hi"))
+        self.assertFalse(matches("?time:12:30-11:30", "hi"))
+        self.assertTrue(matches("?time:23:00-01:00", "hi", time="00:15:00"))
+        self.assertTrue(matches("?len>2 and len<=3", "abc"))
+        self.assertFalse(matches("?len=2", "abc"))
+        self.assertTrue(matches("?/^h.+o$/", "HELLO"))
+        self.assertFalse(matches("?/^h.+o$/", "HELLO", check_case=True))
+        self.assertTrue(matches("?>he", "hello"))
+        self.assertTrue(matches("?~bye", "hello"))
+        self.assertTrue(matches("?`U", "HELLO"))
+
+    def test_quoted(self):
+        """Quoted text is searched for literally, even if it looks like another query."""
+        self.assertTrue(matches('?"two words"', "say two words"))
+        self.assertFalse(matches('?">he"', "hello"))
+        self.assertTrue(matches('?">he"', "x >he"))
+        self.assertFalse(matches('?"~bye"', "hello"))
+        self.assertFalse(matches('?"`U"', "HELLO"))
+        self.assertTrue(matches('?"hel"', "hello"))
+        self.assertFalse(matches('?"hel"', "hello", check_exact_word=True))
+
+    def test_errors(self):
+        """Malformed expressions are rejected with a message."""
+        for query in ("?", "?a and", "?(a or b", "?a b)", "?or a", "?/[/", "?time:1-2",
+                      "?len<x", "?a not"):
+            with self.subTest(query=query):
+                with self.assertRaises(ValueError):
+                    parse_expression(query)
+
+
+if __name__ == '__main__':
+    unittest.main()
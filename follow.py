@@ -0,0 +1,129 @@
+"""Live statistics of a query over a channel's growing log file."""
+# pylint: disable=too-many-locals,too-many-arguments,too-many-instance-attributes
+import argparse
+import datetime
+import os
+import time
+from typing import Dict, List, Set
+
+from batch import SPEC_DEFAULTS, spec_settings
+from config import Config, load_config, load_purity, load_terms
+from logs import find_dates, log_path, read_appended
+from purity import PurityMatcher
+from ranking import top_items
+from scan import ScanResult, ScanSettings, scan_lines, score_purity
+
+
+def print_stats(result: ScanResult, channel: str, query: str, limit: int, utc_offset: int):
+    """Print the running totals of a followed query."""
+    query_disp = f' matching "{query}"' if query else ''
+    print(f"\n[{datetime.datetime.now():%H:%M:%S}] Messages{query_disp} in #{channel}: "
+          f"{result.total_count}")
+    for date, count in result.daily_count.items():
+        print(f"    {date}: {count}")
+    if (users := result.users):
+        print("Top users:")
+        for key, value in users.top(users['messages'], limit):
+            print(f"    {key}: {value}")
+    if result.words:
+        print("Top words:")
+        for key, value in top_items(result.words, limit):
+            print(f"    {key}: {value}")
+    if users and 'pcount' in users.counters:
+        purity = score_purity(users['pcount'], users['icount'], users['messages'],
+                              users['iweight'])
+        print("Least pure users:")
+        for key, value in users.top(purity, limit, reverse=False):
+            print(f"    {key}: {value}")
+    if (times := result.times):
+        print("By hour:")
+        for key, value in times.items():
+            showkey = str(key % 12 or 12)+(" AM" if key < 12 else " PM")
+            print(f"    {showkey} ({(key-utc_offset) % 24} UTC): {value}")
+
+
+class LogFollower:
+    """Running statistics of a query over a channel's logs, updated from appended lines."""
+    def __init__(self, rootpath: str, channel: str, settings: ScanSettings, bots: Set[str],
+                 purity: PurityMatcher, word_error: float):
+        self.rootpath, self.channel, self.word_error = rootpath, channel, word_error
+        self.settings, self.bots, self.purity = settings, bots, purity
+        self.result = ScanResult(0, word_error)
+        self.offsets: Dict[str, int] = {}
+
+    def refresh(self, dates: List[str]) -> bool:
+        """Scan the lines appended since the last refresh, returning whether any were."""
+        date = dates[-1]  # chatterino starts a new file at midnight
+        # lines written to earlier days since the last refresh (just before midnight) come first,
+        # unless those logs have been archived since
+        pending = [old for old in sorted(self.offsets) if old < date and os.path.exists(
+            f"{self.rootpath}/{self.channel}-{old}.log")] + [date]
+        if any(os.path.getsize(log_path(self.rootpath, self.channel, day))
+               < self.offsets.get(day, 0) for day in pending):
+            # a file was rewritten rather than appended to, start over
+            self.result, self.offsets, pending = ScanResult(0, self.word_error), {}, [date]
+        changed = False
+        for day in pending:
+            offset = self.offsets.get(day, 0)
+            columns, self.offsets[day] = read_appended(self.rootpath, self.channel, day, offset)
+            if self.offsets[day] != offset or day not in self.result.daily_count:
+                changed = True
+                self.result.merge(scan_lines(zip(*columns), day, self.settings, self.bots,
+                                             self.purity))
+        for day in pending[:-1]:  # earlier days are no longer written to
+            del self.offsets[day]
+        return changed
+
+
+def follow(channel: str, spec: Dict, config: Config, interval: float, limit: int, graph: bool):
+    """Scan only newly appended lines of the latest day log on every refresh."""
+    terms = load_terms()
+    settings, _ = spec_settings(spec, config, terms["common_eng"])
+    rootpath = f"{config['logs_folder']}/Twitch/Channels/{channel}"
+    follower = LogFollower(rootpath, channel, settings, set(terms["bots"]),
+                           load_purity(terms, config), config["word_error"])
+    if graph:
+        import matplotlib.pyplot as plt  # pylint: disable=import-outside-toplevel
+        plt.ion()
+    print(f"Following #{channel}, refreshing every {interval:g}s (Ctrl+C to stop)")
+    try:
+        while True:
+            if not (dates := find_dates(rootpath)):
+                print(f"No logs found for #{channel}")
+                return
+            if follower.refresh(dates):
+                result = follower.result
+                print_stats(result, channel, spec["query"], limit, config["utc_offset"])
+                if graph:
+                    plt.clf()
+                    plt.bar(range(24), result.hourly)
+                    plt.title(f"Messages per Hour in #{channel}")
+                    plt.xlabel("Hour")
+                    plt.ylabel("# of messages sent")
+            if graph:
+                plt.pause(interval)
+            else:
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    """Follow a channel's current log and refresh a query's statistics as lines arrive."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("channel", help="channel to follow")
+    parser.add_argument("query", nargs='?', default='', help='"[$user] [message query]"')
+    parser.add_argument("-i", "--interval", type=float, default=5, help="seconds between refreshes")
+    parser.add_argument("-n", "--limit", type=int, default=10, help="users and words to show")
+    parser.add_argument("-w", "--words", action="store_true", help="count words")
+    parser.add_argument("-p", "--purity", action="store_true", help="check purity")
+    parser.add_argument("-g", "--graph", action="store_true", help="show a live hourly graph")
+    args = parser.parse_args()
+    channel = args.channel.lower()
+    spec = {**SPEC_DEFAULTS, "channel": channel, "query": args.query,
+            "count_words": args.words, "check_purity": args.purity}
+    follow(channel, spec, load_config(headless=True), args.interval, args.limit, args.graph)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Tests of following a channel's growing logs."""
+import os
+import tempfile
+import unittest
+
+from batch import SPEC_DEFAULTS, spec_settings
+from config import Config
+from follow import LogFollower
+from purity import PurityMatcher
+
+CONFIG = Config(logs_folder='', utc_offset=0, exclude_commands=False, exclude_bots=False,
+                scan_workers=1, use_index=False, word_error=0.0, profile=False,
+                purity_weights={})
+
+
+class LogFollowerTest(unittest.TestCase):
+    """Appended lines counted once each, across refreshes and midnight."""
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        settings, _ = spec_settings({**SPEC_DEFAULTS, "count_words": True}, CONFIG, ())
+        self.follower = LogFollower(self.folder.name, "chan", settings, set(),
+                                    PurityMatcher({}, {}), 0.0)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def append(self, date: str, text: str):
+        """Append raw text to a day log."""
+        with open(f"{self.folder.name}/chan-{date}.log", 'a', encoding='UTF-8') as file:
+            file.write(text)
+
+    def test_appended(self):
+        """Only new complete lines are scanned, a partial line once it is finished."""
+        self.append("2024-01-01", "[10:00:00]  alice: one\n[10:00:01]  bob: two\n")
+        self.assertTrue(self.follower.refresh(["2024-01-01"]))
+        self.assertEqual(self.follower.result.total_count, 2)
+        self.assertFalse(self.follower.refresh(["2024-01-01"]))
+        self.append("2024-01-01", "[10:00:02]  alice: thr")
+        self.assertFalse(self.follower.refresh(["2024-01-01"]))
+        self.append("2024-01-01", "ee\n")
+        self.assertTrue(self.follower.refresh(["2024-01-01"]))
+        self.assertEqual(self.follower.result.total_count, 3)
+        self.assertEqual(self.follower.result.words["three"], 1)
+
+    def test_midnight(self):
+        """Lines written to the old day before the new day's file appeared are still counted."""
+        self.append("2024-01-01", "[23:59:00]  alice: one\n")
+        self.follower.refresh(["2024-01-01"])
+        self.append("2024-01-01", "[23:59:58]  alice: late\n[23:59:59]  bob: later\n")
+        self.append("2024-01-02", "[00:00:01]  carol: early\n")
+        self.assertTrue(self.follower.refresh(["2024-01-01", "2024-01-02"]))
+        result = self.follower.result
+        self.assertEqual(result.total_count, 4)
+        self.assertEqual(result.daily_count, {"2024-01-01": 3, "2024-01-02": 1})
+        self.assertEqual(result.users.names, ["alice", "bob", "carol"])
+        self.assertFalse(self.follower.refresh(["2024-01-01", "2024-01-02"]))
+        self.assertEqual(self.follower.result.total_count, 4)
+
+    def test_rewritten(self):
+        """A log that shrinks is scanned again from the start."""
+        self.append("2024-01-01", "[10:00:00]  alice: one\n[10:00:01]  bob: two\n")
+        self.follower.refresh(["2024-01-01"])
+        os.remove(f"{self.folder.name}/chan-2024-01-01.log")
+        self.append("2024-01-01", "[10:00:00]  carol: x\n")
+        self.assertTrue(self.follower.refresh(["2024-01-01"]))
+        self.assertEqual(self.follower.result.total_count, 1)
+        self.assertEqual(self.follower.result.users.names, ["carol"])
+
+
+if __name__ == '__main__':
+    unittest.main()
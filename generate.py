@@ -0,0 +1,110 @@
+"""Synthetic Chatterino log trees for benchmarks and testing."""
+# pylint: disable=too-many-arguments,too-many-locals
+import argparse
+import datetime
+import itertools
+import os
+import random
+from typing import List
+
+EMOTES = ("KEKW", "LUL", "PogChamp", "Kappa", "OMEGALUL", "monkaS", "PepeHands", "Sadge",
+          "catJAM", "forsenE", "PogU", "LULW", "5Head", "EZ", "Clap")
+WORDS = ("the", "a", "is", "i", "you", "that", "it", "lol", "what", "this", "no", "yes",
+         "stream", "game", "chat", "why", "so", "just", "how", "good", "he", "was", "not",
+         "play", "win", "lose", "boss", "run", "clip", "time", "again", "now")
+CURSES = ("damn", "hell", "crap", "wtf")
+COMMANDS = ("!uptime", "!title", "!game", "!followage", "!8ball", "!song", "!commands")
+BOTS = ("nightbot", "streamelements", "fossabot", "moobot")
+
+
+def emote_vocabulary(emotes: int) -> List[str]:
+    """Emote names, padded with numbered ones if more are asked for than are known."""
+    return [*EMOTES[:emotes], *(f"emote{i}" for i in range(len(EMOTES), emotes))]
+
+
+def random_message(rng: random.Random, emotes: List[str]) -> str:
+    """A chat message in one of the shapes that query modes distinguish."""
+    words = rng.choices(WORDS, k=rng.randint(1, 12))
+    if rng.random() < 0.03:
+        words.append(rng.choice(CURSES))
+    shape = rng.random()
+    if shape < 0.25 and emotes:  # emote spam
+        return ' '.join([rng.choice(emotes)] * rng.randint(1, 6))
+    if shape < 0.30:
+        return ' '.join(words).upper()
+    if shape < 0.40:
+        return ' '.join(words).capitalize()
+    if shape < 0.70 and emotes:
+        words.insert(rng.randrange(len(words)+1), rng.choice(emotes))
+    return ' '.join(words)
+
+
+def generate_logs(folder: str, channels: int = 1, days: int = 7, messages: int = 10000,
+                  users: int = 1000, user_skew: float = 1.1, command_ratio: float = 0.05,
+                  bot_ratio: float = 0.05, emotes: int = 50, start_date: str = "2023-01-01",
+                  seed: int = 0) -> List[str]:
+    """Write day logs of Zipf-distributed users chatting, returning the channel names."""
+    rng = random.Random(seed)
+    emote_names = emote_vocabulary(emotes)
+    user_names = [f"user{i}" for i in range(users)]
+    user_weights = list(itertools.accumulate(1 / rank**user_skew for rank in range(1, users+1)))
+    channel_names = [f"channel{i}" for i in range(channels)]
+    start = datetime.date.fromisoformat(start_date)
+    for channel in channel_names:
+        rootpath = f"{folder}/Twitch/Channels/{channel}"
+        os.makedirs(rootpath, exist_ok=True)
+        for day in range(days):
+            date = (start + datetime.timedelta(days=day)).isoformat()
+            seconds = sorted(rng.randrange(24*60*60) for _ in range(messages))
+            lines = [f"# Start logging at {date} 00:00:00 UTC\n"]
+            for second in seconds:
+                time = f"{second//3600:02}:{second//60 % 60:02}:{second % 60:02}"
+                kind = rng.random()
+                if kind < bot_ratio:
+                    user, message = rng.choice(BOTS), random_message(rng, emote_names)
+                else:
+                    user = rng.choices(user_names, cum_weights=user_weights)[0]
+                    message = (f"{rng.choice(COMMANDS)} {rng.choice(WORDS)}"
+                               if kind < bot_ratio+command_ratio
+                               else random_message(rng, emote_names))
+                lines.append(f"[{time}]  {user}: {message}\n")
+            with open(f"{rootpath}/{channel}-{date}.log", 'w', encoding="UTF-8") as file:
+                file.writelines(lines)
+    return channel_names
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add the generator's options to a command line parser."""
+    parser.add_argument("--channels", type=int, default=1, help="number of channels")
+    parser.add_argument("--days", type=int, default=7, help="days of logs per channel")
+    parser.add_argument("--messages", type=int, default=10000, help="messages per day")
+    parser.add_argument("--users", type=int, default=1000, help="number of chatters")
+    parser.add_argument("--user-skew", type=float, default=1.1,
+                        help="Zipf exponent of messages per user (0 for uniform)")
+    parser.add_argument("--command-ratio", type=float, default=0.05,
+                        help="share of !command messages")
+    parser.add_argument("--bot-ratio", type=float, default=0.05, help="share of bot messages")
+    parser.add_argument("--emotes", type=int, default=50, help="size of the emote vocabulary")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+
+
+def generator_options(args: argparse.Namespace) -> dict:
+    """Generator keyword arguments from parsed command line options."""
+    return {"channels": args.channels, "days": args.days, "messages": args.messages,
+            "users": args.users, "user_skew": args.user_skew,
+            "command_ratio": args.command_ratio, "bot_ratio": args.bot_ratio,
+            "emotes": args.emotes, "seed": args.seed}
+
+
+def main():
+    """Write a synthetic logs directory that can be used as the configured logs folder."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("folder", help="logs directory to write to")
+    add_arguments(parser)
+    args = parser.parse_args()
+    channels = generate_logs(args.folder, **generator_options(args))
+    print(f"Wrote {args.days} days of logs for {', '.join(channels)} to {args.folder}")
+
+
+if __name__ == "__main__":
+    main()
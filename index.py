@@ -0,0 +1,124 @@
+"""Per-channel inverted word index for narrowing message queries."""
+from array import array
+from collections import defaultdict
+import os
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from logs import CACHE_FOLDER, log_path, read_day
+from patterns import MessageQuery
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS days (date TEXT PRIMARY KEY, size INTEGER, mtime INTEGER);
+CREATE TABLE IF NOT EXISTS tokens (id INTEGER PRIMARY KEY, token TEXT UNIQUE);
+CREATE TABLE IF NOT EXISTS postings (token_id INTEGER, date TEXT, rows BLOB,
+                                     PRIMARY KEY (token_id, date)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_date ON postings (date);
+CREATE TABLE IF NOT EXISTS suffixes (suffix TEXT, token_id INTEGER,
+                                     PRIMARY KEY (suffix, token_id)) WITHOUT ROWID;
+CREATE TEMP TABLE IF NOT EXISTS day_tokens (token TEXT PRIMARY KEY);
+"""
+INDEX_VERSION = 2  # bumped whenever SCHEMA changes, so older indexes are rebuilt
+SUFFIX_LENGTH = 16  # longer needles are looked up by their start, then checked by the scan
+
+
+def index_path(channel: str) -> str:
+    """Path of a channel's index database."""
+    return f"{CACHE_FOLDER}/{channel}/index.sqlite3"
+
+
+def open_index(channel: str) -> sqlite3.Connection:
+    """Open (creating if needed) a channel's index database."""
+    os.makedirs(os.path.dirname(index_path(channel)), exist_ok=True)
+    conn = sqlite3.connect(index_path(channel))
+    if conn.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+        conn.executescript("DROP TABLE IF EXISTS days; DROP TABLE IF EXISTS postings;"
+                           "DROP TABLE IF EXISTS tokens; DROP TABLE IF EXISTS suffixes;"
+                           f"PRAGMA user_version = {INDEX_VERSION};")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def prefix_range(prefix: str) -> Tuple[str, str]:
+    """Bounds of the strings starting with a prefix, for an indexed range lookup."""
+    last = ord(prefix[-1]) + 1
+    if last == 0xD800:  # surrogates can't be stored, skip past them
+        last = 0xE000
+    # U+10FFFF is a noncharacter, chat messages never hold it
+    return prefix, prefix[:-1] + chr(min(last, 0x10FFFF))
+
+
+def index_needle(query: MessageQuery) -> Optional[str]:
+    """Lowercased token substring every match must contain, if the query allows one."""
+    needle = query.fix_query.lower()
+    if query.kind in {'include', 'start', 'end'} and needle and needle.split() == [needle]:
+        return needle
+    return None
+
+
+def update_index(conn: sqlite3.Connection, rootpath: str, channel: str, dates: List[str]):
+    """Index any of the given days that are new or have changed since last indexed."""
+    indexed = {date: (size, mtime) for date, size, mtime
+               in conn.execute("SELECT date, size, mtime FROM days")}
+    stale = []
+    for date in dates:
+        stat = os.stat(log_path(rootpath, channel, date))
+        if indexed.get(date) != (stat.st_size, stat.st_mtime_ns):
+            stale.append((date, stat))
+    if not stale:
+        return
+    stale_len = len(stale)
+    for stale_i, (date, stat) in enumerate(stale, start=1):
+        print(f"Indexing logs... ({stale_i}/{stale_len})", end='\r')
+        postings: Dict[str, array] = defaultdict(lambda: array('I'))
+        for row, message in enumerate(read_day(rootpath, channel, date)[2]):
+            for token in set(message.lower().split()):
+                postings[token].append(row)
+        with conn:
+            # only the day's own tokens are looked up, never the whole vocabulary
+            conn.execute("DELETE FROM day_tokens")
+            conn.executemany("INSERT INTO day_tokens (token) VALUES (?)",
+                             ((token,) for token in postings))
+            new_tokens = [token for token, in conn.execute(
+                "SELECT token FROM day_tokens WHERE token NOT IN (SELECT token FROM tokens)")]
+            conn.executemany("INSERT INTO tokens (token) VALUES (?)",
+                             ((token,) for token in new_tokens))
+            token_ids: Dict[str, int] = dict(conn.execute(
+                "SELECT token, id FROM tokens JOIN day_tokens USING (token)"))
+            conn.executemany("INSERT OR IGNORE INTO suffixes (suffix, token_id) VALUES (?, ?)",
+                             ((token[start:start+SUFFIX_LENGTH], token_ids[token])
+                              for token in new_tokens for start in range(len(token))))
+            conn.execute("DELETE FROM postings WHERE date = ?", (date,))
+            conn.executemany("INSERT INTO postings (token_id, date, rows) VALUES (?, ?, ?)",
+                             ((token_ids[token], date, rows.tobytes())
+                              for token, rows in postings.items()))
+            conn.execute("INSERT OR REPLACE INTO days (date, size, mtime) VALUES (?, ?, ?)",
+                         (date, stat.st_size, stat.st_mtime_ns))
+
+
+def find_candidates(rootpath: str, channel: str, dates: List[str],
+                    query: MessageQuery) -> Optional[Dict[str, List[int]]]:
+    """Rows per day that could match the query, or None if the index can't narrow it."""
+    if (needle := index_needle(query)) is None:
+        return None
+    conn = open_index(channel)
+    try:
+        update_index(conn, rootpath, channel, dates)
+        # tokens holding the needle are found by range lookups on their (truncated) suffixes,
+        # or on the tokens themselves when the needle must start the message
+        if query.kind == 'start':
+            token_ids = [token_id for token_id, in conn.execute(
+                "SELECT id FROM tokens WHERE token >= ? AND token < ?", prefix_range(needle))]
+        else:
+            token_ids = [token_id for token_id, in conn.execute(
+                "SELECT DISTINCT token_id FROM suffixes WHERE suffix >= ? AND suffix < ?",
+                prefix_range(needle[:SUFFIX_LENGTH]))]
+        selected, candidates = set(dates), defaultdict(set)
+        for token_id in token_ids:
+            for date, rows in conn.execute(
+                    "SELECT date, rows FROM postings WHERE token_id = ?", (token_id,)):
+                if date in selected:
+                    candidates[date].update(array('I', rows))
+    finally:
+        conn.close()
+    return {date: sorted(rows) for date, rows in candidates.items()}
@@ -0,0 +1,104 @@
+"""Tests of the word index against full scans of the logs."""
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from typing import Dict, List
+
+from generate import generate_logs
+from index import SUFFIX_LENGTH, find_candidates, index_path, open_index
+from logs import read_day
+from patterns import MessageQuery, strip_query
+
+DATES = ["2023-01-01", "2023-01-02", "2023-01-03"]
+LONG_TOKEN = "pogchampionshipvictoryroyale"
+QUERIES = [("lol", False, False), ("KEKW", True, False), ("og", False, False),
+           (">lol", False, False), ("lul<", False, False), (">og", False, False),
+           ("LUL", True, True), ("e", False, False), ("Sadge", False, True),
+           (LONG_TOKEN[3:], False, False), (LONG_TOKEN.upper(), True, False),
+           ("notinthelogsatall", False, False)]
+
+
+class IndexTest(unittest.TestCase):
+    """Candidate rows hold every match of a full scan, and only rows with a matching token."""
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.cwd = os.getcwd()
+        os.chdir(self.folder.name)  # the index is written relative to the working directory
+        (self.channel,) = generate_logs(".", days=len(DATES), messages=500, users=30, seed=2)
+        self.root = f"./Twitch/Channels/{self.channel}"
+        self.append(DATES[1], f"[23:59:59]  user1: {LONG_TOKEN} lol\n")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.folder.cleanup()
+
+    def append(self, date: str, text: str):
+        """Append raw text to a day log."""
+        with open(f"{self.root}/{self.channel}-{date}.log", 'a', encoding='UTF-8') as file:
+            file.write(text)
+
+    def candidates(self, query: MessageQuery, dates: List[str]) -> Dict[str, List[int]]:
+        """Candidate rows per day, updating the index quietly."""
+        with contextlib.redirect_stdout(io.StringIO()):  # progress
+            found = find_candidates(self.root, self.channel, dates, query)
+        self.assertIsNotNone(found)
+        return found  # type: ignore
+
+    def assert_candidates(self, dates: List[str]):
+        """Every query's candidates against a scan of every message of the given days."""
+        for text, check_case, check_exact_word in QUERIES:
+            query = MessageQuery(text, strip_query(text), check_case, check_exact_word)
+            needle = query.fix_query.lower()
+            with self.subTest(query=text):
+                found = self.candidates(query, dates)
+                self.assertLessEqual(set(found), set(dates))
+                for date in dates:
+                    messages = read_day(self.root, self.channel, date)[2]
+                    rows = found.get(date, [])
+                    matches = [row for row, message in enumerate(messages)
+                               if query.matches(message)]
+                    self.assertLessEqual(set(matches), set(rows), date)
+                    tokens = [row for row, message in enumerate(messages) if any(
+                        token.startswith(needle) if query.kind == 'start' else needle in token
+                        for token in message.lower().split())]
+                    self.assertEqual(rows, tokens, date)
+
+    def test_candidates(self):
+        """Substring, prefix, suffix and long needles narrow to the right rows."""
+        self.assertGreater(len(LONG_TOKEN), SUFFIX_LENGTH)
+        self.assert_candidates(DATES)
+        self.assert_candidates(DATES[1:2])
+
+    def test_updated(self):
+        """Days are indexed again once their logs grow or are rewritten."""
+        self.assert_candidates(DATES)
+        self.append(DATES[0], f"[23:59:59]  user2: {LONG_TOKEN.upper()}\n")
+        self.assert_candidates(DATES)
+        with open(f"{self.root}/{self.channel}-{DATES[1]}.log", 'w', encoding='UTF-8') as file:
+            file.write("[00:00:01]  user3: og lol\n")
+        self.assert_candidates(DATES)
+
+    def test_unindexable(self):
+        """Queries without a single token to look up are left to the scan."""
+        for text in ("`U", "~lol", "lol KEKW"):
+            query = MessageQuery(text, strip_query(text), False, False)
+            self.assertIsNone(find_candidates(self.root, self.channel, DATES, query))
+
+    def test_old_schema(self):
+        """An index written by an older version is rebuilt rather than read."""
+        os.makedirs(os.path.dirname(index_path(self.channel)))
+        with sqlite3.connect(index_path(self.channel)) as conn:
+            conn.execute("CREATE TABLE days (date TEXT PRIMARY KEY, size INTEGER, mtime INTEGER)")
+            conn.execute("INSERT INTO days VALUES (?, 0, 0)", (DATES[0],))
+        conn.close()
+        conn = open_index(self.channel)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM days").fetchone(), (0,))
+        conn.close()
+        self.assert_candidates(DATES)
+
+
+if __name__ == '__main__':
+    unittest.main()
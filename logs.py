@@ -0,0 +1,200 @@
+"""Log file reading and parsed-log caching."""
+import io
+import mmap
+import os
+import re
+import struct
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union
+
+from catalog import ARCHIVE_SUFFIXES, date_catalog
+from timing import Profile
+
+LINE_PATTERN = re.compile(r"^\[([\d:]*)\]  ?([a-z\d_]*): (.*)$")
+DATE_RANGE_PATTERN = r"^(?:>(?P<start>[\d-]+))? ?(?:(?P<end>[\d-]+)<)?$"
+CACHE_FOLDER = "cache"
+CACHE_MAGIC, CACHE_VERSION = b"CLEC", 1
+# magic, version, log size, log mtime (ns), row count, time/user/message column lengths
+CACHE_HEADER = struct.Struct("<4sHQqIQQQ")
+
+Columns = Tuple[List[str], List[str], List[str]]
+
+
+def log_path(rootpath: str, channel: str, date: str) -> str:
+    """Path of a channel's log file for a given date, compressed if only an archive exists."""
+    path = f"{rootpath}/{channel}-{date}.log"
+    if os.path.exists(path):
+        return path
+    for suffix in ARCHIVE_SUFFIXES:
+        if os.path.exists(path+suffix):
+            return path+suffix
+    return path
+
+
+def open_log(path: str) -> BinaryIO:
+    """Open a log file as a stream of its bytes, decompressing archives on the fly."""
+    # pylint: disable=import-outside-toplevel,consider-using-with
+    if path.endswith(".gz"):
+        import gzip
+        return gzip.open(path, 'rb')  # type: ignore
+    if path.endswith(".xz"):
+        import lzma
+        return lzma.open(path, 'rb')  # type: ignore
+    if path.endswith(".zst"):
+        import zstandard  # only needed for .zst archives
+        return zstandard.ZstdDecompressor().stream_reader(  # type: ignore
+            open(path, 'rb'), read_across_frames=True, closefd=True)
+    return open(path, 'rb')
+
+
+def find_dates(rootpath: str, startdate_num: int = 0, enddate_num: int = 10**8) -> List[str]:
+    """Sorted dates of a channel's log files within an inclusive YYYYMMDD range."""
+    return date_catalog(rootpath).find(startdate_num, enddate_num)
+
+
+def resolve_dates(rootpath: str, dates_input: str) -> List[str]:
+    """Dates selected by a dates input (listed dates, >start and/or end<, or blank for all)."""
+    dates = [re.sub(r'-(?:(?P<digit>\d))\b', r'-0\g<digit>', date)  # YYYY-M-D -> YYYY-MM-DD
+             for date in dates_input.split()]
+    if (cdates := re.fullmatch(DATE_RANGE_PATTERN, ' '.join(dates))):
+        startdate, enddate = cdates['start'], cdates['end']
+        return find_dates(rootpath, int(startdate.replace('-', '')) if startdate else 0,
+                          int(enddate.replace('-', '')) if enddate else 10**8)
+    return dates
+
+
+def cache_path(channel: str, date: str) -> str:
+    """Path of the parsed cache file for a channel's log on a given date."""
+    return f"{CACHE_FOLDER}/{channel}/{channel}-{date}.bin"
+
+
+def format_line(time: str, user: str, message: str) -> str:
+    """Rebuild a log line from its parsed parts."""
+    return f"[{time}]  {user}: {message}"
+
+
+def parse_lines(lines: Iterable[str]) -> Columns:
+    """Parse raw log lines into time, user and message columns."""
+    times, users, messages = [], [], []
+    for line in lines:
+        if (cmsg := LINE_PATTERN.fullmatch(line.strip())):
+            time, user, message = cmsg.groups()
+            times.append(time)
+            users.append(user)
+            messages.append(message)
+    return times, users, messages
+
+
+def find_user_lines(data: Union[bytes, mmap.mmap], user_query: str,
+                    check_exact_name: bool) -> Iterator[Tuple[str, str, str]]:
+    """Parse only the queried user's lines from raw log bytes, decoding just those."""
+    user_query_b = user_query.encode('UTF-8')
+    needle = user_query_b + b": " if check_exact_name else user_query_b
+    pos = data.find(needle)
+    while pos != -1:
+        # lines end at \n, \r or \r\n, as they do when read as text
+        start = data.rfind(b'\n', 0, pos) + 1
+        start = data.rfind(b'\r', start, pos) + 1 or start
+        if (end := data.find(b'\n', pos)) == -1:
+            end = len(data)
+        if (end_r := data.find(b'\r', pos, end)) != -1:
+            end = end_r
+        line = data[start:end].decode('UTF-8', errors='replace')
+        if (cmsg := LINE_PATTERN.fullmatch(line.strip())):
+            time, user, message = cmsg.groups()
+            if user == user_query if check_exact_name else user_query in user:
+                yield time, user, message
+        pos = data.find(needle, end)
+
+
+def read_user_lines(rootpath: str, channel: str, date: str,
+                    user_query: str, check_exact_name: bool) -> Iterator[Tuple[str, str, str]]:
+    """Parse only the queried user's lines from a memory-mapped (or decompressed) log."""
+    path = log_path(rootpath, channel, date)
+    if path.endswith(ARCHIVE_SUFFIXES):
+        with open_log(path) as file:
+            yield from find_user_lines(file.read(), user_query, check_exact_name)
+        return
+    with open(path, 'rb') as file:
+        if not os.fstat(file.fileno()).st_size:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from find_user_lines(data, user_query, check_exact_name)
+
+
+def read_appended(rootpath: str, channel: str, date: str, offset: int) -> Tuple[Columns, int]:
+    """Parse the complete lines written to a log after a byte offset, and the offset they end at."""
+    with open_log(log_path(rootpath, channel, date)) as file:
+        file.seek(offset)
+        data = file.read()
+    # a trailing line without its newline may still be being written, leave it for next time
+    end = data.rfind(b'\n') + 1
+    lines = io.TextIOWrapper(io.BytesIO(data[:end]), encoding='UTF-8', errors='replace')
+    return parse_lines(lines), offset + end
+
+
+def write_cache(path: str, stat: os.stat_result, columns: Columns):
+    """Store parsed columns as newline-joined UTF-8 blobs behind a fixed header."""
+    blobs = ['\n'.join(column).encode('UTF-8') for column in columns]
+    header = CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, stat.st_size, stat.st_mtime_ns,
+                               len(columns[0]), *(len(blob) for blob in blobs))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path+".tmp", 'wb') as file:
+        file.write(header)
+        for blob in blobs:
+            file.write(blob)
+    os.replace(path+".tmp", path)
+
+
+def cache_lengths(data: bytes, stat: os.stat_result) -> Optional[Tuple[int, ...]]:
+    """Row count and column lengths from a cache header, if it matches the log's size and mtime."""
+    if len(data) < CACHE_HEADER.size:
+        return None
+    magic, version, size, mtime, *lengths = CACHE_HEADER.unpack_from(data)
+    if (magic, version, size, mtime) != (CACHE_MAGIC, CACHE_VERSION,
+                                         stat.st_size, stat.st_mtime_ns):
+        return None
+    return tuple(lengths)
+
+
+def read_cache(path: str, stat: os.stat_result) -> Optional[Columns]:
+    """Load parsed columns if the cache matches the log's current size and mtime."""
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except OSError:
+        return None
+    if (lengths := cache_lengths(data, stat)) is None:
+        return None
+    if not lengths[0]:  # no rows
+        return [], [], []
+    columns, offset = [], CACHE_HEADER.size
+    for length in lengths[1:]:
+        columns.append(data[offset:offset+length].decode('UTF-8').split('\n'))
+        offset += length
+    return columns[0], columns[1], columns[2]
+
+
+def read_day(rootpath: str, channel: str, date: str, use_cache: bool = True,
+             profile: Optional[Profile] = None) -> Columns:
+    """Read a day's parsed log, rebuilding its cache only if the log has changed."""
+    path = log_path(rootpath, channel, date)
+    stat = os.stat(path)
+    if use_cache and (columns := read_cache(cache_path(channel, date), stat)) is not None:
+        if profile:
+            profile.lap('cache')
+        return columns
+    with open_log(path) as file:
+        data = file.read()
+    if profile:
+        profile.lap('read')
+    columns = parse_lines(io.TextIOWrapper(io.BytesIO(data), encoding='UTF-8', errors='replace'))
+    if profile:
+        profile.lap('parse')
+    if use_cache:
+        try:
+            write_cache(cache_path(channel, date), stat, columns)
+        except OSError:
+            pass
+        if profile:
+            profile.lap('cache')
+    return columns
@@ -0,0 +1,152 @@
+"""Tests of the parsed-log cache and of the byte-level user line parser."""
+import gzip
+import io
+import os
+import tempfile
+import unittest
+
+from logs import (cache_path, parse_lines, read_cache, read_day, read_user_lines,
+                  write_cache)
+
+LINES = ["[00:00:01]  alice: hello there", "[00:00:02]  bob: ünïcödé ✓ KEKW",
+         "[12:34:56]  alice: !command arg", "not a log line", "[23:59:59]  carol: bye"]
+COLUMNS = (["00:00:01", "00:00:02", "12:34:56", "23:59:59"], ["alice", "bob", "alice", "carol"],
+           ["hello there", "ünïcödé ✓ KEKW", "!command arg", "bye"])
+
+
+class CacheTest(unittest.TestCase):
+    """Cache files written and read back, or rejected once stale."""
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.cwd = os.getcwd()
+        os.chdir(self.folder.name)  # the cache folder is relative to the working directory
+        self.log = "chan-2024-01-01.log"
+        self.write_log(LINES)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.folder.cleanup()
+
+    def write_log(self, lines):
+        """Write the day log."""
+        with open(self.log, 'w', encoding='UTF-8') as file:
+            file.write('\n'.join(lines) + '\n')
+
+    def test_round_trip(self):
+        """Columns come back as they were written."""
+        path = cache_path("chan", "2024-01-01")
+        write_cache(path, os.stat(self.log), COLUMNS)
+        self.assertEqual(read_cache(path, os.stat(self.log)), COLUMNS)
+
+    def test_empty(self):
+        """A log without parsed lines caches as empty columns."""
+        path = cache_path("chan", "2024-01-01")
+        write_cache(path, os.stat(self.log), ([], [], []))
+        self.assertEqual(read_cache(path, os.stat(self.log)), ([], [], []))
+
+    def test_stale_size(self):
+        """A cache is ignored once its log has grown."""
+        path = cache_path("chan", "2024-01-01")
+        stat = os.stat(self.log)
+        write_cache(path, stat, COLUMNS)
+        self.write_log(LINES + ["[23:59:59]  dave: late"])
+        os.utime(self.log, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertIsNone(read_cache(path, os.stat(self.log)))
+
+    def test_stale_mtime(self):
+        """A cache is ignored once its log has been modified, even at the same size."""
+        path = cache_path("chan", "2024-01-01")
+        stat = os.stat(self.log)
+        write_cache(path, stat, COLUMNS)
+        os.utime(self.log, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNone(read_cache(path, os.stat(self.log)))
+
+    def test_missing_or_corrupt(self):
+        """Missing, truncated or foreign cache files are ignored."""
+        path = cache_path("chan", "2024-01-01")
+        self.assertIsNone(read_cache(path, os.stat(self.log)))
+        write_cache(path, os.stat(self.log), COLUMNS)
+        with open(path, 'r+b') as file:
+            file.write(b"XXXX")
+        self.assertIsNone(read_cache(path, os.stat(self.log)))
+        with open(path, 'wb') as file:
+            file.write(b"CLEC")
+        self.assertIsNone(read_cache(path, os.stat(self.log)))
+
+    def test_read_day(self):
+        """Day logs are parsed once, then read from the cache until they change."""
+        self.assertEqual(read_day(".", "chan", "2024-01-01"), COLUMNS)
+        path = cache_path("chan", "2024-01-01")
+        self.assertEqual(read_cache(path, os.stat(self.log)), COLUMNS)
+        self.assertEqual(read_day(".", "chan", "2024-01-01"), COLUMNS)
+        self.write_log(LINES[:1])
+        expected = tuple(column[:1] for column in COLUMNS)
+        self.assertEqual(read_day(".", "chan", "2024-01-01"), expected)
+        self.assertEqual(read_cache(path, os.stat(self.log)), expected)
+
+    def test_read_day_without_cache(self):
+        """Uncached reads leave no cache behind."""
+        self.assertEqual(read_day(".", "chan", "2024-01-01", use_cache=False), COLUMNS)
+        self.assertFalse(os.path.exists(cache_path("chan", "2024-01-01")))
+
+
+USER_LOG = ("[00:00:01]  alice: plain\n"
+            "[00:00:02]  alice: split\rhere\n"
+            "[00:00:03]  alice: windows\r\n"
+            "[00:00:04]  bob: alice: quoted\r[00:00:05]  alice: after a lone cr\n"
+            "[00:00:06]  alicé: accented name\n"
+            "[00:00:07]  ali٣ce: arabic digit\n"
+            "[00:00:08]  alice:   \n"
+            "[00:00:09]  alice: trailing space \x0c\n"
+            "\x0c [00:00:10]  alice: leading form feed\n"
+            "[00:00:11] alice: one space\n"
+            "[0a:00:12]  alice: bad time\n"
+            "alice: no time\n"
+            "[00:00:13]  malice: partial ünïcödé\n"
+            "[00:00:14]  alice: \xa0nbsp\xa0\n"
+            "[00:00:15]  alice: no newline")
+
+
+class UserLinesTest(unittest.TestCase):
+    """The byte-level user line parser against parsing the whole log as text."""
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def assert_same_lines(self, data: bytes, suffix: str = ''):
+        """Lines of each queried user, found both ways."""
+        path = f"{self.folder.name}/chan-2024-01-01.log{suffix}"
+        with (gzip.open if suffix else open)(path, 'wb') as file:
+            file.write(data)
+        columns = parse_lines(io.TextIOWrapper(io.BytesIO(data), encoding='UTF-8',
+                                               errors='replace'))
+        for user_query, check_exact_name in (("alice", True), ("alice", False), ("ali", False),
+                                             ("bob", True), ("ce", False), ("alicé", True)):
+            with self.subTest(user_query=user_query, check_exact_name=check_exact_name):
+                expected = [line for line in zip(*columns)
+                            if (line[1] == user_query if check_exact_name
+                                else user_query in line[1])]
+                self.assertEqual(list(read_user_lines(self.folder.name, "chan", "2024-01-01",
+                                                      user_query, check_exact_name)), expected)
+
+    def test_text_lines(self):
+        """Carriage returns, odd whitespace, non-ASCII names and malformed lines agree."""
+        self.assert_same_lines(USER_LOG.encode('UTF-8'))
+
+    def test_invalid_utf8(self):
+        """Undecodable bytes are replaced the same way."""
+        self.assert_same_lines(USER_LOG.encode('UTF-8').replace(b"plain", b"pl\xffain"))
+
+    def test_archive(self):
+        """Compressed logs are parsed the same way."""
+        self.assert_same_lines(USER_LOG.encode('UTF-8'), ".gz")
+
+    def test_empty(self):
+        """Empty logs have no lines."""
+        self.assert_same_lines(b"")
+
+
+if __name__ == '__main__':
+    unittest.main()
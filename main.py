@@ -1,535 +1,558 @@
 """Execution of log analysis."""
-# pylint: disable=invalid-name,multiple-statements
-from collections import defaultdict
-import json
-import os
+# pylint: disable=invalid-name,multiple-statements,too-many-locals,too-many-branches
+# pylint: disable=too-many-statements,too-many-nested-blocks
+from functools import partial
 import random
 import re
-import sys
-from tkinter.filedialog import askdirectory
-from typing import TypedDict
-
-import matplotlib.pyplot as plt
-import numpy
-
-from patterns import check_msg
-
-
-class Config(TypedDict):
-    """Configuration data for default operation."""
-    logs_folder: str
-    utc_offset: int
-    exclude_commands: bool
-    exclude_bots: bool
-
-
-def sort_dict(d: dict, use_value: bool = False, reverse: bool = False):
-    """Shorthand for sorting dictionaries through list sorting."""
-    index = 1 if use_value else 0
-    return dict(sorted(d.items(), key=lambda item: item[index], reverse=reverse))
-
-config: Config = {"logs_folder": '',
-                  "utc_offset": 0,
-                  "exclude_commands": False,
-                  "exclude_bots": False}
-try:
-    with open("config.json", 'r', encoding="UTF-8") as file:
-        config = json.loads(file.read())
-except FileNotFoundError:
-    print("Configuration file missing, starting first-time setup:")
-    logs_folder = askdirectory(title='Select your Chatterino logs directory " \
-                               "(see Chatterino Settings >> Moderation >> Logs)')
-    utc_offset = input("Input +/- UTC offset (e.g. UTC-6 = -6): ").strip()
-    utc_offset = int(utc_offset) if utc_offset.lstrip('-+').isnumeric() else 0
-    exclude_commands = input(
-        "Exclude !command messages? [unless checking commands specifically] (y/n): "
-        ).strip() == 'y'
-    exclude_bots = input(
-        "Exclude bot messages? [doesn't apply if checking exact username] (y/n): "
-        ).strip() == 'y'
-    config = {"logs_folder": logs_folder,
-              "utc_offset": utc_offset,
-              "exclude_commands": exclude_commands,
-              "exclude_bots": exclude_bots}
-    with open("config.json", 'w', encoding="UTF-8") as file:
-        file.write(json.dumps(config, indent=4, separators=(',', ': ')))
-    print("Configuration saved:")
-    print(f"    Logs directory: {logs_folder}")
-    print(f"    UTC offset: {utc_offset}")
-    print(f"    Commands excluded: {exclude_commands}")
-    print(f"    Bots excluded: {exclude_bots}")
-else:
+from typing import TYPE_CHECKING
+
+from catalog import date_catalog, find_channels, select_channels
+from config import load_config, load_purity, load_terms
+from export import ExportSink, export_parts, result_tables
+from expressions import EXPRESSION_PREFIX, parse_expression
+from index import find_candidates
+from logs import DATE_RANGE_PATTERN, find_dates
+from patterns import QUERY_PATTERN, MessageQuery, split_query
+from purity import PURITY_TYPES
+from ranking import SpaceSaving, top_items
+from timing import Profile
+
+if TYPE_CHECKING:
+    from scan import ScanSettings
+    from users import UserStats
+
+
+def divide_counts(d: dict, divisor) -> dict:
+    """Truncated division of dictionary values by a number or per-key sequence, as one array op."""
+    import numpy  # pylint: disable=import-outside-toplevel
+    values = numpy.fromiter(d.values(), dtype=float, count=len(d))
+    return dict(zip(d, (values / numpy.asarray(divisor, dtype=float)).astype(int).tolist()))
+
+
+def category_disp(users: "UserStats", user_id: int) -> str:
+    """Term hits per purity category of a user, for display."""
+    hits = [f"{ptype}: {users[ptype][user_id]}" for ptype in PURITY_TYPES
+            if users[ptype][user_id]]
+    return f" ({', '.join(hits)})" if hits else ''
+
+
+def main():
+    """Run the interactive query loop."""
+    config = load_config()
     logs_folder = config["logs_folder"]
     utc_offset = config["utc_offset"]
     exclude_commands = config["exclude_commands"]
     exclude_bots = config["exclude_bots"]
+    scan_workers = config["scan_workers"]
+    use_index = config["use_index"]
+    word_error = config["word_error"]
+    profile_queries = config["profile"]
+
+    terms = load_terms()
+    BOTS = set(terms["bots"])
+    COMMON_ENG = terms["common_eng"]
+    PURITY = load_purity(terms, config)  # every purity term list in one weighted matcher
+
+    print('\n'.join([line.center(50, '=') for line in ('', "Chatterino Chat Log Explorer", '')]))
 
-ttypes = {"bots", "common_eng", "strong_curse", "mild_curse", "sexual"}
-if (missing_ttypes := [ttype for ttype in ttypes if not os.path.isfile(ttype+".txt")]):
-    print("At least one term list was missing and has been created:")
-    for ttype in missing_ttypes:
-        print(f"    {ttype}.txt")
-        with open(ttype+".txt", 'w', encoding="UTF-8") as file: pass
-    print("Please add terms as desired and restart the program (one lowercase term per line).")
-    sys.exit()
-
-with open("bots.txt", 'r', encoding="UTF-8") as file:
-    BOTS = set(file.read().splitlines())
-with open("common_eng.txt", 'r', encoding="UTF-8") as file:
-    COMMON_ENG = tuple(file.read().splitlines())
-with open("strong_curse.txt", 'r', encoding="UTF-8") as file:
-    STRONG_CURSE = set(file.read().splitlines())
-with open("mild_curse.txt", 'r', encoding="UTF-8") as file:
-    MILD_CURSE = set(file.read().splitlines())
-with open("sexual.txt", 'r', encoding="UTF-8") as file:
-    SEXUAL = set(file.read().splitlines())
-PURITY_TERMS = STRONG_CURSE | MILD_CURSE | SEXUAL  # separate only for organization
-
-print('\n'.join([line.center(50, '=') for line in ('', "Chatterino Chat Log Explorer", '')]))
-
-while True:
-    channels, channels_disp = [], []
-    channels = [item for item in os.scandir(f"{logs_folder}/Twitch/Channels/") if item.is_dir()]
-    channels_disp = [f"{i} - {channel.name}" for i, channel in enumerate(channels, start=1)]
-    print(f'Valid channels:\n{", ".join(channels_disp)}')
     while True:
-        channel = input("\nInput username/number from list: ").strip().lower()
-        if channel.isnumeric() and int(channel)-1 in range(len(channels)):
-            channel = channels[int(channel)-1].name
-            break
-        if channel in {channel.name for channel in channels}: break
-    print(f"    Selected channel: {channel}")
-    rootpath = f"{logs_folder}/Twitch/Channels/{channel}"
-
-    dates = input("Input dates (YYYY-MM-DD) separated by spaces " \
-                  "[or >start and/or end<] (leave blank for all dates): ").split()
-    date_find, date_replace = r'-(?:(?P<digit>\d))\b', r'-0\g<digit>'
-    dates = [re.sub(date_find, date_replace, date) for date in dates]  # YYYY-M-D -> YYYY-MM-DD
-    date_type, date_disp, rewrite_dates = 'list', "listed above", False
-    startdate, enddate, startdate_num, enddate_num = None, None, 0, 10**8
-    if not dates:
-        date_type, date_disp, rewrite_dates = 'all', "all", True
-    cdate_match = r"^(?:>(?P<start>[\d-]+))? ?(?:(?P<end>[\d-]+)<)?$"
-    if (cdates := re.fullmatch(cdate_match, ' '.join(dates))):
-        startdate, enddate = cdates['start'], cdates['end']
-        startdate_num = int(startdate.replace('-', '')) if startdate else 0
-        enddate_num = int(enddate.replace('-', '')) if enddate else 10**8
-        if startdate or enddate:
-            date_type = 'both' if startdate and enddate else ('start' if startdate else enddate)
-        fromdate, todate = startdate or "earliest", enddate or "latest"
-        date_disp = f'{fromdate} -> {todate}'
-        dates = []
-        for filename in os.listdir(rootpath):
-            if (filedate := re.fullmatch(r"^[a-z\d_]*-(.*)\.log$", filename)):
-                filedate = filedate[1]
-                if int(filedate.replace('-', '')) in range(startdate_num, enddate_num+1):
-                    dates.append(filedate)
-    print(f"    Selected dates: {date_disp}")
-
-    query = input(
-        "`U - UPPER, `L - lower, `T - TiTLE, `Ts - Title, `C - !cmd, " \
-        '>xyz - xyz..., xyz< - ...xyz, ~xyz - no "xyz"' \
-        "\nInput $user query and/or message query [$UQ MQ] (leave blank for everything): "
-        ).strip()
-    user_query, message_query, fix_query = '', '', ''
-    search_type, query_disp, has_string = 'all', '', False
-    check_exact_name, check_case, check_exact_word, min_msgs = False, False, False, 0
-    cquery_match = r"^(?:\$(?P<user>\S+) ?)?(?P<message>.*)$"
-    if query and (cquery := re.fullmatch(cquery_match, query)):
-        user_query, message_query = cquery['user'] or '', cquery['message']
-        search_type, user_query = 'user', user_query.lower()
-        if user_query:
-            check_exact_name = input("Check exact username? (y/n): ").strip() == 'y'
-            query_disp += (f" from {user_query}" if check_exact_name
-                           else f" from ??{user_query}??")
-        if message_query:
-            search_type, has_string = 'msg', True
-            if message_query in {"`U", "`L", "`T", "`Ts", "`C"}:
-                query_disp += {"`U": " [uppercase only]",
-                               "`L": " [lowercase only]",
-                               "`T": " [title only]",
-                               "`Ts": " [title (strict) only]",
-                               "`C": " [command only]"}[message_query]
-                has_string = False
-            elif message_query.startswith('>'):
-                fix_query = message_query[1:]
-                query_disp += f' [starting with "{fix_query}"'
-            elif message_query.endswith('<'):
-                fix_query = message_query[:-1]
-                query_disp += f' [ending with "{fix_query}"'
-            elif message_query.startswith('~'):
-                fix_query = message_query[1:]
-                query_disp += f' [excluding "{fix_query}"'
-            else:
-                fix_query = message_query
-                query_disp += f' [containing "{fix_query}"'
-            if has_string:
-                if (check_case := input("[MQ] Case-sensitive? (y/n): ").strip() == 'y'):
-                    query_disp += " (case-sensitive)"
-                if (check_exact_word := input(
-                        "[MQ] Enforce exact word match? " \
-                        "[disable if query contains symbols] (y/n): ").strip() == 'y'):
-                    query_disp += " <exact word match>"
-                query_disp += ']'
-    else:
-        has_string = False
-    if user_query and message_query:
-        search_type = 'hybrid'
-    if search_type in {'msg', 'hybrid', 'all'} and not check_exact_name:
-        min_msgs = input("Input minimum # of messages to include user " \
-                         "(leave blank for none): ").strip()
-        min_msgs = int(min_msgs) if min_msgs.isnumeric() else 0
-        if min_msgs:
-            query_disp += f" (from users with >={min_msgs} messages)"
-
-    picks = [False]*8
-    (show_msgs, count_words, check_purity, show_random,
-     count_daily, count_per_user, count_hourly, show_hourly_graph) = picks
-    show_freq_stats = False
-    options = ("show messages from logs",
-               "show most common words",
-               "calculate user purity scores",
-               "show random messages",
-               "count daily messages",
-               "count per-user stats",
-               "count hourly messages",
-               "show hourly message graph")
-    print('\n'.join(f"{i}. {option}" for i, option in enumerate(options, start=1)))
-    print("Keep in mind these options only include matched messages.")
-    pick_option = input("Input numbers for the options you want to enable [e.g. 125]: ").strip()
-    picks = [str(num+1) in pick_option for num in range(8)]
-    if not any(picks): break
-    (show_msgs, count_words, check_purity, show_random,
-     count_daily, count_per_user, count_hourly, show_hourly_graph) = picks
-    show_freq_stats = any((count_daily, count_per_user, count_hourly, show_hourly_graph))
-
-    if not show_msgs and (date_type != 'all' or message_query):
-        show_msgs = input("Show messages? (y/n): ").strip() == 'y'
-
-    word_query, word_fix_query, word_query_disp, word_has_string = '', '', '', False
-    word_check_case, exclude_queries, exclude_common, unique_only = False, False, set(), False
-    if count_words:
-        if (word_query := input(
-                "`U - UPPER, `L - lower, `T - TiTLE, `Ts - Title, " \
-                '`C - !cmd, >xyz - xyz..., xyz< - ...xyz, ~xyz - no "xyz"' \
-                "\nInput word query (leave blank for everything): "
-                ).strip()):
-            word_has_string = True
-            if word_query in ("`U", "`L", "`T", "`Ts", "`C"):
-                word_query_disp += {"`U": " [uppercase only]",
-                                    "`L": " [lowercase only]",
-                                    "`T": " [title only]",
-                                    "`Ts": " [title (strict) only]",
-                                    "`C": " [command only]"}[word_query]
-                word_has_string = False
-            elif word_query.startswith('>'):
-                word_fix_query = word_query[1:]
-                word_query_disp += f' [starting with "{word_fix_query}"'
-            elif word_query.endswith('<'):
-                word_fix_query = word_query[:-1]
-                word_query_disp += f' [ending with "{word_fix_query}"'
-            elif word_query.startswith('~'):
-                word_fix_query = word_query[1:]
-                word_query_disp += f' [excluding "{word_fix_query}"'
+        channels, channels_disp = [], []
+        channels = find_channels(logs_folder)  # listed once, again only if channels change
+        channels_disp = [f"{i} - {channel}" for i, channel in enumerate(channels, start=1)]
+        print(f'Valid channels:\n{", ".join(channels_disp)}')
+        while not (selected := select_channels(input(
+                "\nInput username/number from list [several, *glob or all to search more]: "
+                ).strip().lower(), channels)): pass
+        print(f"    Selected channel{'s' if len(selected) > 1 else ''}: {', '.join(selected)}")
+        rootpaths = {channel: f"{logs_folder}/Twitch/Channels/{channel}" for channel in selected}
+        profile = Profile()  # phases are always timed, but only reported if configured
+
+        dates = input("Input dates (YYYY-MM-DD) separated by spaces " \
+                      "[or >start and/or end<] (leave blank for all dates): ").split()
+        date_find, date_replace = r'-(?:(?P<digit>\d))\b', r'-0\g<digit>'
+        dates = [re.sub(date_find, date_replace, date) for date in dates]  # YYYY-M-D -> YYYY-MM-DD
+        date_type, date_disp = 'list', "listed above"
+        startdate, enddate, startdate_num, enddate_num = None, None, 0, 10**8
+        if not dates:
+            date_type, date_disp = 'all', "all"
+        if (cdates := re.fullmatch(DATE_RANGE_PATTERN, ' '.join(dates))):
+            startdate, enddate = cdates['start'], cdates['end']
+            startdate_num = int(startdate.replace('-', '')) if startdate else 0
+            enddate_num = int(enddate.replace('-', '')) if enddate else 10**8
+            if startdate or enddate:
+                date_type = 'both' if startdate and enddate else ('start' if startdate else enddate)
+            fromdate, todate = startdate or "earliest", enddate or "latest"
+            date_disp = f'{fromdate} -> {todate}'
+            profile.lap()
+            channel_dates = {channel: find_dates(rootpaths[channel], startdate_num, enddate_num)
+                             for channel in selected}
+            dates = sorted(set().union(*channel_dates.values()))
+            profile.lap('dates')
+        elif len(selected) == 1:
+            channel_dates = {selected[0]: dates}
+        else:  # listed dates are only read from the channels that have them
+            channel_dates = {channel: [date for date in dates
+                                       if date in date_catalog(rootpaths[channel]).sizes]
+                             for channel in selected}
+        print(f"    Selected dates: {date_disp}")
+        read_size = sum(date_catalog(rootpaths[channel]).size(channel_dates[channel])
+                        for channel in selected)
+        print(f"    Day logs to read: {sum(len(days) for days in channel_dates.values())} " \
+              f"({read_size/2**20:.1f} MiB)")
+
+        while True:
+            query = input(
+                "`U - UPPER, `L - lower, `T - TiTLE, `Ts - Title, `C - !cmd, " \
+                '>xyz - xyz..., xyz< - ...xyz, ~xyz - no "xyz"' \
+                "\n?expression - and/or/not, (...), user:xyz, user~xyz, time:HH:MM-HH:MM, " \
+                "len>N, /regex/ (e.g. ?(gg or /g{3,}/) and not user:nightbot)" \
+                "\nInput $user query and/or message query [$UQ MQ] (leave blank for everything): "
+                ).strip()
+            try:
+                parse_expression(split_query(query)[1])
+            except ValueError as error:
+                print(f"    Invalid expression: {error}")
             else:
-                word_fix_query = word_query
-                word_query_disp += f' [containing "{word_query}"'
-            if word_has_string:
-                if (word_check_case := input("Case-sensitive? (y/n): ").strip() == 'y'):
-                    word_query_disp += " (case-sensitive)"
-                word_query_disp += ']'
-        if has_string or word_has_string:
-            exclude_queries = input(
-                "Exclude the queries themselves from word results? (y/n): "
-                ).strip() == 'y'
-        exclude_common = input("Input # of 100 most common English words to exclude " \
-                               "(leave blank for none): ").strip()
-        if exclude_common:
-            word_query_disp += f" <without top {exclude_common} English words>"
-        exclude_common = set(COMMON_ENG[:int(exclude_common)-1]) if exclude_common else set()
-        if (unique_only := input("Only show unique words (ignore case)? (y/n): ").strip() == 'y'):
-            word_query_disp += " (unique only)"
-
-    purity_order, purity_disp = '', ''
-    if check_purity:
-        if search_type in {'msg', 'hybrid', 'all'}:
-            purity_order = input("Order users by most pure or impure? (p/i): ").strip()
-            purity_disp = {'p': "Highest", 'i': "Lowest"}.get(purity_order, "Highest")
+                break
+        user_query, message_query, fix_query = '', '', ''
+        search_type, query_disp, has_string = 'all', '', False
+        check_exact_name, check_case, check_exact_word, min_msgs = False, False, False, 0
+        if query and (cquery := QUERY_PATTERN.fullmatch(query)):
+            user_query, message_query = cquery['user'] or '', cquery['message']
+            search_type, user_query = 'user', user_query.lower()
+            if user_query:
+                check_exact_name = input("Check exact username? (y/n): ").strip() == 'y'
+                query_disp += (f" from {user_query}" if check_exact_name
+                               else f" from ??{user_query}??")
+            if message_query:
+                search_type, has_string = 'msg', True
+                if message_query in {"`U", "`L", "`T", "`Ts", "`C"}:
+                    query_disp += {"`U": " [uppercase only]",
+                                   "`L": " [lowercase only]",
+                                   "`T": " [title only]",
+                                   "`Ts": " [title (strict) only]",
+                                   "`C": " [command only]"}[message_query]
+                    has_string = False
+                elif message_query.startswith(EXPRESSION_PREFIX):
+                    query_disp += f' [matching "{message_query[1:].strip()}"'
+                elif message_query.startswith('>'):
+                    fix_query = message_query[1:]
+                    query_disp += f' [starting with "{fix_query}"'
+                elif message_query.endswith('<'):
+                    fix_query = message_query[:-1]
+                    query_disp += f' [ending with "{fix_query}"'
+                elif message_query.startswith('~'):
+                    fix_query = message_query[1:]
+                    query_disp += f' [excluding "{fix_query}"'
+                else:
+                    fix_query = message_query
+                    query_disp += f' [containing "{fix_query}"'
+                if has_string:
+                    if (check_case := input("[MQ] Case-sensitive? (y/n): ").strip() == 'y'):
+                        query_disp += " (case-sensitive)"
+                    if (check_exact_word := input(
+                            "[MQ] Enforce exact word match? " \
+                            "[disable if query contains symbols] (y/n): ").strip() == 'y'):
+                        query_disp += " <exact word match>"
+                    query_disp += ']'
         else:
-            purity_disp = "User"
-
-    show_indiv_word, show_indiv_char, average_indiv = False, False, False
-    user_limit, user_order, user_disp, average_time_count = 0, '', '', ''
-    if show_freq_stats:
-        if count_per_user:
-            show_indiv_word = input("Count per-user words? (y/n): ").strip() == 'y'
-            show_indiv_char = input("Count per-user characters? (y/n): ").strip() == 'y'
-            if show_indiv_word or show_indiv_char:
-                average_indiv = input(
-                    "Count per-message average instead of total words/characters? (y/n): "
-                    ).strip() == 'y'
-            if search_type in {'msg', 'all'}:
-                user_limit = input(
-                    "Input # of users to show (leave blank for default 10): "
-                    ).strip()
-                user_limit = int(user_limit) if user_limit.isnumeric() else 10
-                user_order = input("Order users by most or least? (m/l): ").strip()
-                user_disp = {'m': "Most", 'l': "Least"}.get(user_order, "Most")
+            has_string = False
+        if user_query and message_query:
+            search_type = 'hybrid'
+        if search_type in {'msg', 'hybrid', 'all'} and not check_exact_name:
+            min_msgs = input("Input minimum # of messages to include user " \
+                             "(leave blank for none): ").strip()
+            min_msgs = int(min_msgs) if min_msgs.isnumeric() else 0
+            if min_msgs:
+                query_disp += f" (from users with >={min_msgs} messages)"
+
+        picks = [False]*9
+        (show_msgs, count_words, check_purity, show_random, count_daily,
+         count_per_user, count_hourly, show_hourly_graph, show_heatmap) = picks
+        show_freq_stats = False
+        options = ("show messages from logs",
+                   "show most common words",
+                   "calculate user purity scores",
+                   "show random messages",
+                   "count daily messages",
+                   "count per-user stats",
+                   "count hourly messages",
+                   "show hourly message graph",
+                   "show weekday/hour message heatmap")
+        print('\n'.join(f"{i}. {option}" for i, option in enumerate(options, start=1)))
+        print("Keep in mind these options only include matched messages.")
+        pick_option = input("Input numbers for the options you want to enable [e.g. 125]: ").strip()
+        picks = [str(num+1) in pick_option for num in range(9)]
+        if not any(picks): break
+        (show_msgs, count_words, check_purity, show_random, count_daily,
+         count_per_user, count_hourly, show_hourly_graph, show_heatmap) = picks
+        show_freq_stats = any((count_daily, count_per_user, count_hourly,
+                               show_hourly_graph, show_heatmap))
+
+        if not show_msgs and (date_type != 'all' or message_query):
+            show_msgs = input("Show messages? (y/n): ").strip() == 'y'
+        # exported messages are streamed to the file instead of being printed
+        while (export_path := input(
+                "Export messages and results to a file? [.jsonl or .csv, add .gz/.xz/.zst " \
+                "to compress] (leave blank for none): ").strip()):
+            try:
+                export_parts(export_path)
+            except ValueError as error:
+                print(f"    {error}")
             else:
-                user_disp = "User"
-        if any((count_daily, count_per_user, count_hourly, show_hourly_graph)):
-            average_time_count = input(
-                "Count daily average instead of total messages? (y/n): "
-                ).strip() == 'y'
-
-    print("\nLoading results...\n")
-
-    # LOG SCRAPING BLOCK
-
-    total_count, daily_count, dates_disp = 0, {}, []
-    times, names = defaultdict(int), defaultdict(int)
-    msgs, msg_words = defaultdict(list), defaultdict(int)
-    msg_chars, purity = defaultdict(int), defaultdict(lambda: {'pcount': 0, 'icount': 0})
-
-    dates_len = len(dates)
-    for dates_i, date in enumerate(dates, start=1):
-        if not show_msgs:
-            print(f"Reading logs... ({dates_i}/{dates_len})", end='\r')
-        if date_type == 'list':
-            dates_disp.append(date)
-        day_count = 0
-        with open(f"{rootpath}/{channel}-{date}.log", 'r',
-                  encoding='UTF-8', errors='replace') as file:
-            for line in file:
-                line = line.strip()
-                matched = False
-                if (cmsg := re.fullmatch(r"^\[([\d:]*)\]  ?([a-z\d_]*): (.*)$", line)):
-                    time, user, message = cmsg.groups()
-                    args = (message, message_query, fix_query, check_case, check_exact_word)
-                    if (exclude_commands and message_query != "`C" and
-                        word_query != "`C" and re.match(r"^!\w+", message)): continue
-                    if (exclude_bots and not (search_type == 'user' and check_exact_name)
-                        and user in BOTS): continue
-                    if search_type == 'all':
-                        matched = True
-                    elif search_type == 'user':
-                        matched = (user == user_query if check_exact_name
-                                   else user_query.lower() in user.lower())
-                    elif search_type in {'msg', 'hybrid'}:
-                        if user_query:
-                            matched = (user == user_query if check_exact_name
-                                       else user_query.lower() in user.lower())
-                            if matched:
-                                matched = check_msg(*args)
-                        else:
-                            matched = check_msg(*args)
-
-                    if matched:
-                        if show_msgs:
-                            print(f"{date} {line}")
-                        total_count += 1
-                        day_count += 1
-                        times[int(time.replace(':', '')[:2])] += 1  # count only by hour ([HH]MMSS)
-                        names[user] += 1
-                        msgs[user].append(message)
-                        if show_indiv_word:
-                            msg_words[user] += len(message.split(' '))
-                        if show_indiv_char:
-                            msg_chars[user] += len(message.replace(' ', ''))
-                        if check_purity:
-                            message_words = message.lower().split(' ')
-                            if not PURITY_TERMS.isdisjoint(message_words):
-                                purity[user]['icount'] += 1
-                            else:
-                                purity[user]['pcount'] += 1
-
-            daily_count[date] = day_count
-
-    if min_msgs and not check_exact_name:
-        for data in (msgs, msg_words, msg_chars, purity):
-            new = {name: value for name, value in data.items() if names[name] >= min_msgs}
-            data.clear()
-            data.update(new)
-        names = {name: value for name, value in names.items() if value >= min_msgs}
-
-    # order hourly data by hour, user data by frequency
-    times = sort_dict(times)
-    names = sort_dict(names, use_value=True, reverse=True)
-
-    # RESULTS BLOCK
+                break
 
-    if msgs:
-        msgs_len = len(msgs)
-        query_disp += {'list': " on "+", ".join(dates_disp),
-                       'start': f" starting at {startdate}",
-                       'end': f" ending at {enddate}",
-                       'both': f" from {startdate} to {enddate}"}.get(date_type, '')
-
-        # calculate most common words
+        word_query, word_fix_query, word_query_disp, word_has_string = '', '', '', False
+        word_check_case, exclude_queries, exclude_common, unique_only = False, False, set(), False
         if count_words:
-            print("\n")
-            total_words = defaultdict(int)
-            for msgs_i, (user, messages) in enumerate(msgs.items(), start=1):
-                print(f"Reading users... ({msgs_i}/{msgs_len})", end='\r')
-                message: str
-                for message in messages:
-                    for word in message.split():
-                        args = (word, word_query, word_fix_query, word_check_case, False)
-                        word_matched = True
-                        if word_query:
-                            word_matched = check_msg(*args)
-                        if exclude_queries:
-                            if fix_query and word.lower() == fix_query.lower():
-                                word_matched = False
-                            if word_fix_query and word.lower() == word_fix_query.lower():
-                                word_matched = False
-                        if exclude_common and word.lower() in exclude_common:
-                            word_matched = False
-                        if word_matched:
-                            if unique_only:
-                                total_words[word.lower()] += 1
-                            else:
-                                total_words[word] += 1
-
-            total_words = sort_dict(total_words, use_value=True, reverse=True)
-            print(total_words)
-            print(f"\n\nMost common words{word_query_disp} in messages{query_disp} in #{channel}:")
-            for i, word in enumerate(total_words):
-                if i == 20: break
-                print(f"    {word}: {total_words[word]}")
-
-        if check_purity and purity:
-            purity_score = {}
-            for user, score in purity.items():
-                pure, impure = float(score['pcount']), float(score['icount'])
-                mcount = float(names[user])
-                # arbitrary formula, modify as desired
-                purity_score[user] = int(100 * ((pure/(pure+impure))**(4.25 * (mcount**0.05))))
-            print(f"{purity_disp} purity score in messages{query_disp} in #{channel}:")
-            if search_type == 'user':
-                user_purity = purity[user_query]
-                icount = str(user_purity['icount'])
-                tcount = str(user_purity['icount']+user_purity['pcount'])
-                print(f"    {purity_score[user_query]:<10} {f'[{icount}/{tcount} impure]'}")
-            else:
-                purity_score = sort_dict(purity_score, use_value=True, reverse=purity_order!='i')
-                for i, (key, value) in enumerate(purity_score.items()):
-                    if i == 20: break
-                    user_purity = purity[key]
-                    icount = str(user_purity['icount'])
-                    tcount = str(user_purity['icount']+user_purity['pcount'])
-                    print(f"    {key+': '+str(value):<30} {f'[{icount}/{tcount} impure]'}")
-                print('\n')
-                while (purity_user := input("Input a username (leave blank to exit): ").strip()):
-                    try:
-                        placement = list(purity_score).index(purity_user)+1
-                        score = purity_score[purity_user]
-                        pure = purity[purity_user]['pcount']
-                        impure = purity[purity_user]['icount']
-                    except (ValueError, KeyError):
-                        print(f'User "{purity_user}" not found in results!')
-                    else:
-                        print(f'{purity_disp} purity placement{query_disp} for "{purity_user}" ' \
-                              f'in #{channel}: {placement}/{len(purity_score)}')
-                        print(f"Purity for {purity_user} in #{channel}: " \
-                              f"{score} [{impure}/{pure+impure} impure]")
-
-        if show_random:
-            key_picker = list(msgs)
-            print("\n\nPress enter for a new random message, type anything to quit.", end=' ')
-            while not (loop := input('')):
-                rand_key = random.choice(key_picker)
-                rand_msg = random.choice(msgs[rand_key])
-                print(f"\nRandom message from {rand_key} " \
-                      f"in #{channel}: {rand_msg}", end=' ')  # type: ignore
-
-    else:
-        print("\nNo results found!")
-
-    if show_freq_stats:
-        title_disp, words_disp, per_words_disp = "Total", "total", "total"
-
-        # convert to averages if needed
-        if average_indiv:
-            msg_words = {key: int(value/names[key]) for key, value in msg_words.items()}
-            msg_chars = {key: int(value/names[key]) for key, value in msg_chars.items()}
-            per_words_disp = "per message"
-        if average_time_count:
-            times = {key: int(value/dates_len) for key, value in times.items()}
-            names = {key: int(value/dates_len) for key, value in names.items()}
-            total_count = int(total_count/dates_len)
-            title_disp, words_disp = "Daily", "daily"
-
-        if count_daily and times:
-            print(f"\nMessages{query_disp} by day in #{channel}:")
-            for date, count in daily_count.items():
-                print(f"    {date}: {count}")
-        else:
-            print('\n')
-
-        # show total message count
-        if (search_type in {'msg', 'hybrid', 'all'}
-            or (search_type == 'user' and not count_per_user)):
-            print(f"{title_disp} messages{query_disp} in #{channel}: {total_count}\n")
-
-        # per-user statistics
-        if count_per_user and names:
-            rev = user_order != 'l'
-            print(f"{user_disp} {words_disp} messages{query_disp} in #{channel}:")
-            if search_type == 'user':
-                if check_exact_name:
-                    print(f"    {names[user_query]}")
+            if (word_query := input(
+                    "`U - UPPER, `L - lower, `T - TiTLE, `Ts - Title, " \
+                    '`C - !cmd, >xyz - xyz..., xyz< - ...xyz, ~xyz - no "xyz"' \
+                    "\nInput word query (leave blank for everything): "
+                    ).strip()):
+                word_has_string = True
+                if word_query in ("`U", "`L", "`T", "`Ts", "`C"):
+                    word_query_disp += {"`U": " [uppercase only]",
+                                        "`L": " [lowercase only]",
+                                        "`T": " [title only]",
+                                        "`Ts": " [title (strict) only]",
+                                        "`C": " [command only]"}[word_query]
+                    word_has_string = False
+                elif word_query.startswith('>'):
+                    word_fix_query = word_query[1:]
+                    word_query_disp += f' [starting with "{word_fix_query}"'
+                elif word_query.endswith('<'):
+                    word_fix_query = word_query[:-1]
+                    word_query_disp += f' [ending with "{word_fix_query}"'
+                elif word_query.startswith('~'):
+                    word_fix_query = word_query[1:]
+                    word_query_disp += f' [excluding "{word_fix_query}"'
                 else:
-                    for key, value in names.items():
-                        print(f"    {key}: {value}")
+                    word_fix_query = word_query
+                    word_query_disp += f' [containing "{word_query}"'
+                if word_has_string:
+                    if (word_check_case := input("Case-sensitive? (y/n): ").strip() == 'y'):
+                        word_query_disp += " (case-sensitive)"
+                    word_query_disp += ']'
+            if has_string or word_has_string:
+                exclude_queries = input(
+                    "Exclude the queries themselves from word results? (y/n): "
+                    ).strip() == 'y'
+            exclude_common = input("Input # of 100 most common English words to exclude " \
+                                   "(leave blank for none): ").strip()
+            if exclude_common:
+                word_query_disp += f" <without top {exclude_common} English words>"
+            exclude_common = set(COMMON_ENG[:int(exclude_common)-1]) if exclude_common else set()
+            if (unique_only := input(
+                    "Only show unique words (ignore case)? (y/n): ").strip() == 'y'):
+                word_query_disp += " (unique only)"
+
+        purity_order, purity_disp = '', ''
+        if check_purity:
+            if search_type in {'msg', 'hybrid', 'all'}:
+                purity_order = input("Order users by most pure or impure? (p/i): ").strip()
+                purity_disp = {'p': "Highest", 'i': "Lowest"}.get(purity_order, "Highest")
             else:
-                names = sort_dict(names, use_value=True, reverse=rev)
-                for i, (key, value) in enumerate(names.items()):
-                    if i == user_limit: break
-                    print(f"    {key}: {value}")
-            if show_indiv_word and msg_words:
-                print(f"{user_disp} words {per_words_disp} in messages{query_disp} in #{channel}:")
-                if search_type == 'user':
-                    print(f"    {msg_words[user_query]}")
-                else:
-                    msg_words = sort_dict(msg_words, use_value=True, reverse=rev)
-                    for i, (key, value) in enumerate(msg_words.items()):
-                        if i == user_limit: break
-                        print(f"    {key}: {value}")
-            if show_indiv_char and msg_chars:
-                print(f"{user_disp} characters {per_words_disp} " \
-                      f"in messages{query_disp} in #{channel}:")
-                if search_type == 'user':
-                    print(f"    {msg_chars[user_query]}")
+                purity_disp = "User"
+
+        show_indiv_word, show_indiv_char, average_indiv = False, False, False
+        user_limit, user_order, user_disp, average_time_count = 0, '', '', ''
+        if show_freq_stats:
+            if count_per_user:
+                show_indiv_word = input("Count per-user words? (y/n): ").strip() == 'y'
+                show_indiv_char = input("Count per-user characters? (y/n): ").strip() == 'y'
+                if show_indiv_word or show_indiv_char:
+                    average_indiv = input(
+                        "Count per-message average instead of total words/characters? (y/n): "
+                        ).strip() == 'y'
+                if search_type in {'msg', 'all'}:
+                    user_limit = input(
+                        "Input # of users to show (leave blank for default 10): "
+                        ).strip()
+                    user_limit = int(user_limit) if user_limit.isnumeric() else 10
+                    user_order = input("Order users by most or least? (m/l): ").strip()
+                    user_disp = {'m': "Most", 'l': "Least"}.get(user_order, "Most")
                 else:
-                    msg_chars = sort_dict(msg_chars, use_value=True, reverse=rev)
-                    for i, (key, value) in enumerate(msg_chars.items()):
-                        if i == user_limit: break
-                        print(f"    {key}: {value}")
-
-        # show hourly message count
-        if count_hourly and times:
-            print(f"{title_disp} message frequency{query_disp} by hour in #{channel}:")
-            hours_i, last_key = 0, None
-            utc = list(range(-utc_offset % 24, 24)) + list(range(-utc_offset % 24))
-            for key, value in times.items():
-                key = key % 24
-                showkey = str(key % 12 or 12)+(" AM" if key < 12 else " PM")
-                # sync utc and local if hours missing
-                hours_i = key if last_key is None else hours_i + (key-last_key)
-                print(f"    {str(showkey)} ({utc[hours_i]} UTC): {str(value)}")
-                last_key = key
-
-        if show_hourly_graph:
-            array = numpy.array(list(times.items()), dtype=int).transpose()
-            try:
-                plt.bar(array[0], array[1])
-            except IndexError:
-                print(f'No frequency results for query "{query}"')
-            else:
-                plt.title(f"{title_disp} Messages per Hour")
-                plt.xlabel("Hour")
-                plt.ylabel("# of messages sent")
-                plt.show()
+                    user_disp = "User"
+            if any((count_daily, count_per_user, count_hourly, show_hourly_graph,
+                    show_heatmap)):
+                average_time_count = input(
+                    "Count daily average instead of total messages? (y/n): "
+                    ).strip() == 'y'
 
-    if input("\nNew query? (y/n): ").strip() == 'n': break
+        print("\nLoading results...\n")
+
+        # LOG SCRAPING BLOCK
+
+        # the scan pulls in numpy, so it loads on the first query rather than at startup
+        # pylint: disable=import-outside-toplevel
+        from memo import scan_channels_cached
+        from scan import SAMPLE_SIZE, merge_results, score_purity
+        # pylint: enable=import-outside-toplevel
+
+        # words are counted during the scan, or in a second pass once min_msgs is known
+        excluded_words = set(exclude_common)
+        if exclude_queries:
+            excluded_words |= {fix.lower() for fix in (fix_query, word_fix_query) if fix}
+        settings: ScanSettings = {"search_type": search_type,
+                                  "user_query": user_query,
+                                  "check_exact_name": check_exact_name,
+                                  "message_query": message_query,
+                                  "fix_query": fix_query,
+                                  "check_case": check_case,
+                                  "check_exact_word": check_exact_word,
+                                  "word_query": word_query,
+                                  "word_fix_query": word_fix_query,
+                                  "word_check_case": word_check_case,
+                                  "excluded_words": excluded_words,
+                                  "unique_only": unique_only,
+                                  "word_users": None,
+                                  "exclude_commands": exclude_commands,
+                                  "exclude_bots": exclude_bots,
+                                  # matched lines are also kept for an export to stream
+                                  "show_msgs": show_msgs or bool(export_path),
+                                  "show_indiv_word": show_indiv_word,
+                                  "show_indiv_char": show_indiv_char,
+                                  "check_purity": check_purity,
+                                  "count_words": count_words and not min_msgs,
+                                  "word_error": word_error,
+                                  "sample_size": SAMPLE_SIZE if show_random else 0}
+        scanned = [(rootpaths[channel], channel, channel_dates[channel]) for channel in selected]
+        candidates = (partial(find_candidates, query=MessageQuery(
+            message_query, fix_query, check_case, check_exact_word))
+                      if use_index and search_type in {'msg', 'hybrid'} else None)
+        # channels scanned for an earlier query with the same filters aren't scanned again
+        export = ExportSink(export_path) if export_path else None
+        results, rescanned = scan_channels_cached(scanned, settings, BOTS, PURITY, scan_workers,
+                                                  candidates, profile, export)
+        if len(rescanned) < len(results):
+            print(f"    Reused results of an earlier scan for " \
+                  f"{len(results)-len(rescanned)}/{len(results)} channels")
+
+        # each channel is reported on its own, then all of them together
+        views = [(f"#{channel}", result, channel_dates[channel], [i])
+                 for i, (channel, result) in enumerate(zip(selected, results))]
+        if len(selected) > 1:
+            views.append((f"{len(selected)} channels", merge_results(results, settings), dates,
+                          list(range(len(selected)))))
+        base_query_disp = query_disp
+        for view_i, (channel_disp, result, view_dates, view_channels) in enumerate(views, start=1):
+            total_count, daily_count, times, users = (result.total_count, result.daily_count,
+                                                      result.times, result.users)
+            weekday_hours = result.weekday_hours
+            impure_terms = result.impure_terms
+            total_words = result.words
+            dates_len, dates_disp = len(view_dates), view_dates if date_type == 'list' else []
+            query_disp, last_view = base_query_disp, view_i == len(views)
+            if len(views) > 1:
+                print(f"\n\n===== {channel_disp} =====")
+
+            if min_msgs and not check_exact_name:
+                users = users.select(users['messages'] >= min_msgs)
+                if count_words and users:
+                    word_settings: ScanSettings = {**settings, "show_msgs": False,
+                                                   "check_purity": False, "sample_size": 0,
+                                                   "count_words": True,
+                                                   "word_users": set(users.names)}
+                    total_words = merge_results(scan_channels_cached(
+                        [scanned[i] for i in view_channels], word_settings, BOTS, PURITY,
+                        scan_workers, candidates, profile)[0], word_settings).words
+
+            # rank users by frequency (hourly data is already ordered by hour)
+            profile.lap()
+            names, user_id = users['messages'], users.ids.get(user_query)
+            # averaged counts can tie, those keep the order of their totals
+            ranked = users.order(names) if average_time_count else None
+            profile.lap('sort')
+            if export:
+                export.write_tables(channel_disp, result_tables(result, users, total_words, {
+                    "count_words": count_words, "check_purity": check_purity,
+                    "count_daily": count_daily, "count_hourly": count_hourly,
+                    "count_per_user": count_per_user}))
+                profile.lap('output')
+
+            # RESULTS BLOCK
+
+            if users:
+                query_disp += {'list': " on "+", ".join(dates_disp),
+                               'start': f" starting at {startdate}",
+                               'end': f" ending at {enddate}",
+                               'both': f" from {startdate} to {enddate}"}.get(date_type, '')
+
+                # calculate most common words
+                if count_words:
+                    print("\n")
+                    approx_disp = (f" (approximate, may overcount by up to {total_words.error})"
+                                   if isinstance(total_words, SpaceSaving) else '')
+                    print(f"\n\nMost common words{word_query_disp} " \
+                          f"in messages{query_disp} in {channel_disp}{approx_disp}:")
+                    for word, count in top_items(total_words, 20):
+                        print(f"    {word}: {count}")
+                    profile.lap('output')
+
+                if check_purity and 'pcount' in users.counters:
+                    pcounts, icounts = users['pcount'], users['icount']
+                    purity_score = score_purity(pcounts, icounts, names, users['iweight'])
+                    print(f"{purity_disp} purity score in messages{query_disp} in {channel_disp}:")
+                    if search_type == 'user':
+                        if user_id is not None:
+                            icount = str(icounts[user_id])
+                            tcount = str(icounts[user_id]+pcounts[user_id])
+                            print(f"    {purity_score[user_id]:<10} " \
+                                  f"{f'[{icount}/{tcount} impure]'}{category_disp(users, user_id)}")
+                    else:
+                        purity_reverse = purity_order != 'i'
+                        purity_order_ids = users.order(purity_score, purity_reverse, limit=20)
+                        profile.lap('sort')
+                        for key_id in purity_order_ids.tolist():
+                            key, value = users.names[key_id], purity_score[key_id]
+                            icount = str(icounts[key_id])
+                            tcount = str(icounts[key_id]+pcounts[key_id])
+                            print(f"    {key+': '+str(value):<30} {f'[{icount}/{tcount} impure]'}")
+                        if impure_terms:
+                            print(f"Most common impure terms{query_disp} in {channel_disp}:")
+                            for term, count in top_items(impure_terms, 10):
+                                print(f"    {term}: {count}")
+                        profile.lap('output')
+                        print('\n')
+                        while last_view and (purity_user := input(
+                                "Input a username (leave blank to exit): ").strip()):
+                            if (purity_id := users.ids.get(purity_user)) is None:
+                                print(f'User "{purity_user}" not found in results!')
+                            else:
+                                placement = users.rank(purity_score, purity_id, purity_reverse)
+                                score = purity_score[purity_id]
+                                pure, impure = pcounts[purity_id], icounts[purity_id]
+                                print(f'{purity_disp} purity placement{query_disp} ' \
+                                      f'for "{purity_user}" ' \
+                                      f'in {channel_disp}: {placement}/{len(purity_score)}')
+                                print(f"Purity for {purity_user} in {channel_disp}: " \
+                                      f"{score} [{impure}/{pure+impure} impure]" \
+                                      f"{category_disp(users, purity_id)}")
+
+                if show_random and last_view:
+                    print("\n\nPress enter for a new random message, type anything to quit.",
+                          end=' ')
+                    while not input(''):
+                        rand_id = random.randrange(len(users))
+                        rand_key, rand_msg = (users.names[rand_id],
+                                              random.choice(users.samples[rand_id]))
+                        print(f"\nRandom message from {rand_key} " \
+                              f"in {channel_disp}: {rand_msg}", end=' ')  # type: ignore
+
+            else:
+                print("\nNo results found!")
+
+            if show_freq_stats:
+                profile.lap()
+                title_disp, words_disp, per_words_disp = "Total", "total", "total"
+
+                # convert to averages if needed
+                msg_words, msg_chars = users['words'], users['chars']
+                if average_indiv:
+                    msg_words = (msg_words / names).astype(int)
+                    msg_chars = (msg_chars / names).astype(int)
+                    per_words_disp = "per message"
+                if average_time_count:
+                    times = divide_counts(times, dates_len)
+                    names = (names / dates_len).astype(int)
+                    weekday_hours = result.weekday_hours_per_day(view_dates)
+                    total_count = int(total_count/dates_len)
+                    title_disp, words_disp = "Daily", "daily"
+
+                if count_daily and times:
+                    print(f"\nMessages{query_disp} by day in {channel_disp}:")
+                    for date, count in sorted(daily_count.items()):
+                        print(f"    {date}: {count}")
+                else:
+                    print('\n')
+
+                # show total message count
+                if (search_type in {'msg', 'hybrid', 'all'}
+                    or (search_type == 'user' and not count_per_user)):
+                    print(f"{title_disp} messages{query_disp} in {channel_disp}: {total_count}\n")
+
+                # per-user statistics
+                if count_per_user and users:
+                    rev = user_order != 'l'
+                    print(f"{user_disp} {words_disp} messages{query_disp} in {channel_disp}:")
+                    if search_type == 'user':
+                        if check_exact_name:
+                            print(f"    {names[user_id]}")
+                        else:
+                            for key, value in users.top(names, len(users), ids=ranked):
+                                print(f"    {key}: {value}")
+                    else:
+                        for key, value in users.top(names, user_limit, rev, ranked):
+                            print(f"    {key}: {value}")
+                    if show_indiv_word:
+                        print(f"{user_disp} words {per_words_disp} " \
+                              f"in messages{query_disp} in {channel_disp}:")
+                        if search_type == 'user':
+                            print(f"    {msg_words[user_id] if user_id is not None else 0}")
+                        else:
+                            for key, value in users.top(msg_words, user_limit, rev):
+                                print(f"    {key}: {value}")
+                    if show_indiv_char:
+                        print(f"{user_disp} characters {per_words_disp} " \
+                              f"in messages{query_disp} in {channel_disp}:")
+                        if search_type == 'user':
+                            print(f"    {msg_chars[user_id] if user_id is not None else 0}")
+                        else:
+                            for key, value in users.top(msg_chars, user_limit, rev):
+                                print(f"    {key}: {value}")
+
+                # show hourly message count
+                if count_hourly and times:
+                    print(f"{title_disp} message frequency{query_disp} by hour in {channel_disp}:")
+                    hours_i, last_key = 0, None
+                    utc = list(range(-utc_offset % 24, 24)) + list(range(-utc_offset % 24))
+                    for key, value in times.items():
+                        key = key % 24
+                        showkey = str(key % 12 or 12)+(" AM" if key < 12 else " PM")
+                        # sync utc and local if hours missing
+                        hours_i = key if last_key is None else hours_i + (key-last_key)
+                        print(f"    {str(showkey)} ({utc[hours_i]} UTC): {str(value)}")
+                        last_key = key
+
+                profile.lap('output')
+                if show_hourly_graph or show_heatmap:
+                    # plotting is only loaded once a graph is actually requested
+                    import matplotlib.pyplot as plt  # pylint: disable=import-outside-toplevel
+                    import numpy  # pylint: disable=import-outside-toplevel
+
+                    if show_hourly_graph:
+                        array = numpy.array(list(times.items()), dtype=int).transpose()
+                        try:
+                            plt.bar(array[0], array[1])
+                        except IndexError:
+                            print(f'No frequency results for query "{query}"')
+                        else:
+                            plt.title(f"{title_disp} Messages per Hour")
+                            plt.xlabel("Hour")
+                            plt.ylabel("# of messages sent")
+                            plt.show()
+
+                    if show_heatmap:
+                        plt.imshow(weekday_hours, aspect='auto', cmap='viridis')
+                        plt.colorbar(label="# of messages sent")
+                        plt.title(f"{title_disp} Messages per Weekday and Hour")
+                        plt.xlabel("Hour")
+                        plt.xticks(range(24))
+                        plt.yticks(range(7), ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"))
+                        plt.show()
+
+        if export:
+            export.close()
+            print(f"\n{export.message_count} messages and {export.table_count} result tables " \
+                  f"exported to {export_path}")
+
+        if profile_queries:
+            profile.report()
+            print(f"Profile saved to {profile.save()}")
+
+        if input("\nNew query? (y/n): ").strip() == 'n': break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""In-session reuse of scan results by queries that only change how results are shown."""
+import collections
+import copy
+import os
+from typing import Callable, List, Optional, OrderedDict, Set, Tuple
+
+from export import ExportSink
+from logs import log_path
+from purity import PurityMatcher
+from scan import ScanResult, ScanSettings, excludes_commands, scan_channels
+from timing import Profile
+
+MAX_ENTRIES = 16
+MAX_BYTES = 256*2**20  # rough estimate of the memory held by cached results
+WORD_SETTINGS = ("word_query", "word_fix_query", "word_check_case", "unique_only", "word_error")
+
+Key = Tuple
+FileStats = List[Tuple[int, int]]
+
+
+def scan_key(rootpath: str, channel: str, dates: List[str], settings: ScanSettings) -> Key:
+    """What a scan's matched lines depend on: the day files and the line filters."""
+    word_users = settings['word_users']
+    return (rootpath, channel, tuple(dates), settings['search_type'], settings['user_query'],
+            settings['check_exact_name'], settings['message_query'], settings['fix_query'],
+            settings['check_case'], settings['check_exact_word'], excludes_commands(settings),
+            settings['exclude_bots'], None if word_users is None else frozenset(word_users))
+
+
+def file_stats(rootpath: str, channel: str, dates: List[str]) -> FileStats:
+    """Size and mtime of each day's log file, (-1, -1) if it is missing."""
+    stats = []
+    for date in dates:
+        try:
+            stat = os.stat(log_path(rootpath, channel, date))
+        except OSError:
+            stats.append((-1, -1))
+        else:
+            stats.append((stat.st_size, stat.st_mtime_ns))
+    return stats
+
+
+def covers(cached: ScanSettings, settings: ScanSettings) -> bool:
+    """Whether a result scanned with cached settings has all that settings would gather."""
+    if settings['show_msgs']:  # matched lines are printed while scanning, not kept
+        return False
+    if settings['sample_size'] > cached['sample_size']:
+        return False
+    if any(settings[flag] and not cached[flag]  # type: ignore
+           for flag in ("show_indiv_word", "show_indiv_char", "check_purity")):
+        return False
+    if not settings['count_words']:
+        return True
+    if not cached['count_words'] or any(cached[key] != settings[key]  # type: ignore
+                                        for key in WORD_SETTINGS):
+        return False
+    # excluded words can be dropped from exact counts afterwards, but not from approximate ones
+    return (cached['excluded_words'] == settings['excluded_words']
+            or (not settings['word_error']
+                and cached['excluded_words'] <= settings['excluded_words']))
+
+
+def result_size(result: ScanResult) -> int:
+    """Rough number of bytes a result holds on to."""
+    users = result.users
+    size = sum(values.nbytes for values in users.counters.values())
+    size += sum(len(name) + 150 for name in users.names)  # string, list slot and id entry
+    size += sum(len(message) + 60 for sample in users.samples for message in sample)
+    size += sum(len(word) + 150 for word, _ in result.words.items())
+    size += sum(len(term) + 150 for term in result.impure_terms)
+    return size + result.minutes.nbytes + result.weekday_hours.nbytes
+
+
+class ResultCache:
+    """Scan results by scan key, checked against their files and evicted least recently used."""
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.entries: OrderedDict[Key, Tuple[ScanSettings, ScanResult, FileStats, int]] = (
+            collections.OrderedDict())
+        self.max_entries, self.max_bytes, self.size = max_entries, max_bytes, 0
+
+    def get(self, key: Key, settings: ScanSettings) -> Optional[ScanResult]:
+        """The cached result for a scan if it is still current and holds what it needs."""
+        if (entry := self.entries.get(key)) is None:
+            return None
+        cached, result, stats, _ = entry
+        if not covers(cached, settings):
+            return None
+        if file_stats(*key[:3]) != stats:
+            self.pop(key)
+            return None
+        self.entries.move_to_end(key)
+        if settings['count_words'] and cached['excluded_words'] != settings['excluded_words']:
+            excluded: Set[str] = settings['excluded_words']
+            result = copy.copy(result)
+            result.words = {word: count for word, count in result.words.items()
+                            if word.lower() not in excluded}
+        return result
+
+    def put(self, key: Key, settings: ScanSettings, result: ScanResult, stats: FileStats):
+        """Cache a result, with the stats its files had before it was scanned."""
+        self.pop(key)
+        if (size := result_size(result)) > self.max_bytes:
+            return
+        self.entries[key] = (settings, result, stats, size)
+        self.size += size
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            self.pop(next(iter(self.entries)))
+
+    def pop(self, key: Key):
+        """Drop a cached result if there is one."""
+        if (entry := self.entries.pop(key, None)) is not None:
+            self.size -= entry[3]
+
+
+RESULTS = ResultCache()
+
+
+def scan_channels_cached(channels: List[Tuple[str, str, List[str]]], settings: ScanSettings,
+                         bots: Set[str], purity: PurityMatcher, workers: int = 1,
+                         candidates: Optional[Callable] = None,
+                         profile: Optional[Profile] = None,
+                         export: Optional[ExportSink] = None,
+                         cache: ResultCache = RESULTS) -> Tuple[List[ScanResult], List[int]]:
+    """Reuse cached results where possible and scan the rest, returning which were scanned."""
+    profile = profile or Profile()
+    profile.lap()
+    keys = [scan_key(rootpath, channel, dates, settings) for rootpath, channel, dates in channels]
+    results: List[Optional[ScanResult]] = [cache.get(key, settings) for key in keys]
+    profile.lap('reuse')
+    if (missing := [i for i, result in enumerate(results) if result is None]):
+        stats = [file_stats(*channels[i]) for i in missing]
+        rows = None
+        if candidates:
+            rows = [candidates(*channels[i]) for i in missing]
+            profile.lap('index')
+        scanned = scan_channels([channels[i] for i in missing], settings, bots, purity, workers,
+                                rows, export)
+        for i, stat, result in zip(missing, stats, scanned):
+            results[i] = result
+            cache.put(keys[i], settings, result, stat)
+            profile.merge(result.profile)
+        profile.lap()
+    return results, missing  # type: ignore
@@ -0,0 +1,174 @@
+"""Tests of in-session result reuse."""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from batch import SPEC_DEFAULTS, spec_settings
+from config import Config
+from memo import (ResultCache, covers, file_stats, result_size, scan_channels_cached,
+                  scan_key)
+from purity import PurityMatcher
+from scan import ScanResult, ScanSettings
+
+CONFIG = Config(logs_folder='', utc_offset=0, exclude_commands=False, exclude_bots=False,
+                scan_workers=1, use_index=False, word_error=0.0, profile=False,
+                purity_weights={})
+DATES = ["2024-01-01", "2024-01-02"]
+
+
+def settings_for(**changes) -> ScanSettings:
+    """Settings of an all-messages query, with the given changes."""
+    settings, _ = spec_settings(SPEC_DEFAULTS, CONFIG, ())  # type: ignore
+    settings.update(changes)  # type: ignore
+    return settings
+
+
+class CoversTest(unittest.TestCase):
+    """Which cached settings can answer which queries."""
+    def test_show_msgs(self):
+        """Queries printing their messages always scan."""
+        self.assertFalse(covers(settings_for(), settings_for(show_msgs=True)))
+
+    def test_sample_size(self):
+        """A result holds enough samples only if it kept at least as many."""
+        self.assertTrue(covers(settings_for(sample_size=20), settings_for(sample_size=10)))
+        self.assertTrue(covers(settings_for(sample_size=20), settings_for(sample_size=20)))
+        self.assertFalse(covers(settings_for(sample_size=10), settings_for(sample_size=20)))
+
+    def test_flags(self):
+        """Statistics a result did not gather cannot be reused, extra ones can."""
+        for flag in ("show_indiv_word", "show_indiv_char", "check_purity"):
+            with self.subTest(flag=flag):
+                self.assertFalse(covers(settings_for(), settings_for(**{flag: True})))
+                self.assertTrue(covers(settings_for(**{flag: True}), settings_for()))
+
+    def test_word_settings(self):
+        """Word counts are only reused when they were counted the same way."""
+        words = settings_for(count_words=True)
+        self.assertTrue(covers(words, settings_for(count_words=True)))
+        self.assertTrue(covers(words, settings_for()))
+        self.assertFalse(covers(settings_for(), words))
+        for key, value in (("word_query", "a"), ("word_fix_query", "a"),
+                           ("word_check_case", True), ("unique_only", True), ("word_error", 0.1)):
+            with self.subTest(key=key):
+                self.assertFalse(covers(words, settings_for(count_words=True, **{key: value})))
+
+    def test_excluded_words(self):
+        """Exact counts can drop more excluded words afterwards, approximate ones cannot."""
+        exact = settings_for(count_words=True, excluded_words={"a"})
+        self.assertTrue(covers(exact, settings_for(count_words=True, excluded_words={"a", "b"})))
+        self.assertFalse(covers(exact, settings_for(count_words=True, excluded_words=set())))
+        approximate = settings_for(count_words=True, excluded_words={"a"}, word_error=0.1)
+        self.assertTrue(covers(approximate, settings_for(count_words=True, excluded_words={"a"},
+                                                         word_error=0.1)))
+        self.assertFalse(covers(approximate, settings_for(
+            count_words=True, excluded_words={"a", "b"}, word_error=0.1)))
+
+
+class ResultCacheTest(unittest.TestCase):
+    """Cached results checked against their files and evicted when over the limits."""
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.root = self.folder.name
+        for date in DATES:
+            self.write_log(date, "[10:00:00]  alice: hello world\n[10:00:01]  bob: hello\n")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write_log(self, date: str, text: str):
+        """Write a day log."""
+        with open(f"{self.root}/chan-{date}.log", 'w', encoding='UTF-8') as file:
+            file.write(text)
+
+    def scan(self, cache: ResultCache, settings: ScanSettings, channel: str = "chan"):
+        """Results of a query through the cache, and which channels were scanned."""
+        with contextlib.redirect_stdout(io.StringIO()):  # progress
+            return scan_channels_cached([(self.root, channel, DATES)], settings, set(),
+                                        PurityMatcher({}, {}), cache=cache)
+
+    def test_reuse(self):
+        """A repeated query is answered from the cache, a wider one is scanned again."""
+        cache = ResultCache()
+        (first,), missing = self.scan(cache, settings_for(count_words=True))
+        self.assertEqual(missing, [0])
+        (second,), missing = self.scan(cache, settings_for(count_words=True))
+        self.assertEqual(missing, [])
+        self.assertIs(second, first)
+        _, missing = self.scan(cache, settings_for(count_words=True, check_purity=True))
+        self.assertEqual(missing, [0])
+
+    def test_excluded_words_filtered(self):
+        """Newly excluded words are dropped from a copy, leaving the cached counts whole."""
+        cache = ResultCache()
+        (first,), _ = self.scan(cache, settings_for(count_words=True))
+        (second,), missing = self.scan(cache, settings_for(count_words=True,
+                                                           excluded_words={"hello"}))
+        self.assertEqual(missing, [])
+        self.assertEqual(dict(second.words), {"world": 2})
+        self.assertEqual(dict(first.words), {"hello": 4, "world": 2})
+
+    def test_changed_size(self):
+        """A result is dropped once one of its logs has grown."""
+        cache = ResultCache()
+        self.scan(cache, settings_for())
+        with open(f"{self.root}/chan-{DATES[1]}.log", 'a', encoding='UTF-8') as file:
+            file.write("[10:00:02]  carol: hi\n")
+        (result,), missing = self.scan(cache, settings_for())
+        self.assertEqual(missing, [0])
+        self.assertEqual(result.total_count, 5)
+
+    def test_changed_mtime(self):
+        """A result is dropped once one of its logs has been modified, even at the same size."""
+        cache = ResultCache()
+        self.scan(cache, settings_for())
+        path = f"{self.root}/chan-{DATES[0]}.log"
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        key = scan_key(self.root, "chan", DATES, settings_for())
+        self.assertIsNone(cache.get(key, settings_for()))
+        self.assertNotIn(key, cache.entries)
+
+    def test_key(self):
+        """Keys differ by line filters, and commands asked for by a query are never excluded."""
+        key = scan_key(self.root, "chan", DATES, settings_for())
+        self.assertEqual(key, scan_key(self.root, "chan", DATES, settings_for(count_words=True)))
+        self.assertNotEqual(key, scan_key(self.root, "chan", DATES,
+                                          settings_for(exclude_commands=True)))
+        self.assertEqual(scan_key(self.root, "chan", DATES, settings_for(word_query="`C")),
+                         scan_key(self.root, "chan", DATES,
+                                  settings_for(word_query="`C", exclude_commands=True)))
+
+    def test_evict_entries(self):
+        """The least recently used result goes first once there are too many."""
+        cache, settings = ResultCache(max_entries=2), settings_for()
+        keys = [scan_key(self.root, "chan", dates, settings)
+                for dates in ([DATES[0]], [DATES[1]], DATES)]
+        for key in keys[:2]:
+            cache.put(key, settings, ScanResult(), file_stats(*key[:3]))
+        self.assertIsNotNone(cache.get(keys[0], settings))
+        cache.put(keys[2], settings, ScanResult(), file_stats(*keys[2][:3]))
+        self.assertEqual(list(cache.entries), [keys[0], keys[2]])
+
+    def test_evict_bytes(self):
+        """Results are evicted to stay under the byte limit, and too large ones never kept."""
+        size = result_size(ScanResult())
+        cache = ResultCache(max_bytes=2*size)
+        settings = settings_for()
+        for key in ("a", "b", "c"):
+            cache.put((key,), settings, ScanResult(), [])
+        self.assertEqual(list(cache.entries), [("b",), ("c",)])
+        self.assertEqual(cache.size, 2*size)
+        large = ScanResult()
+        large.impure_terms.update({f"term{i}": 1 for i in range(1000)})
+        cache.put(("large",), settings, large, [])
+        self.assertNotIn(("large",), cache.entries)
+        self.assertEqual(cache.size, 2*size)
+        cache.pop(("b",))
+        self.assertEqual(cache.size, size)
+
+
+if __name__ == '__main__':
+    unittest.main()
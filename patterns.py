@@ -1,54 +1,110 @@
 """Message query matching logic."""
 import re
+from typing import Tuple
+
+MODES = {"`U", "`L", "`T", "`Ts", "`C"}
+COMMAND_PATTERN = re.compile(r"^!\w+")
+QUERY_PATTERN = re.compile(r"^(?:\$(?P<user>\S+) ?)?(?P<message>.*)$")
+
+
+def split_query(query: str) -> Tuple[str, str]:
+    """Split a "[$user] [message query]" input into its lowercased user and message parts."""
+    if not query or not (cquery := QUERY_PATTERN.fullmatch(query)):
+        return '', ''
+    return (cquery['user'] or '').lower(), cquery['message']
+
+
+def strip_query(query: str) -> str:
+    """Query text without its mode, prefix, suffix or exclusion marker."""
+    if query in MODES:
+        return ''
+    if query.startswith('>'):
+        return query[1:]
+    if query.endswith('<'):
+        return query[:-1]
+    return query[1:] if query.startswith('~') else query
+
 
 def mode(query: str, message: str) -> bool:
     """Handle query modes."""
     if query in {"`T", "`Ts", "`C"} and len(message) < 2:
         return False
     if query == "`C":
-        return bool(re.match(r"^!\w+", message)) and '!' not in message.split(' ')[0][1:]
-    if (bool(re.match(r"^!\w+", message)) or
+        return bool(COMMAND_PATTERN.match(message)) and '!' not in message.split(' ')[0][1:]
+    if (bool(COMMAND_PATTERN.match(message)) or
             not all(x.isalpha() or x.isspace() for x in message)):
         return False
-    modes = {
-        "`U": message.isupper(),
-        "`L": message.islower(),
-        "`T": message[0].isupper() and message[1].isalpha() and message[1].islower(),
-        "`Ts": (message[0].isupper() and
-                all(x.islower() for x in message[1:] if x.isalpha()))
-        }
-    return modes[query]
-
-def start(message: str, fix_query: str, check_exact_word: bool) -> bool:
-    """Handle startswith query."""
-    return (bool(re.match(rf"^{fix_query}\b.*", message))
-            if check_exact_word else message.startswith(fix_query))
-
-def end(message: str, fix_query: str, check_exact_word: bool) -> bool:
-    """Handle endswith query."""
-    return (bool(re.match(rf".*\b{fix_query}$", message))
-            if check_exact_word else message.endswith(fix_query))
-
-def exclude(message: str, fix_query: str, check_exact_word: bool) -> bool:
-    """Handle exclusion query."""
-    return (not bool(re.match(rf".*\b{fix_query}\b.*", message))
-            if check_exact_word else fix_query not in message)
-
-def include(message: str, fix_query: str, check_exact_word: bool) -> bool:
-    """Handle inclusion query."""
-    return (bool(re.match(rf".*\b{fix_query}\b.*", message))
-            if check_exact_word else fix_query in message)
+    if query == "`U":
+        return message.isupper()
+    if query == "`L":
+        return message.islower()
+    if query == "`T":
+        return message[0].isupper() and message[1].isalpha() and message[1].islower()
+    return (message[0].isupper() and
+            all(x.islower() for x in message[1:] if x.isalpha()))
+
+
+class MessageQuery:
+    """Query pattern prepared once for matching against many messages."""
+    def __init__(self, query: str, fix_query: str, check_case: bool, check_exact_word: bool,
+                 literal: bool = False):
+        self.query, self.fix_query = query, fix_query
+        self.check_case, self.check_exact_word = check_case, check_exact_word
+        self.literal = literal
+        needle = fix_query if check_case else fix_query.lower()
+        self.needle, pattern = needle, ''
+        # substring checks run first, word-boundary patterns only confirm candidates
+        if literal:  # quoted text is searched for as is, without modes or anchors
+            self.kind, pattern = 'include', rf"\b{re.escape(needle)}\b"
+        elif query in MODES:
+            self.kind = 'mode'
+        elif query.startswith('>'):
+            self.kind, pattern = 'start', rf"^{re.escape(needle)}\b"
+        elif query.endswith('<'):
+            self.kind, pattern = 'end', rf"\b{re.escape(needle)}$"
+        else:
+            self.kind = 'exclude' if query.startswith('~') else 'include'
+            pattern = rf"\b{re.escape(needle)}\b"
+        self.pattern = re.compile(pattern) if check_exact_word and pattern else None
+        self.matches = getattr(self, '_'+self.kind)
+
+    def __reduce__(self):
+        return (MessageQuery, (self.query, self.fix_query, self.check_case,
+                               self.check_exact_word, self.literal))
+
+    def _mode(self, message: str) -> bool:
+        return mode(self.query, message)
+
+    def _start(self, message: str) -> bool:
+        if not self.check_case:
+            message = message.lower()
+        if not message.startswith(self.needle):
+            return False
+        return self.pattern is None or self.pattern.match(message) is not None
+
+    def _end(self, message: str) -> bool:
+        if not self.check_case:
+            message = message.lower()
+        if not message.endswith(self.needle):
+            return False
+        return self.pattern is None or self.pattern.search(message) is not None
+
+    def _exclude(self, message: str) -> bool:
+        if not self.check_case:
+            message = message.lower()
+        if self.needle not in message:
+            return True
+        return self.pattern is not None and self.pattern.search(message) is None
+
+    def _include(self, message: str) -> bool:
+        if not self.check_case:
+            message = message.lower()
+        if self.needle not in message:
+            return False
+        return self.pattern is None or self.pattern.search(message) is not None
+
 
 def check_msg(message: str, query: str, fix_query: str,
               check_case: bool, check_exact_word: bool) -> bool:
     """Test if a message matches a query pattern."""
-    if query in {"`U", "`L", "`T", "`Ts", "`C"}:
-        return mode(query, message)
-    if not check_case:
-        message, fix_query = message.lower(), fix_query.lower()
-    args = (message, fix_query, check_exact_word)
-    if query.startswith('>'):
-        return start(*args)
-    if query.endswith('<'):
-        return end(*args)
-    return exclude(*args) if query.startswith('~') else include(*args)
+    return MessageQuery(query, fix_query, check_case, check_exact_word).matches(message)
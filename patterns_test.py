@@ -0,0 +1,61 @@
+"""Tests of message query matching against the original per-message checks."""
+import itertools
+import pickle
+import re
+import unittest
+
+from patterns import MODES, MessageQuery, check_msg, mode, strip_query
+
+MESSAGES = ["", "a", "hi", "Hi there", "HI THERE", "oh hi", "ohhi", "hi!", "say hi to chat",
+            "!hi command", "this is it", "hithere hi", "KEKW KEKW", "kekw", "Kekw lol",
+            "pog pogchamp", "POGGERS", "x pog", "Title Case Words", "Title case words"]
+QUERIES = ["hi", ">hi", "hi<", "~hi", "kekw", ">kekw", "kekw<", "~kekw", "pog", ">pog", "pog<",
+           "~pog", "Hi", ">Hi", "HI<", "~POG", "hi there", *sorted(MODES)]
+
+
+def old_check_msg(message: str, query: str, fix_query: str,
+                  check_case: bool, check_exact_word: bool) -> bool:
+    """The check every message was matched with before queries were compiled."""
+    if query in MODES:
+        return mode(query, message)
+    if not check_case:
+        message, fix_query = message.lower(), fix_query.lower()
+    if query.startswith('>'):
+        return (bool(re.match(rf"^{fix_query}\b.*", message))
+                if check_exact_word else message.startswith(fix_query))
+    if query.endswith('<'):
+        return (bool(re.match(rf".*\b{fix_query}$", message))
+                if check_exact_word else message.endswith(fix_query))
+    included = (bool(re.match(rf".*\b{fix_query}\b.*", message))
+                if check_exact_word else fix_query in message)
+    return not included if query.startswith('~') else included
+
+
+class MessageQueryTest(unittest.TestCase):
+    """MessageQuery against the original checks."""
+    def test_matches_old_check(self):
+        """Every query kind and flag matches as it did before compiling."""
+        for query, check_case, check_exact_word in itertools.product(
+                QUERIES, (False, True), (False, True)):
+            message_query = MessageQuery(query, strip_query(query), check_case, check_exact_word)
+            for message in MESSAGES:
+                with self.subTest(query=query, message=message, check_case=check_case,
+                                  check_exact_word=check_exact_word):
+                    expected = old_check_msg(message, query, strip_query(query),
+                                             check_case, check_exact_word)
+                    self.assertEqual(message_query.matches(message), expected)
+                    self.assertEqual(check_msg(message, query, strip_query(query),
+                                               check_case, check_exact_word), expected)
+
+    def test_pickle(self):
+        """Queries sent to worker processes match the same way."""
+        for query in QUERIES:
+            message_query = MessageQuery(query, strip_query(query), False, True)
+            copy = pickle.loads(pickle.dumps(message_query))
+            self.assertEqual(copy.kind, message_query.kind)
+            self.assertEqual([copy.matches(message) for message in MESSAGES],
+                             [message_query.matches(message) for message in MESSAGES])
+
+
+if __name__ == '__main__':
+    unittest.main()
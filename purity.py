@@ -0,0 +1,81 @@
+"""Multi-term impurity matching of messages against categorized term lists."""
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+PURITY_TYPES = ("strong_curse", "mild_curse", "sexual")
+
+
+def is_boundary(text: str, i: int) -> bool:
+    """Whether a word could start or end between text[i-1] and text[i]."""
+    if i == 0 or i == len(text):
+        return True
+    before, after = text[i-1], text[i]
+    if not (before.isalnum() and after.isalnum()):
+        return True
+    # emotes run into words without spaces: "shitKEKW", "KEKWshit"
+    if before.islower() and after.isupper():
+        return True
+    return before.isupper() and after.islower() and i > 1 and text[i-2].isupper()
+
+
+class PurityMatcher:
+    """Aho-Corasick automaton over every purity term, matched in one pass per message."""
+    def __init__(self, categories: Dict[str, Iterable[str]], weights: Dict[str, float]):
+        self.terms: List[Tuple[str, str]] = []  # (term, category) of each output id
+        for category, terms in categories.items():
+            for term in dict.fromkeys(' '.join(term.lower().split()) for term in terms):
+                if term:
+                    self.terms.append((term, category))
+        self.weights = [weights.get(category, 1.0) for _, category in self.terms]
+
+        # trie of the terms, then failure links in breadth-first order
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for term_id, (term, _) in enumerate(self.terms):
+            state = 0
+            for char in term:
+                if (state_next := goto[state].get(char)) is None:
+                    state_next = len(goto)
+                    goto[state][char] = state_next
+                    goto.append({})
+                    outputs.append([])
+                state = state_next
+            outputs[state].append(term_id)
+        # transitions are completed with those of the failure state (all but the root's,
+        # which are looked up last), so scanning never has to follow failure links
+        self.root = goto[0]
+        self.delta: List[Dict[str, int]] = [{} for _ in goto]
+        fail = [0]*len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state] += outputs[fail[state]]
+            self.delta[state] = {**self.delta[fail[state]], **goto[state]}
+            for char, state_next in goto[state].items():
+                fail[state_next] = (self.delta[fail[state]].get(char)
+                                    or self.root.get(char, 0))
+                queue.append(state_next)
+        self.outputs = [tuple(output) for output in outputs]
+
+    def __bool__(self) -> bool:
+        return bool(self.terms)
+
+    def matches(self, message: str) -> List[int]:
+        """Ids of the terms found in a message as whole words (or next to emotes)."""
+        text = message.lower()
+        if len(text) != len(message):  # lowercasing changed offsets, check boundaries on it
+            message = text
+        delta, root, outputs, terms = self.delta, self.root, self.outputs, self.terms
+        found, state = [], 0
+        for end, char in enumerate(text, start=1):
+            state = delta[state].get(char) or root.get(char, 0)
+            if outputs[state]:
+                for term_id in outputs[state]:
+                    start = end - len(terms[term_id][0])
+                    if is_boundary(message, start) and is_boundary(message, end):
+                        found.append(term_id)
+        return found
+
+    def weight(self, term_ids: List[int]) -> float:
+        """Impurity of a message from the heaviest category it matched."""
+        return max(self.weights[term_id] for term_id in term_ids)
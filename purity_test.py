@@ -0,0 +1,78 @@
+"""Tests of the purity term automaton against a brute-force substring search."""
+import random
+import unittest
+from typing import List
+
+from purity import PurityMatcher, is_boundary
+
+CATEGORIES = {"strong_curse": ["ab", "abc", "b", "A B"], "mild_curse": ["bc", "cab", "abab"],
+              "sexual": ["c", "bca", "ab"]}
+WEIGHTS = {"strong_curse": 1.0, "mild_curse": 0.5, "sexual": 0.25}
+ALPHABET = "abcABC !\u0130"  # dotted capital I lowercases to two characters
+
+
+def brute_force(matcher: PurityMatcher, message: str) -> List[int]:
+    """Ids of the terms found in a message by trying every term at every offset."""
+    text = message.lower()
+    if len(text) != len(message):
+        message = text
+    found = []
+    for term_id, (term, _) in enumerate(matcher.terms):
+        start = text.find(term)
+        while start != -1:
+            if is_boundary(message, start) and is_boundary(message, start + len(term)):
+                found.append(term_id)
+            start = text.find(term, start + 1)
+    return found
+
+
+class PurityMatcherTest(unittest.TestCase):
+    """PurityMatcher against a brute-force search."""
+    def setUp(self):
+        self.matcher = PurityMatcher(CATEGORIES, WEIGHTS)
+
+    def test_terms(self):
+        """Terms are lowercased, space-normalized and kept once per category."""
+        self.assertEqual(self.matcher.terms, [
+            ("ab", "strong_curse"), ("abc", "strong_curse"), ("b", "strong_curse"),
+            ("a b", "strong_curse"), ("bc", "mild_curse"), ("cab", "mild_curse"),
+            ("abab", "mild_curse"), ("c", "sexual"), ("bca", "sexual"), ("ab", "sexual")])
+
+    def test_random_messages(self):
+        """Overlapping and nested terms are all found, as a brute-force search finds them."""
+        rng = random.Random(0)
+        for _ in range(3000):
+            message = ''.join(rng.choice(ALPHABET) for _ in range(rng.randrange(12)))
+            with self.subTest(message=message):
+                self.assertEqual(sorted(self.matcher.matches(message)),
+                                 sorted(brute_force(self.matcher, message)))
+
+    def found(self, message: str) -> List[str]:
+        """Sorted terms matched in a message."""
+        return sorted(self.matcher.terms[term_id][0] for term_id in self.matcher.matches(message))
+
+    def test_boundaries(self):
+        """Terms only match as whole words, or where an emote runs into them."""
+        found = self.found
+        self.assertEqual(found("ab"), ["ab", "ab"])
+        self.assertEqual(found("xab"), [])
+        self.assertEqual(found("KEKWab"), ["ab", "ab"])
+        self.assertEqual(found("abKEKW"), ["ab", "ab"])
+        self.assertEqual(found("a b!"), ["a b", "b"])
+
+    def test_weight(self):
+        """A message weighs as much as its heaviest matched category."""
+        ids = {term: term_id for term_id, (term, _) in enumerate(self.matcher.terms)}
+        self.assertEqual(self.matcher.weight([ids["c"]]), 0.25)
+        self.assertEqual(self.matcher.weight([ids["c"], ids["bc"]]), 0.5)
+        self.assertEqual(self.matcher.weight(self.matcher.matches("abc")), 1.0)
+
+    def test_empty(self):
+        """A matcher without terms is falsy and finds nothing."""
+        matcher = PurityMatcher({"strong_curse": ["", " "]}, WEIGHTS)
+        self.assertFalse(matcher)
+        self.assertEqual(matcher.matches("anything"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""Top-K selection and bounded-memory frequency estimation."""
+import heapq
+import math
+from typing import Dict, ItemsView, List, Mapping, Tuple, Union
+
+
+def top_items(d: Mapping, limit: int, reverse: bool = True) -> List[Tuple]:
+    """Highest (or lowest) valued items, ordered as a stable sort of the mapping would be."""
+    pick = heapq.nlargest if reverse else heapq.nsmallest
+    return pick(limit, d.items(), key=lambda item: item[1])
+
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter summary with at most 2/epsilon counters."""
+    def __init__(self, epsilon: float):
+        # estimates never undercount, and overcount by at most `error` (about total*epsilon)
+        self.capacity = math.ceil(1/epsilon)
+        self.counts: Dict[str, int] = {}
+        self.error = 0  # upper bound on the count of any key not being tracked
+
+    def update(self, counts: Union[Mapping[str, int], "SpaceSaving"]):
+        """Add exact counts or another summary, compacting when over capacity."""
+        other_error = counts.error if isinstance(counts, SpaceSaving) else 0
+        if isinstance(counts, SpaceSaving):
+            counts = counts.counts
+        if other_error:
+            for key in self.counts.keys() - counts.keys():
+                self.counts[key] += other_error
+        for key, value in counts.items():
+            if key in self.counts:
+                self.counts[key] += value
+            else:
+                self.counts[key] = value + self.error
+        self.error += other_error
+        if len(self.counts) > 2*self.capacity:
+            kept = heapq.nlargest(self.capacity+1, self.counts.items(), key=lambda item: item[1])
+            self.error = max(self.error, kept.pop()[1])
+            self.counts = dict(kept)
+
+    def items(self) -> ItemsView[str, int]:
+        """Tracked keys with their estimated counts."""
+        return self.counts.items()
+
+    def __len__(self) -> int:
+        return len(self.counts)
@@ -0,0 +1,86 @@
+"""Tests of top-K selection and Space-Saving error bounds."""
+import random
+import unittest
+from collections import Counter
+from typing import List
+
+from ranking import SpaceSaving, top_items
+
+
+def random_counts(rng: random.Random, size: int) -> Counter:
+    """Word counts with a long tail, as chat messages have."""
+    return Counter(f"word{int(rng.paretovariate(1.2))}" for _ in range(size))
+
+
+def summarize(counts: Counter, epsilon: float, chunk: int = 7) -> SpaceSaving:
+    """A summary fed a few keys at a time, as a day's words are."""
+    summary, items = SpaceSaving(epsilon), list(counts.items())
+    for i in range(0, len(items), chunk):
+        summary.update(dict(items[i:i+chunk]))
+    return summary
+
+
+class TopItemsTest(unittest.TestCase):
+    """top_items against a stable sort."""
+    def test_stable_sort(self):
+        """The first items of a stable sort, highest or lowest first."""
+        rng = random.Random(0)
+        for _ in range(200):
+            counts = {f"key{i}": rng.randrange(5) for i in range(rng.randrange(30))}
+            for limit in range(len(counts)+2):
+                for reverse in (True, False):
+                    self.assertEqual(top_items(counts, limit, reverse), sorted(
+                        counts.items(), key=lambda item: item[1], reverse=reverse)[:limit])
+
+
+class SpaceSavingTest(unittest.TestCase):
+    """SpaceSaving estimates against exact counts."""
+    def assert_bounds(self, summary: SpaceSaving, counts: Counter, epsilon: float):
+        """Estimates never undercount, overcount by at most the error, itself within bounds."""
+        self.assertLessEqual(len(summary), 2*summary.capacity)
+        self.assertLessEqual(summary.error, sum(counts.values())*epsilon)
+        for key, count in counts.items():
+            if (estimate := summary.counts.get(key)) is None:
+                self.assertLessEqual(count, summary.error, key)
+            else:
+                self.assertLessEqual(count, estimate, key)
+                self.assertLessEqual(estimate, count + summary.error, key)
+
+    def test_exact_under_capacity(self):
+        """Few enough keys are counted exactly."""
+        summary = summarize(Counter({"a": 3, "b": 2, "c": 1}), 0.1)
+        self.assertEqual(summary.error, 0)
+        self.assertEqual(dict(summary.items()), {"a": 3, "b": 2, "c": 1})
+
+    def test_bounds(self):
+        """A single summary stays within its error bounds."""
+        rng = random.Random(1)
+        for epsilon in (0.05, 0.1, 0.25):
+            for _ in range(50):
+                counts = random_counts(rng, rng.randrange(1000))
+                self.assert_bounds(summarize(counts, epsilon), counts, epsilon)
+
+    def test_bounds_after_merges(self):
+        """Summaries merged together (as from worker processes) stay within bounds."""
+        rng = random.Random(2)
+        for epsilon in (0.05, 0.1, 0.25):
+            for _ in range(50):
+                parts: List[Counter] = [random_counts(rng, rng.randrange(400))
+                                        for _ in range(rng.randrange(1, 6))]
+                merged = SpaceSaving(epsilon)
+                for part in parts:
+                    merged.update(summarize(part, epsilon))
+                self.assert_bounds(merged, sum(parts, Counter()), epsilon)
+
+    def test_heavy_hitters_kept(self):
+        """Keys counted more than the error are always tracked, even across merges."""
+        rng = random.Random(3)
+        parts = [random_counts(rng, 500) + Counter({"frequent": 100}) for _ in range(4)]
+        merged = SpaceSaving(0.05)
+        for part in parts:
+            merged.update(summarize(part, 0.05))
+        self.assertGreaterEqual(dict(merged.items())["frequent"], 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
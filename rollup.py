@@ -0,0 +1,121 @@
+"""Per-day rollups of message, word and character counts by user, minute and command flag."""
+import datetime
+import os
+import struct
+from typing import Dict, List, Optional, Tuple
+
+import numpy
+
+from logs import CACHE_FOLDER, Columns, log_path, read_day
+from patterns import COMMAND_PATTERN
+from timing import Profile
+
+MINUTES = 24*60
+ROLLUP_MAGIC, ROLLUP_VERSION = b"CLER", 1
+# magic, version, log size, log mtime (ns), group count, user names length
+ROLLUP_HEADER = struct.Struct("<4sHQqIQ")
+# one group per user, minute of the day and command flag, with the row of its first line
+GROUP_DTYPE = numpy.dtype([('user', '<i4'), ('minute', '<i2'), ('command', '?'),
+                           ('first', '<i4'), ('messages', '<i4'), ('words', '<i4'),
+                           ('chars', '<i4')])
+
+Rollup = Tuple[List[str], numpy.ndarray]  # user names, groups indexing them
+
+
+def parse_minutes(times: List[str]) -> numpy.ndarray:
+    """Minute of the day of each HH:MM:SS timestamp."""
+    if not times:
+        return numpy.zeros(0, dtype=numpy.int64)
+    try:
+        raw = ''.join(times).encode('ascii')
+    except UnicodeEncodeError:
+        raw = b''
+    if len(raw) == 8*len(times):  # fixed-width HH:MM:SS, parsed without a Python loop
+        digits = numpy.frombuffer(raw, dtype=numpy.uint8).reshape(-1, 8).astype(numpy.int64) - 48
+        hours, minutes = digits[:, 0]*10 + digits[:, 1], digits[:, 3]*10 + digits[:, 4]
+    else:
+        stamps = [time.replace(':', '') for time in times]
+        hours = numpy.array([int(stamp[:2]) for stamp in stamps], dtype=numpy.int64)
+        minutes = numpy.array([int(stamp[2:4] or 0) for stamp in stamps], dtype=numpy.int64)
+    return (hours*60 + minutes) % MINUTES
+
+
+def rollup_path(channel: str, date: str) -> str:
+    """Path of the rollup file for a channel's log on a given date."""
+    return f"{CACHE_FOLDER}/{channel}/{channel}-{date}.rollup"
+
+
+def build_rollup(columns: Columns) -> Rollup:
+    """Count a day's parsed lines by user (in first-seen order), minute and command flag."""
+    times, users, messages = columns
+    ids: Dict[str, int] = {}
+    user_ids = numpy.fromiter((ids.setdefault(user, len(ids)) for user in users),
+                              dtype=numpy.int64, count=len(users))
+    commands = numpy.fromiter((COMMAND_PATTERN.match(message) is not None
+                               for message in messages), dtype=numpy.int64, count=len(messages))
+    keys, first, inverse = numpy.unique((user_ids*MINUTES + parse_minutes(times))*2 + commands,
+                                        return_index=True, return_inverse=True)
+    groups = numpy.zeros(len(keys), dtype=GROUP_DTYPE)
+    groups['user'], minutes = numpy.divmod(keys, MINUTES*2)
+    groups['minute'], groups['command'] = numpy.divmod(minutes, 2)
+    groups['first'] = first
+    groups['messages'] = numpy.bincount(inverse, minlength=len(keys))
+    groups['words'] = numpy.bincount(inverse, [len(message.split(' ')) for message in messages],
+                                     minlength=len(keys))
+    groups['chars'] = numpy.bincount(inverse, [len(message.replace(' ', ''))
+                                               for message in messages], minlength=len(keys))
+    return list(ids), groups
+
+
+def write_rollup(path: str, stat: os.stat_result, rollup: Rollup):
+    """Store a rollup as its newline-joined user names and raw groups behind a fixed header."""
+    names, groups = rollup
+    blob = '\n'.join(names).encode('UTF-8')
+    header = ROLLUP_HEADER.pack(ROLLUP_MAGIC, ROLLUP_VERSION, stat.st_size, stat.st_mtime_ns,
+                                len(groups), len(blob))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path+".tmp", 'wb') as file:
+        file.write(header)
+        file.write(blob)
+        file.write(groups.tobytes())
+    os.replace(path+".tmp", path)
+
+
+def read_rollup(path: str, stat: os.stat_result) -> Optional[Rollup]:
+    """Load a rollup if it matches the log's current size and mtime."""
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except OSError:
+        return None
+    if len(data) < ROLLUP_HEADER.size:
+        return None
+    magic, version, size, mtime, count, length = ROLLUP_HEADER.unpack_from(data)
+    if (magic, version, size, mtime) != (ROLLUP_MAGIC, ROLLUP_VERSION,
+                                         stat.st_size, stat.st_mtime_ns):
+        return None
+    if not count:
+        return [], numpy.zeros(0, dtype=GROUP_DTYPE)
+    offset = ROLLUP_HEADER.size
+    names = data[offset:offset+length].decode('UTF-8').split('\n')
+    return names, numpy.frombuffer(data, dtype=GROUP_DTYPE, count=count, offset=offset+length)
+
+
+def day_rollup(rootpath: str, channel: str, date: str,
+               profile: Optional[Profile] = None) -> Rollup:
+    """A day's rollup, rebuilt from its parsed lines if missing or stale (kept once it's over)."""
+    path = log_path(rootpath, channel, date)
+    stat = os.stat(path)
+    if (rollup := read_rollup(rollup_path(channel, date), stat)) is not None:
+        if profile:
+            profile.lap('rollup')
+        return rollup
+    rollup = build_rollup(read_day(rootpath, channel, date, profile=profile))
+    if date < datetime.date.today().isoformat():  # today's log is still being written
+        try:
+            write_rollup(rollup_path(channel, date), stat, rollup)
+        except OSError:
+            pass
+    if profile:
+        profile.lap('rollup')
+    return rollup
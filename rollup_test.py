@@ -0,0 +1,172 @@
+"""Tests of per-day rollups."""
+import datetime
+import itertools
+import os
+import random
+import tempfile
+import unittest
+from collections import Counter
+
+import numpy
+
+from patterns import COMMAND_PATTERN
+from purity import PurityMatcher
+from rollup import (GROUP_DTYPE, build_rollup, day_rollup, parse_minutes, read_rollup,
+                    rollup_path, write_rollup)
+from scan import ScanResult, ScanSettings, scan_lines, scan_rollup, uses_rollups
+
+COLUMNS = (["00:00:01", "00:00:30", "00:01:00", "13:37:00", "13:37:59", "23:59:59"],
+           ["alice", "bob", "alice", "alice", "alice", "bob"],
+           ["hi there", "!cmd x", "hello", "a b c", "!other", "bye ✓"])
+BOTS = {"nightbot"}
+
+
+def scan_settings(**changes) -> ScanSettings:
+    """Settings of a count-only query over all messages, with the given changes."""
+    settings = ScanSettings(
+        search_type='all', user_query='', check_exact_name=False, message_query='',
+        fix_query='', check_case=False, check_exact_word=False, word_query='',
+        word_fix_query='', word_check_case=False, excluded_words=set(), unique_only=False,
+        word_users=None, exclude_commands=False, exclude_bots=False, show_msgs=False,
+        show_indiv_word=True, show_indiv_char=True, check_purity=False, count_words=False,
+        word_error=0.0, sample_size=0)
+    settings.update(changes)  # type: ignore
+    return settings
+
+
+def generated_columns(seed: int, count: int):
+    """A day's lines from a few chatters and a bot, many of them commands."""
+    rng = random.Random(seed)
+    users = ["user0", "user1", "User2x", "nightbot"]
+    lines = sorted((f"{rng.randrange(24):02}:{rng.randrange(60):02}:{rng.randrange(60):02}",
+                    rng.choice(users), rng.choice(["!uptime", "!so user0", "hi chat", "a b  c",
+                                                   "!", "KEKW !lol", "gg"]))
+                   for _ in range(count))
+    return tuple(list(column) for column in zip(*lines))
+
+
+class RollupTest(unittest.TestCase):
+    """Rollups built, written and read back, or rejected once stale."""
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.cwd = os.getcwd()
+        os.chdir(self.folder.name)  # the cache folder is relative to the working directory
+        self.log = "chan-2024-01-01.log"
+        self.write_log(COLUMNS)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.folder.cleanup()
+
+    def write_log(self, columns, date: str = "2024-01-01"):
+        """Write a day log of the given lines."""
+        with open(f"chan-{date}.log", 'w', encoding='UTF-8') as file:
+            file.writelines(f"[{time}]  {user}: {message}\n" for time, user, message
+                            in zip(*columns))
+
+    def test_parse_minutes(self):
+        """Fixed-width and irregular timestamps give the same minutes."""
+        self.assertEqual(parse_minutes(["00:00:01", "13:37:59", "23:59:00"]).tolist(),
+                         [0, 817, 1439])
+        self.assertEqual(parse_minutes(["0:00:01", "13:37:59", "23:59"]).tolist(),
+                         [0, 817, 1439])
+        self.assertEqual(parse_minutes([]).tolist(), [])
+
+    def test_build(self):
+        """Groups hold the counts of every user, minute and command flag."""
+        names, groups = build_rollup(COLUMNS)
+        self.assertEqual(names, ["alice", "bob"])
+        expected = Counter()
+        for row, (time, user, message) in enumerate(zip(*COLUMNS)):
+            key = (names.index(user), int(parse_minutes([time])[0]),
+                   COMMAND_PATTERN.match(message) is not None)
+            expected[key + ('messages',)] += 1
+            expected[key + ('words',)] += len(message.split(' '))
+            expected[key + ('chars',)] += len(message.replace(' ', ''))
+            expected.setdefault(key + ('first',), row)
+        self.assertEqual(len(groups), len({key[:3] for key in expected}))
+        for group in groups:
+            key = (int(group['user']), int(group['minute']), bool(group['command']))
+            for field in ('messages', 'words', 'chars', 'first'):
+                self.assertEqual(int(group[field]), expected[key + (field,)], (key, field))
+
+    def test_round_trip(self):
+        """Rollups come back as they were written, and are ignored once stale."""
+        path, stat = rollup_path("chan", "2024-01-01"), os.stat(self.log)
+        names, groups = build_rollup(COLUMNS)
+        write_rollup(path, stat, (names, groups))
+        read = read_rollup(path, stat)
+        assert read is not None
+        self.assertEqual(read[0], names)
+        self.assertEqual(read[1].tolist(), groups.tolist())
+        self.assertEqual(read[1].dtype, GROUP_DTYPE)
+        os.utime(self.log, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNone(read_rollup(path, os.stat(self.log)))
+        self.write_log(tuple(column[:2] for column in COLUMNS))
+        os.utime(self.log, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertIsNone(read_rollup(path, os.stat(self.log)))
+
+    def test_empty(self):
+        """A day without lines rolls up to no groups."""
+        path, stat = rollup_path("chan", "2024-01-01"), os.stat(self.log)
+        write_rollup(path, stat, build_rollup(([], [], [])))
+        read = read_rollup(path, stat)
+        assert read is not None
+        self.assertEqual((read[0], len(read[1])), ([], 0))
+
+    def test_day_rollup(self):
+        """Past days are stored once built, today's log is rolled up afresh every time."""
+        names, groups = day_rollup(".", "chan", "2024-01-01")
+        self.assertEqual(names, ["alice", "bob"])
+        self.assertTrue(os.path.exists(rollup_path("chan", "2024-01-01")))
+        stored = read_rollup(rollup_path("chan", "2024-01-01"), os.stat(self.log))
+        assert stored is not None
+        self.assertTrue(numpy.array_equal(stored[1], groups))
+        today = datetime.date.today().isoformat()
+        self.write_log(COLUMNS, today)
+        day_rollup(".", "chan", today)
+        self.assertFalse(os.path.exists(rollup_path("chan", today)))
+
+
+class RollupScanTest(unittest.TestCase):
+    """Count-only scans from rollups against scans of the lines themselves."""
+    def assert_same(self, rolled: ScanResult, scanned: ScanResult):
+        """Results hold the same counts, with chatters in the same order."""
+        self.assertEqual(rolled.total_count, scanned.total_count)
+        self.assertEqual(rolled.daily_count, scanned.daily_count)
+        self.assertTrue(numpy.array_equal(rolled.minutes, scanned.minutes))
+        self.assertTrue(numpy.array_equal(rolled.weekday_hours, scanned.weekday_hours))
+        self.assertEqual(rolled.users.names, scanned.users.names)
+        for key in ('messages', 'words', 'chars'):
+            self.assertEqual(rolled.users[key].tolist(), scanned.users[key].tolist(), key)
+        assert rolled.profile is not None and scanned.profile is not None
+        self.assertEqual(rolled.profile.counts, scanned.profile.counts)
+
+    def test_equivalence(self):
+        """Filters on commands, bots and users drop the same lines either way."""
+        queries = [{}, {'search_type': 'user', 'user_query': 'user0', 'check_exact_name': True},
+                   {'search_type': 'user', 'user_query': 'user', 'check_exact_name': False},
+                   {'search_type': 'user', 'user_query': 'nightbot', 'check_exact_name': True}]
+        word_queries = [{}, {'word_query': '`C'}, {'word_query': 'hi'}]
+        for seed, query, word_query, exclude_commands, exclude_bots in itertools.product(
+                range(3), queries, word_queries, (False, True), (False, True)):
+            columns = generated_columns(seed, 300)
+            settings = scan_settings(exclude_commands=exclude_commands,
+                                     exclude_bots=exclude_bots, **query, **word_query)
+            self.assertTrue(uses_rollups(settings))
+            with self.subTest(seed=seed, settings=settings):
+                self.assert_same(
+                    scan_rollup(build_rollup(columns), "2024-01-01", settings, BOTS),
+                    scan_lines(zip(*columns), "2024-01-01", settings, BOTS,
+                               PurityMatcher({}, {})))
+
+    def test_command_query(self):
+        """Commands are kept when the word query asks for them, even if otherwise excluded."""
+        columns = generated_columns(0, 300)
+        settings = scan_settings(exclude_commands=True, word_query='`C')
+        result = scan_rollup(build_rollup(columns), "2024-01-01", settings, BOTS)
+        self.assertEqual(result.total_count, 300)
+
+
+if __name__ == '__main__':
+    unittest.main()
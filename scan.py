@@ -0,0 +1,521 @@
+"""Scanning of day logs into aggregate statistics."""
+# pylint: disable=multiple-statements,too-many-arguments,too-many-locals,too-many-branches
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import datetime
+from functools import partial
+import os
+import random
+from typing import (TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Set,
+                    Tuple, TypedDict, Union)
+
+import numpy
+
+from catalog import date_catalog
+from expressions import parse_expression
+from logs import format_line, log_path, read_day, read_user_lines
+from patterns import COMMAND_PATTERN, MessageQuery
+from purity import PurityMatcher
+from ranking import SpaceSaving
+from rollup import MINUTES, Rollup, build_rollup, day_rollup, parse_minutes
+from timing import Profile
+from users import UserStats
+
+if TYPE_CHECKING:
+    from export import ExportSink
+
+SAMPLE_SIZE = 20  # messages kept per user for random picks, whatever their message count
+# distinct words whose decisions are remembered per word filter, and filters kept per process
+MAX_WORD_KEYS, MAX_WORD_FILTERS = 2**18, 8
+WORD_BATCH = 4096  # messages split into words at once
+
+
+class ScanSettings(TypedDict):
+    """Query and option data needed to scan a day log."""
+    search_type: str
+    user_query: str
+    check_exact_name: bool
+    message_query: str
+    fix_query: str
+    check_case: bool
+    check_exact_word: bool
+    word_query: str
+    word_fix_query: str
+    word_check_case: bool
+    excluded_words: Set[str]
+    unique_only: bool
+    word_users: Optional[Set[str]]
+    exclude_commands: bool
+    exclude_bots: bool
+    show_msgs: bool
+    show_indiv_word: bool
+    show_indiv_char: bool
+    check_purity: bool
+    count_words: bool
+    word_error: float
+    sample_size: int
+
+
+def minute_counts(times: List[str]) -> numpy.ndarray:
+    """Message counts for each minute of the day from HH:MM:SS timestamps."""
+    return numpy.bincount(parse_minutes(times), minlength=MINUTES)
+
+
+def score_purity(pcount: numpy.ndarray, icount: numpy.ndarray, mcount: numpy.ndarray,
+                 iweight: Optional[numpy.ndarray] = None) -> numpy.ndarray:
+    """Purity scores from arrays of users' pure, impure and total message counts."""
+    # impure messages only count as impure as their heaviest term category is weighted
+    pure, impure = pcount.astype(float), icount.astype(float)
+    if iweight is not None:
+        pure, impure = pure + impure - iweight, iweight
+    # arbitrary formula, modify as desired
+    return (100 * ((pure/(pure+impure))**(4.25 * (mcount.astype(float)**0.05)))).astype(int)
+
+
+class ScanResult:
+    """Aggregate statistics of matched messages."""
+    def __init__(self, sample_size: int = 0, word_error: float = 0.0):
+        self.total_count = 0
+        self.daily_count: Dict[str, int] = {}
+        self.minutes = numpy.zeros(MINUTES, dtype=numpy.int64)
+        self.weekday_hours = numpy.zeros((7, 24), dtype=numpy.int64)
+        self.users = UserStats(sample_size)
+        self.words: Union[Dict[str, int], SpaceSaving] = (SpaceSaving(word_error) if word_error
+                                                           else defaultdict(int))
+        self.impure_terms: Dict[str, int] = defaultdict(int)
+        self.lines: List[Tuple[str, str, str, str]] = []  # date, time, user, message
+        self.profile: Optional[Profile] = None
+
+    @property
+    def hourly(self) -> numpy.ndarray:
+        """Message counts for each hour of the day."""
+        return self.minutes.reshape(24, 60).sum(axis=1)
+
+    @property
+    def times(self) -> Dict[int, int]:
+        """Message counts by hour, for hours with any messages."""
+        hourly = self.hourly
+        return {int(hour): int(hourly[hour]) for hour in numpy.flatnonzero(hourly)}
+
+    def add_times(self, date: str, times: List[str]):
+        """Bin a day's matched timestamps by minute and by weekday and hour."""
+        self.add_minutes(date, minute_counts(times))
+
+    def add_minutes(self, date: str, minutes: numpy.ndarray):
+        """Add a day's message counts per minute, also by weekday and hour."""
+        self.minutes += minutes
+        try:
+            weekday = datetime.date.fromisoformat(date).weekday()
+        except ValueError:
+            return
+        self.weekday_hours[weekday] += minutes.reshape(24, 60).sum(axis=1)
+
+    def weekday_hours_per_day(self, dates: List[str]) -> numpy.ndarray:
+        """Counts by weekday and hour, averaged over how many of the dates fall on each weekday."""
+        days = numpy.zeros(7, dtype=numpy.int64)
+        for date in dates:
+            try:
+                days[datetime.date.fromisoformat(date).weekday()] += 1
+            except ValueError:
+                continue
+        return self.weekday_hours / numpy.maximum(days, 1)[:, None]
+
+    def merge(self, other: "ScanResult"):
+        """Fold in the result of a later scan, keeping first-seen key order."""
+        self.total_count += other.total_count
+        for key, value in other.daily_count.items():
+            self.daily_count[key] = self.daily_count.get(key, 0) + value
+        self.minutes += other.minutes
+        self.weekday_hours += other.weekday_hours
+        self.users.merge(other.users)
+        if isinstance(self.words, SpaceSaving):
+            self.words.update(other.words)
+        else:
+            for key, value in other.words.items():
+                self.words[key] += value
+        for key, value in other.impure_terms.items():
+            self.impure_terms[key] += value
+        if other.profile is not None:
+            if self.profile is None:
+                self.profile = Profile()
+            self.profile.merge(other.profile)
+
+
+class WordFilter:
+    """Whether each distinct word is counted and under which key, remembered across days."""
+    def __init__(self, settings: ScanSettings):
+        self.matches = (MessageQuery(settings['word_query'], settings['word_fix_query'],
+                                     settings['word_check_case'], False).matches
+                        if settings['word_query'] else None)
+        self.excluded_words, self.unique_only = settings['excluded_words'], settings['unique_only']
+        self.keys: Dict[str, Optional[str]] = {}
+
+    def key(self, word: str) -> Optional[str]:
+        """The key a word is counted under, or None if it isn't counted."""
+        try:
+            return self.keys[word]
+        except KeyError:
+            pass
+        if len(self.keys) >= MAX_WORD_KEYS:
+            self.keys.clear()
+        key: Optional[str] = None
+        if not self.matches or self.matches(word):
+            if (word_lower := word.lower()) not in self.excluded_words:
+                key = word_lower if self.unique_only else word
+        self.keys[word] = key
+        return key
+
+
+WORD_FILTERS: Dict[Tuple, WordFilter] = {}
+
+
+def word_filter(settings: ScanSettings) -> WordFilter:
+    """The process's word filter for a query's word settings, kept for its later days."""
+    filter_key = (settings['word_query'], settings['word_fix_query'], settings['word_check_case'],
+                  frozenset(settings['excluded_words']), settings['unique_only'])
+    if (words := WORD_FILTERS.get(filter_key)) is None:
+        if len(WORD_FILTERS) >= MAX_WORD_FILTERS:
+            WORD_FILTERS.clear()
+        words = WORD_FILTERS[filter_key] = WordFilter(settings)
+    return words
+
+
+def excludes_commands(settings: ScanSettings) -> bool:
+    """Whether command messages are left out, which they never are when a query asks for them."""
+    return (settings['exclude_commands']
+            and "`C" not in (settings['message_query'], settings['word_query']))
+
+
+def scan_lines(day_lines: Iterable[Tuple[str, str, str]], date: str, settings: ScanSettings,
+               bots: Set[str], purity: PurityMatcher,
+               profile: Optional[Profile] = None) -> ScanResult:
+    """Scan a day's parsed lines for messages matching the query."""
+    search_type, user_query = settings['search_type'], settings['user_query']
+    check_exact_name, message_query = settings['check_exact_name'], settings['message_query']
+    # a compound expression also looks at times and users, so it takes whole lines
+    line_matches = parse_expression(message_query, settings['check_case'],
+                                    settings['check_exact_word'])
+    message_matches = (MessageQuery(message_query, settings['fix_query'], settings['check_case'],
+                                    settings['check_exact_word']).matches
+                       if line_matches is None else None)
+    exclude_commands = excludes_commands(settings)
+    exclude_bots = settings['exclude_bots'] and not (search_type == 'user' and check_exact_name)
+    show_msgs, check_purity = settings['show_msgs'], settings['check_purity']
+    show_indiv_word, show_indiv_char = settings['show_indiv_word'], settings['show_indiv_char']
+    count_words, word_users = settings['count_words'], settings['word_users']
+    sample_size = settings['sample_size']
+    result = ScanResult(sample_size)
+    result.profile = profile = profile or Profile()
+    users = result.users
+    words: Dict[str, int] = result.words  # type: ignore  # day counts are always exact
+
+    # each phase runs over the lines left by the one before, so it can be timed as a whole
+    matched_lines, lines_count, commands_count, bots_count = [], 0, 0, 0
+    for line in day_lines:
+        lines_count += 1
+        time, user, message = line
+        matched = False
+        if exclude_commands and COMMAND_PATTERN.match(message):
+            commands_count += 1
+            continue
+        if exclude_bots and user in bots:
+            bots_count += 1
+            continue
+        if search_type == 'all':
+            matched = True
+        elif search_type == 'user':
+            matched = (user == user_query if check_exact_name
+                       else user_query.lower() in user.lower())
+        elif search_type in {'msg', 'hybrid'}:
+            if user_query:
+                matched = (user == user_query if check_exact_name
+                           else user_query.lower() in user.lower())
+                if matched:
+                    matched = (message_matches(message) if line_matches is None  # type: ignore
+                               else line_matches(time, user, message))
+            else:
+                matched = (message_matches(message) if line_matches is None  # type: ignore
+                           else line_matches(time, user, message))
+        if matched:
+            matched_lines.append(line)
+    profile.lap('filter')
+
+    if show_msgs:
+        result.lines = [(date, time, user, message) for time, user, message in matched_lines]
+    user_ids = users.intern(user for _, user, _ in matched_lines)
+    users.add('messages', user_ids)
+    if sample_size:  # reservoir sampling keeps a uniform sample per user
+        seen, samples = [0]*len(users), users.samples
+        for user_id, (_, _, message) in zip(user_ids.tolist(), matched_lines):
+            seen[user_id] += 1
+            if len(sample := samples[user_id]) < sample_size:
+                sample.append(message)
+            elif (slot := random.randrange(seen[user_id])) < sample_size:
+                sample[slot] = message
+    if show_indiv_word:
+        users.add('words', user_ids, [len(message.split(' ')) for _, _, message in matched_lines])
+    if show_indiv_char:
+        users.add('chars', user_ids,
+                  [len(message.replace(' ', '')) for _, _, message in matched_lines])
+    times = [time for time, _, _ in matched_lines]
+    day_count = len(matched_lines)
+    result.total_count = day_count
+    result.daily_count[date] = day_count
+    result.add_times(date, times)
+    profile.lap('aggregate')
+
+    if count_words:
+        # tokens are counted as they are first (a batch of messages at a time), so each distinct
+        # one is only decided on once
+        counted = [message for _, user, message in matched_lines
+                   if word_users is None or user in word_users]
+        word_counts: Counter = Counter()
+        for start in range(0, len(counted), WORD_BATCH):
+            word_counts.update(' '.join(counted[start:start+WORD_BATCH]).split())
+        word_key = word_filter(settings).key
+        for word, count in word_counts.items():
+            if (key := word_key(word)) is not None:
+                words[key] += count
+        profile.lap('words')
+
+    if check_purity:
+        purity_matches, purity_terms = purity.matches, purity.terms
+        pure_ids, impure_ids, weights = [], [], []
+        hit_ids: Dict[str, List[int]] = defaultdict(list)  # users hitting each term category
+        for user_id, (_, _, message) in zip(user_ids.tolist(), matched_lines):
+            if (term_ids := purity_matches(message)):
+                impure_ids.append(user_id)
+                weights.append(purity.weight(term_ids))
+                for term_id in term_ids:
+                    term, category = purity_terms[term_id]
+                    hit_ids[category].append(user_id)
+                    result.impure_terms[term] += 1
+            else:
+                pure_ids.append(user_id)
+        users.add('pcount', pure_ids)
+        users.add('icount', impure_ids)
+        users.add('iweight', impure_ids, weights, float)
+        for category, category_ids in hit_ids.items():
+            users.add(category, category_ids)
+        profile.lap('purity')
+
+    profile.counts['lines'] += lines_count
+    profile.counts['commands'] += commands_count
+    profile.counts['bots'] += bots_count
+    profile.counts['matched'] += day_count
+    return result
+
+
+def uses_rollups(settings: ScanSettings) -> bool:
+    """Whether a query's statistics can all be merged from day rollups instead of lines."""
+    return (settings['search_type'] in {'all', 'user'}
+            and not (settings['show_msgs'] or settings['count_words'] or settings['check_purity']
+                     or settings['sample_size']))
+
+
+def scan_rollup(rollup: Rollup, date: str, settings: ScanSettings, bots: Set[str],
+                profile: Optional[Profile] = None) -> ScanResult:
+    """Gather a day's statistics from its rollup, filtered like its lines would have been."""
+    search_type, user_query = settings['search_type'], settings['user_query']
+    check_exact_name = settings['check_exact_name']
+    exclude_bots = settings['exclude_bots'] and not (search_type == 'user' and check_exact_name)
+    result = ScanResult()
+    result.profile = profile = profile or Profile()
+    users = result.users
+    names, groups = rollup
+    lines_count, commands_count, bots_count = int(groups['messages'].sum()), 0, 0
+    if excludes_commands(settings):
+        commands_count = int(groups['messages'][groups['command']].sum())
+        groups = groups[~groups['command']]
+    if exclude_bots:
+        is_bot = numpy.array([user in bots for user in names], dtype=bool)[groups['user']]
+        bots_count = int(groups['messages'][is_bot].sum())
+        groups = groups[~is_bot]
+    if search_type == 'user':
+        matches = numpy.array([user == user_query if check_exact_name
+                               else user_query.lower() in user.lower() for user in names],
+                              dtype=bool)
+        groups = groups[matches[groups['user']]]
+    profile.lap('filter')
+
+    # chatters get ids in the order of their first kept line, as if the lines were scanned
+    groups = groups[numpy.argsort(groups['first'], kind='stable')]
+    day_users, firsts = numpy.unique(groups['user'], return_index=True)
+    day_users = day_users[numpy.argsort(firsts)]
+    local_ids = numpy.zeros(len(names), dtype=numpy.intp)
+    local_ids[day_users] = users.intern(names[user] for user in day_users.tolist())
+    user_ids = local_ids[groups['user']]
+    users.add('messages', user_ids, groups['messages'])
+    if settings['show_indiv_word']:
+        users.add('words', user_ids, groups['words'])
+    if settings['show_indiv_char']:
+        users.add('chars', user_ids, groups['chars'])
+    day_count = int(groups['messages'].sum())
+    result.total_count = day_count
+    result.daily_count[date] = day_count
+    result.add_minutes(date, numpy.bincount(groups['minute'], groups['messages'],
+                                            minlength=MINUTES).astype(numpy.int64))
+    profile.lap('aggregate')
+
+    profile.counts['lines'] += lines_count
+    profile.counts['commands'] += commands_count
+    profile.counts['bots'] += bots_count
+    profile.counts['matched'] += day_count
+    return result
+
+
+def scan_day(rootpath: str, channel: str, settings: ScanSettings, bots: Set[str],
+             purity: PurityMatcher, date: str, rows: Optional[List[int]] = None) -> ScanResult:
+    """Scan a single day log (or only the given rows of it) for messages matching the query."""
+    profile = Profile()
+    day_lines: Iterable[Tuple[str, str, str]]
+    if rows is None and uses_rollups(settings):
+        result = scan_rollup(day_rollup(rootpath, channel, date, profile), date, settings, bots,
+                             profile)
+        profile.add_day(channel, date, os.path.getsize(log_path(rootpath, channel, date)))
+        return result
+    if rows is None and settings['user_query']:
+        # searching and parsing the mapped bytes are one step, charged to reading
+        day_lines = list(read_user_lines(rootpath, channel, date, settings['user_query'],
+                                         settings['check_exact_name']))
+        profile.lap('read')
+    else:
+        day_times, day_users, day_messages = (read_day(rootpath, channel, date, profile=profile)
+                                              if rows is None or rows else ([], [], []))
+        day_lines = zip(day_times, day_users, day_messages)
+        if rows is not None:
+            day_lines = ((day_times[row], day_users[row], day_messages[row]) for row in rows)
+    result = scan_lines(day_lines, date, settings, bots, purity, profile)
+    profile.add_day(channel, date, os.path.getsize(log_path(rootpath, channel, date)))
+    return result
+
+
+def scan_day_batch(rootpath: str, channel: str, batch: List[Tuple[ScanSettings, Set[str]]],
+                   bots: Set[str], purity: PurityMatcher, date: str) -> List[Optional[ScanResult]]:
+    """Scan a single day log once for every query in the batch that covers the date."""
+    columns, rollup, results, profile = None, None, [], Profile()
+    for settings, dates in batch:
+        if date not in dates:
+            results.append(None)
+            continue
+        first = columns is None and rollup is None
+        if uses_rollups(settings):
+            if rollup is None:
+                rollup = (day_rollup(rootpath, channel, date, profile) if columns is None
+                          else build_rollup(columns))
+            results.append(scan_rollup(rollup, date, settings, bots, profile))
+        else:
+            if columns is None:
+                columns = read_day(rootpath, channel, date, profile=profile)
+            results.append(scan_lines(zip(*columns), date, settings, bots, purity, profile))
+        if first:  # the shared read (and the day) is charged to the first query reading it
+            profile.add_day(channel, date, os.path.getsize(log_path(rootpath, channel, date)))
+        profile = Profile()
+    return results
+
+
+def map_days(scan: Callable, dates: List[str], workers: int, *args: Iterable) -> Iterator:
+    """Apply a day scan to each date in order, spreading days across processes if requested."""
+    dates_len, workers = len(dates), workers or os.cpu_count() or 1
+    if workers > 1 and dates_len > 1:
+        workers = min(workers, dates_len)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(scan, dates, *args,
+                                    chunksize=max(1, dates_len // (workers*4)))
+    else:
+        yield from map(scan, dates, *args)
+
+
+def show_progress(dates_i: int, dates_len: int, done: int, total: int):
+    """Show how many day logs, and what share of their bytes, have been read."""
+    share = f", {done/total:.0%}" if total else ''
+    print(f"Reading logs... ({dates_i}/{dates_len}{share})", end='\r')
+
+
+def day_sizes(rootpath: str, dates: List[str]) -> List[int]:
+    """Sizes of the given days' logs, from the channel's catalog."""
+    sizes = date_catalog(rootpath).sizes
+    return [sizes.get(date, 0) for date in dates]
+
+
+def scan_channel_day(settings: ScanSettings, bots: Set[str], purity: PurityMatcher, date: str,
+                     rootpath: str, channel: str, rows: Optional[List[int]]) -> ScanResult:
+    """Scan a single day log of any channel, with the channel passed per task."""
+    return scan_day(rootpath, channel, settings, bots, purity, date, rows)
+
+
+def scan_channels(channels: List[Tuple[str, str, List[str]]], settings: ScanSettings,
+                  bots: Set[str], purity: PurityMatcher, workers: int = 1,
+                  candidates: Optional[List[Optional[Dict[str, List[int]]]]] = None,
+                  export: Optional["ExportSink"] = None) -> List[ScanResult]:
+    """Scan the day logs of (rootpath, channel, dates) entries through one pool of processes."""
+    dates, rootpaths, channel_names, rows, owners, sizes = [], [], [], [], [], []
+    for i, (rootpath, channel, channel_dates) in enumerate(channels):
+        channel_candidates = candidates[i] if candidates else None
+        dates += channel_dates
+        rootpaths += [rootpath]*len(channel_dates)
+        channel_names += [channel]*len(channel_dates)
+        rows += ([None]*len(channel_dates) if channel_candidates is None
+                 else [channel_candidates.get(date, []) for date in channel_dates])
+        owners += [i]*len(channel_dates)
+        sizes += day_sizes(rootpath, channel_dates)
+    results = [ScanResult(settings['sample_size'], settings['word_error']) for _ in channels]
+    scan = partial(scan_channel_day, settings, bots, purity)
+    show_msgs, done, total = settings['show_msgs'], 0, sum(sizes)
+    # merged in task order, so each channel's days are still folded in date order
+    for dates_i, (day_result, owner, size) in enumerate(zip(
+            map_days(scan, dates, workers, rootpaths, channel_names, rows), owners, sizes),
+                                                        start=1):
+        done += size
+        if export is not None:
+            export.write_rows(channels[owner][1], day_result.lines)
+            show_progress(dates_i, len(dates), done, total)
+        elif show_msgs:
+            if day_result.lines:  # a day's messages are printed at once
+                prefix = f"#{channels[owner][1]} " if len(channels) > 1 else ''
+                print('\n'.join(f"{prefix}{date} {format_line(time, user, message)}"
+                                 for date, time, user, message in day_result.lines))
+        else:
+            show_progress(dates_i, len(dates), done, total)
+        results[owner].merge(day_result)
+    return results
+
+
+def scan_dates(rootpath: str, channel: str, dates: List[str], settings: ScanSettings,
+               bots: Set[str], purity: PurityMatcher, workers: int = 1,
+               candidates: Optional[Dict[str, List[int]]] = None) -> ScanResult:
+    """Scan day logs (or only indexed candidate rows) in date order, optionally in parallel."""
+    return scan_channels([(rootpath, channel, dates)], settings, bots, purity, workers,
+                         [candidates])[0]
+
+
+def merge_results(results: List[ScanResult], settings: ScanSettings) -> ScanResult:
+    """A new result combining several others, leaving them unchanged."""
+    merged = ScanResult(settings['sample_size'], settings['word_error'])
+    for result in results:
+        merged.merge(result)
+    return merged
+
+
+def scan_batch(rootpath: str, channel: str, batch: List[Tuple[ScanSettings, Set[str]]],
+               bots: Set[str], purity: PurityMatcher, workers: int = 1,
+               exports: Optional[List[Optional["ExportSink"]]] = None) -> List[ScanResult]:
+    """Scan the union of the batch's dates once, keeping a separate result per query."""
+    dates = sorted(set().union(*(dates for _, dates in batch)))
+    scan = partial(scan_day_batch, rootpath, channel, batch, bots, purity)
+    results = [ScanResult(settings['sample_size'], settings['word_error'])
+               for settings, _ in batch]
+    sizes, done = day_sizes(rootpath, dates), 0
+    total = sum(sizes)
+    for dates_i, (day_results, size) in enumerate(zip(map_days(scan, dates, workers), sizes),
+                                                  start=1):
+        done += size
+        show_progress(dates_i, len(sizes), done, total)
+        for result, day_result, export in zip(results, day_results, exports or [None]*len(batch)):
+            if day_result is not None:
+                if export is not None:
+                    export.write_rows(channel, day_result.lines)
+                else:
+                    result.lines.extend(day_result.lines)
+                result.merge(day_result)
+    return results
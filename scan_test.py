@@ -0,0 +1,94 @@
+"""Tests of parallel day scans against serial ones."""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from batch import SPEC_DEFAULTS, spec_settings
+from config import Config
+from generate import BOTS, generate_logs
+from purity import PurityMatcher
+from scan import ScanResult, scan_batch, scan_channels
+
+CONFIG = Config(logs_folder='', utc_offset=0, exclude_commands=True, exclude_bots=True,
+                scan_workers=1, use_index=False, word_error=0.0, profile=False,
+                purity_weights={})
+DATES = ["2023-01-01", "2023-01-02", "2023-01-03", "2023-01-04"]
+QUERIES = ["", "KEKW", "$user1", "$user1 lol", "`U", "?user~user2 and not lol", "`C"]
+PURITY = PurityMatcher({"strong_curse": ["damn", "wtf"], "mild_curse": ["hell", "crap"]},
+                       {"strong_curse": 1.0, "mild_curse": 0.5})
+
+
+class ParallelScanTest(unittest.TestCase):
+    """Scans spread over processes give the same results as scans in one."""
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        cls.cwd = os.getcwd()
+        os.chdir(cls.folder.name)  # caches are written relative to the working directory
+        cls.channels = generate_logs(".", channels=2, days=len(DATES), messages=600, users=50,
+                                     seed=1)
+        cls.roots = [f"./Twitch/Channels/{channel}" for channel in cls.channels]
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.cwd)
+        cls.folder.cleanup()
+
+    def assert_same(self, parallel: ScanResult, serial: ScanResult):
+        """Results hold the same counts, chatters, words and terms, in the same order."""
+        self.assertEqual(parallel.total_count, serial.total_count)
+        self.assertEqual(list(parallel.daily_count.items()), list(serial.daily_count.items()))
+        self.assertTrue(numpy.array_equal(parallel.minutes, serial.minutes))
+        self.assertTrue(numpy.array_equal(parallel.weekday_hours, serial.weekday_hours))
+        self.assertEqual(parallel.users.names, serial.users.names)
+        self.assertEqual(sorted(parallel.users.counters), sorted(serial.users.counters))
+        for key in serial.users.counters:
+            self.assertEqual(parallel.users[key].tolist(), serial.users[key].tolist(), key)
+        self.assertEqual(list(parallel.words.items()), list(serial.words.items()))
+        self.assertEqual(dict(parallel.impure_terms), dict(serial.impure_terms))
+
+    def scan(self, query: str, workers: int, word_error: float = 0.0, **spec):
+        """Results of a query over both channels."""
+        settings, _ = spec_settings({**SPEC_DEFAULTS, "query": query, **spec},  # type: ignore
+                                    Config(**{**CONFIG, "word_error": word_error}), ())
+        with contextlib.redirect_stdout(io.StringIO()):  # progress
+            return scan_channels([(root, channel, DATES)
+                                  for root, channel in zip(self.roots, self.channels)],
+                                 settings, set(BOTS), PURITY, workers)
+
+    def test_channels(self):
+        """Every kind of query, with every statistic, matches across worker counts."""
+        spec = {"count_words": True, "check_purity": True, "show_indiv_word": True,
+                "show_indiv_char": True}
+        for query in QUERIES:
+            for extra in ({}, spec, {**spec, "word_error": 0.01}):
+                with self.subTest(query=query, spec=extra):
+                    serial = self.scan(query, 1, **extra)
+                    parallel = self.scan(query, 3, **extra)
+                    self.assertTrue(any(result.total_count for result in serial))
+                    for parallel_result, serial_result in zip(parallel, serial):
+                        self.assert_same(parallel_result, serial_result)
+
+    def test_batch(self):
+        """Batched queries over overlapping dates match across worker counts."""
+        batch = []
+        for query, dates in zip(QUERIES, (DATES, DATES[1:], DATES[:2], DATES[2:3], DATES,
+                                          DATES[::2], DATES[1:3])):
+            settings, _ = spec_settings({**SPEC_DEFAULTS, "query": query,  # type: ignore
+                                         "count_words": True, "show_indiv_word": True},
+                                        CONFIG, ())
+            batch.append((settings, set(dates)))
+        with contextlib.redirect_stdout(io.StringIO()):
+            serial = scan_batch(self.roots[0], self.channels[0], batch, set(BOTS), PURITY, 1)
+            parallel = scan_batch(self.roots[0], self.channels[0], batch, set(BOTS), PURITY, 3)
+        for (settings, _), parallel_result, serial_result in zip(batch, parallel, serial):
+            with self.subTest(query=settings['message_query'] or settings['user_query']):
+                self.assert_same(parallel_result, serial_result)
+
+
+if __name__ == '__main__':
+    unittest.main()
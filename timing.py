@@ -0,0 +1,89 @@
+"""Per-phase timing and throughput of queries."""
+from collections import defaultdict
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+PROFILE_FOLDER = "profiles"
+PHASES = ("dates", "reuse", "index", "cache", "read", "parse", "rollup", "filter", "aggregate",
+          "words", "purity", "sort", "output")
+
+
+class Profile:
+    """Wall time and counts of query phases, mergeable across days and processes."""
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.counts: Dict[str, int] = defaultdict(int)
+        # scan seconds and bytes of each channel's day file
+        self.days: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        self.started = self.mark = time.perf_counter()
+
+    def lap(self, phase: Optional[str] = None) -> float:
+        """Charge the time since the last lap to a phase (or to nothing), returning it."""
+        now = time.perf_counter()
+        elapsed, self.mark = now - self.mark, now
+        if phase:
+            self.seconds[phase] += elapsed
+        return elapsed
+
+    def add_day(self, channel: str, date: str, size: int):
+        """Record the time since the profile was started as spent scanning a day file."""
+        self.days[channel, date] = (time.perf_counter() - self.started, size)
+
+    def merge(self, other: Optional["Profile"]):
+        """Fold in the phases of another profile."""
+        if other is None:
+            return
+        for key, value in other.seconds.items():
+            self.seconds[key] += value
+        for key, count in other.counts.items():
+            self.counts[key] += count
+        for key, (seconds, size) in other.days.items():
+            old_seconds, old_size = self.days.get(key, (0.0, 0))
+            self.days[key] = (old_seconds+seconds, old_size+size)
+
+    def summary(self, slowest: int = 10) -> Dict[str, Any]:
+        """Machine-readable phase times, counts and throughput."""
+        scan_seconds = sum(seconds for seconds, _ in self.days.values())
+        lines, size = self.counts.get('lines', 0), sum(size for _, size in self.days.values())
+        phases = {phase: self.seconds[phase] for phase in PHASES if phase in self.seconds}
+        phases.update((phase, seconds) for phase, seconds in self.seconds.items()
+                      if phase not in phases)
+        return {"phases": phases,
+                "total_seconds": sum(phases.values()),
+                "counts": {**self.counts, "days": len(self.days), "bytes": size},
+                "bytes_per_second": size/scan_seconds if scan_seconds else 0.0,
+                "lines_per_second": lines/scan_seconds if scan_seconds else 0.0,
+                "match_ratio": self.counts.get('matched', 0)/lines if lines else 0.0,
+                "slowest_days": [{"channel": channel, "date": date, "seconds": seconds,
+                                  "bytes": size}
+                                 for (channel, date), (seconds, size) in sorted(
+                                     self.days.items(), key=lambda item: item[1][0],
+                                     reverse=True)[:slowest]]}
+
+    def report(self):
+        """Print where a query's time went."""
+        summary = self.summary(slowest=5)
+        total = summary["total_seconds"] or 1.0
+        print("\nProfile:")
+        for phase, seconds in summary["phases"].items():
+            print(f"    {phase:<10} {seconds*1000:>10.1f} ms {seconds/total:>7.1%}")
+        print(f"    {summary['counts']['bytes']/2**20:.1f} MiB at " \
+              f"{summary['bytes_per_second']/2**20:.1f} MiB/s, " \
+              f"{summary['counts'].get('lines', 0)} lines at " \
+              f"{summary['lines_per_second']:,.0f} lines/s, " \
+              f"{summary['match_ratio']:.2%} matched")
+        if summary["slowest_days"]:
+            print("    Slowest days: " + ", ".join(
+                f"{day['channel']} {day['date']} ({day['seconds']*1000:.1f} ms)"
+                for day in summary["slowest_days"]))
+
+    def save(self, path: Optional[str] = None) -> str:
+        """Write the summary as JSON, by default to a timestamped file in the profiles folder."""
+        if path is None:
+            os.makedirs(PROFILE_FOLDER, exist_ok=True)
+            path = f"{PROFILE_FOLDER}/{time.strftime('%Y%m%d-%H%M%S')}.json"
+        with open(path, 'w', encoding="UTF-8") as file:
+            file.write(json.dumps(self.summary(), indent=4))
+        return path
@@ -0,0 +1,121 @@
+"""Chatters interned to integer ids, with per-user counters kept in parallel arrays."""
+import random
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy
+
+
+def merge_samples(sample: List[str], count: int, other: List[str], other_count: int,
+                  sample_size: int) -> List[str]:
+    """Combine two uniform message samples drawn from counts of messages each."""
+    sample, other = random.sample(sample, len(sample)), random.sample(other, len(other))
+    merged = []
+    while len(merged) < sample_size and (sample or other):
+        if random.random() < count / (count+other_count):
+            merged.append(sample.pop())
+            count -= 1
+        else:
+            merged.append(other.pop())
+            other_count -= 1
+    return merged
+
+
+class UserStats:
+    """Per-user counters indexed by chatter id, ids being given out in first-seen order."""
+    def __init__(self, sample_size: int = 0):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        # counter arrays are over-allocated as chatters are added, only len(self) are in use
+        self.counters: Dict[str, numpy.ndarray] = {}
+        self.capacity = 0
+        self.samples: List[List[str]] = []  # messages kept per user, only if sampling
+        self.sample_size = sample_size
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, key: str) -> numpy.ndarray:
+        """A counter's values by chatter id (all zeros if nothing was counted)."""
+        if (values := self.counters.get(key)) is None:
+            return numpy.zeros(len(self.names), dtype=numpy.int64)
+        return values[:len(self.names)]
+
+    def intern(self, names: Iterable[str]) -> numpy.ndarray:
+        """Ids of chatters, giving unseen ones the next ids and room in every counter."""
+        ids, known = [], self.ids
+        for name in names:
+            if (user_id := known.get(name)) is None:
+                user_id = known[name] = len(self.names)
+                self.names.append(name)
+            ids.append(user_id)
+        if len(self.names) > self.capacity:
+            self.capacity = max(len(self.names), 2*self.capacity)
+            for key, values in self.counters.items():
+                self.counters[key] = numpy.resize(values, self.capacity)
+                self.counters[key][len(values):] = 0
+        if self.sample_size:
+            self.samples += [[] for _ in range(len(self.names) - len(self.samples))]
+        return numpy.array(ids, dtype=numpy.intp)
+
+    def add(self, key: str, ids: Sequence[int], weights: Optional[Sequence[float]] = None,
+            dtype: type = numpy.int64):
+        """Add one (or a weight) to a counter for each occurrence of a chatter id."""
+        if (values := self.counters.get(key)) is None:
+            values = self.counters[key] = numpy.zeros(self.capacity, dtype=dtype)
+        counts = numpy.bincount(numpy.asarray(ids, dtype=numpy.intp), weights,
+                                minlength=len(self.names))
+        values[:len(counts)] += counts.astype(values.dtype)
+
+    def merge(self, other: "UserStats"):
+        """Fold in another scan's chatters, keeping first-seen id order."""
+        ids = self.intern(other.names)
+        if self.sample_size:
+            counts, other_counts = self['messages'], other['messages']
+            for other_id, user_id in enumerate(ids.tolist()):
+                self.samples[user_id] = merge_samples(
+                    self.samples[user_id], counts[user_id], other.samples[other_id],
+                    other_counts[other_id], self.sample_size)
+        for key, values in other.counters.items():
+            if key not in self.counters:
+                self.counters[key] = numpy.zeros(self.capacity, dtype=values.dtype)
+            self.counters[key][ids] += values[:len(other)]
+
+    def select(self, keep: numpy.ndarray) -> "UserStats":
+        """The chatters where keep is true, with their counters, in the same order."""
+        selected, indices = UserStats(self.sample_size), numpy.flatnonzero(keep)
+        selected.names = [self.names[user_id] for user_id in indices.tolist()]
+        selected.ids = {name: user_id for user_id, name in enumerate(selected.names)}
+        selected.counters = {key: self[key][indices] for key in self.counters}
+        selected.capacity = len(indices)
+        if self.sample_size:
+            selected.samples = [self.samples[user_id] for user_id in indices.tolist()]
+        return selected
+
+    def order(self, values: numpy.ndarray, reverse: bool = True,
+              ids: Optional[numpy.ndarray] = None, limit: Optional[int] = None) -> numpy.ndarray:
+        """Chatter ids by value (highest first unless reversed), ties kept in order of ids."""
+        keys = values if ids is None else values[ids]
+        keys = -keys if reverse else keys
+        if limit is None or not 0 < limit < len(keys):
+            picked = numpy.argsort(keys, kind='stable')[:limit]
+        else:  # only the first few are sorted, after partitioning them from the rest
+            threshold = numpy.partition(keys, limit-1)[limit-1]
+            picked = numpy.flatnonzero(keys < threshold)
+            picked = numpy.concatenate((picked, numpy.flatnonzero(keys == threshold)
+                                        [:limit-len(picked)]))
+            picked = picked[numpy.argsort(keys[picked], kind='stable')]
+        return picked if ids is None else ids[picked]
+
+    def rank(self, values: numpy.ndarray, user_id: int, reverse: bool = True) -> int:
+        """Place (from 1) of a chatter in the order of values, without sorting them."""
+        keys = -values if reverse else values
+        key = keys[user_id]
+        return int(numpy.count_nonzero(keys < key)
+                   + numpy.count_nonzero(keys[:user_id] == key)) + 1
+
+    def top(self, values: numpy.ndarray, limit: int, reverse: bool = True,
+            ids: Optional[numpy.ndarray] = None) -> List[Tuple]:
+        """Names and values of the highest (or lowest) valued chatters."""
+        order = self.order(values, reverse, ids, limit)
+        return list(zip([self.names[user_id] for user_id in order.tolist()],
+                        values[order].tolist()))
@@ -0,0 +1,50 @@
+"""Tests of chatter ordering by partial selection."""
+import unittest
+
+import numpy
+
+from users import UserStats
+
+
+class OrderTest(unittest.TestCase):
+    """UserStats.order and rank against a full stable sort."""
+    def setUp(self):
+        self.users, self.rng = UserStats(), numpy.random.default_rng(0)
+
+    def full_order(self, values: numpy.ndarray, reverse: bool, ids=None) -> list:
+        """Ids by a stable sort of all values, ties in order of ids."""
+        ids = numpy.arange(len(values)) if ids is None else ids
+        return sorted(ids.tolist(), key=lambda user_id: -values[user_id] if reverse
+                      else values[user_id])
+
+    def test_limit(self):
+        """Limited orders are the first ids of the full order, ties included in id order."""
+        for trial in range(500):
+            size = int(self.rng.integers(0, 30))
+            values = self.rng.integers(0, 5, size)
+            if trial % 2:
+                values = values / 3
+            ids = self.rng.permutation(size)[:int(self.rng.integers(0, size+1))]
+            for reverse in (True, False):
+                for subset in (None, ids):
+                    expected = self.full_order(values, reverse, subset)
+                    self.assertEqual(self.users.order(values, reverse, subset).tolist(),
+                                     expected)
+                    for limit in range(-2, size+2):
+                        self.assertEqual(
+                            self.users.order(values, reverse, subset, limit).tolist(),
+                            expected[:limit])
+
+    def test_rank(self):
+        """A chatter's rank is its place in the full order."""
+        for _ in range(200):
+            values = self.rng.integers(0, 5, int(self.rng.integers(1, 30)))
+            for reverse in (True, False):
+                expected = self.full_order(values, reverse)
+                for user_id in range(len(values)):
+                    self.assertEqual(self.users.rank(values, user_id, reverse),
+                                     expected.index(user_id)+1)
+
+
+if __name__ == '__main__':
+    unittest.main()